@@ -9,6 +9,13 @@ load_dotenv()  # Load from .env file if available
 # ------------------ General ------------------
 APP_NAME = "RAG system made by StrawHats"
 APP_VERSION = "1.0.0"
+PRELOAD_ON_STARTUP = os.getenv("PRELOAD_ON_STARTUP", "true").lower() == "true"  # Load model and clients in the lifespan hook
+
+# ------------------ Server (python -m app.server) ------------------
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "1"))  # Forked after the master loads the model, which they share
+TORCH_THREADS_PER_WORKER = int(os.getenv("TORCH_THREADS_PER_WORKER", "0"))  # 0: CPU cores / workers
 
 
 #------------------- Llama Cloud Services ------------------
@@ -28,9 +35,25 @@ QDRANT_COLLECTION = os.getenv("VECDB_CHUNKTABLE", "rag-collection")
 VECTOR_SIZE = 768  # Matches embedding model dimension
 VECTOR_DISTANCE = "COSINE"  # Options: COSINE, EUCLID, DOT
 
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true"  # Binary gRPC transport instead of HTTP/JSON
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "256"))  # Points per upsert request
+UPSERT_PARALLELISM = int(os.getenv("UPSERT_PARALLELISM", "4"))  # Upsert requests in flight per document
+
 # HNSW index parameters for Qdrant (as per requirements)
 INDEX_HNSW_PARAMS = json.loads(os.getenv("INDEX_HNSW_PARAMS", '{"ef_construction": 200, "M": 16}'))
 
+# Vector compression: "none", "int8" (scalar) or "binary"
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none").lower()
+QUANTIZATION_ALWAYS_RAM = os.getenv("QUANTIZATION_ALWAYS_RAM", "true").lower() == "true"  # Keep quantized vectors in RAM
+QUANTIZATION_RESCORE = os.getenv("QUANTIZATION_RESCORE", "true").lower() == "true"  # Re-rank with original vectors
+QUANTIZATION_OVERSAMPLING = float(os.getenv("QUANTIZATION_OVERSAMPLING", "2.0"))  # Candidates fetched per result before rescoring
+VECTORS_ON_DISK = os.getenv("VECTORS_ON_DISK", "false").lower() == "true"  # Store original vectors on disk (mmap)
+
+# Search-time defaults, overridable per request
+SEARCH_HNSW_EF = int(os.getenv("SEARCH_HNSW_EF", "0")) or None  # 0 = Qdrant default
+SEARCH_EXACT = os.getenv("SEARCH_EXACT", "false").lower() == "true"  # Brute-force search, bypasses HNSW
+
 # ------------------ LLM (Groq) ------------------
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")  # Required for LLM functionality
 GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")  # Default model
@@ -48,12 +71,95 @@ SENTENCE_SPLITTER = os.getenv("SENTENCE_SPLITTER", "nltk")  # Options: nltk, spa
 
 # ------------------ Document Parser ------------------
 PARSER = os.getenv("PARSER", "PyMuPDF")  # Using PyMuPDF by default
+PDF_TABLE_WORKERS = int(os.getenv("PDF_TABLE_WORKERS", str(min(4, os.cpu_count() or 1))))  # Processes for pdfplumber tables
+PDF_TABLE_PARALLEL_MIN_PAGES = int(os.getenv("PDF_TABLE_PARALLEL_MIN_PAGES", "8"))  # Below this, extract in-process
+EMAIL_HTML_PARSER = os.getenv("EMAIL_HTML_PARSER", "lxml")  # "lxml", or a BeautifulSoup parser such as "html.parser"
+EMAIL_ATTACHMENT_WORKERS = int(os.getenv("EMAIL_ATTACHMENT_WORKERS", "4"))  # Attachments parsed concurrently per email
+DOCX_STREAMING = os.getenv("DOCX_STREAMING", "true").lower() == "true"  # Iterparse the document XML instead of loading python-docx's object model
 
 # ------------------ Async ------------------
 ASYNC_TIMEOUT = int(os.getenv("ASYNC_TIMEOUT", "20"))  # seconds for HTTP clients
 
+# ------------------ Deadlines ------------------
+REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", "120"))  # seconds per /hackrx/run request, 0 = no deadline
+DEADLINE_HEADER = os.getenv("DEADLINE_HEADER", "X-Request-Timeout")  # Clients may ask for a shorter budget (seconds)
+LLM_QUESTIONS_PER_CALL = int(os.getenv("LLM_QUESTIONS_PER_CALL", "8"))  # Questions per concurrent LLM call, 0 = all in one
+
+# ------------------ Downloads ------------------
+DOCUMENT_SPILL_BYTES = int(os.getenv("DOCUMENT_SPILL_BYTES", str(32 * 1024 * 1024)))  # Larger bodies go to a temp file
+DOCUMENT_MAX_BYTES = int(os.getenv("DOCUMENT_MAX_BYTES", str(200 * 1024 * 1024)))  # Larger bodies are rejected
+
+# ------------------ Progressive Indexing ------------------
+PROGRESSIVE_INDEXING = os.getenv("PROGRESSIVE_INDEXING", "false").lower() == "true"  # Answer the first request on a long PDF from its first pages only
+PROGRESSIVE_MIN_PAGES = int(os.getenv("PROGRESSIVE_MIN_PAGES", "200"))  # PDFs at least this long are indexed progressively
+PROGRESSIVE_FIRST_PAGES = int(os.getenv("PROGRESSIVE_FIRST_PAGES", "30"))  # Pages indexed before the first answer
+PROGRESSIVE_OUTLINE_PAGES = int(os.getenv("PROGRESSIVE_OUTLINE_PAGES", "40"))  # Pages sampled for headings when a PDF has no table of contents
+
+# ------------------ Ingestion Jobs ------------------
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))  # Concurrent background ingestion jobs per server worker
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "100"))  # Max pending ingestion jobs, across all server workers
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "3"))  # Attempts per job before giving up
+INGEST_RETRY_BACKOFF = float(os.getenv("INGEST_RETRY_BACKOFF", "2.0"))  # seconds, doubled after each failure
+INGEST_PARALLELISM = int(os.getenv("INGEST_PARALLELISM", "4"))  # Documents ingested concurrently per request
+INGEST_JOB_TTL = float(os.getenv("INGEST_JOB_TTL", "3600"))  # seconds a finished job stays visible to GET /documents/jobs
+INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", "1000"))  # Finished jobs kept at most, oldest evicted first
+INGEST_LEASE_TIMEOUT = float(os.getenv("INGEST_LEASE_TIMEOUT", "60"))  # seconds without a heartbeat before another worker takes over an ingestion or job
+INGEST_POLL_INTERVAL = float(os.getenv("INGEST_POLL_INTERVAL", "1.0"))  # seconds between checks for jobs (or ingestions) of other workers
+
+# ------------------ Bulk Ingestion (python -m app.ingest) ------------------
+BULK_PARSE_WORKERS = int(os.getenv("BULK_PARSE_WORKERS", str(os.cpu_count() or 1)))  # Processes parsing documents
+BULK_EMBED_BATCH = int(os.getenv("BULK_EMBED_BATCH", "2048"))  # Chunks per call to the embedding process
+BULK_CHECKPOINT_PATH = os.getenv("BULK_CHECKPOINT_PATH", str(Path(__file__).resolve().parent / "temp" / "ingest-checkpoint.jsonl"))  # Finished documents, skipped on resume
+
+# ------------------ Admission Control ------------------
+# Limits of the whole server; with SERVER_WORKERS workers each enforces its share
+ADMISSION_INGEST_CONCURRENCY = int(os.getenv("ADMISSION_INGEST_CONCURRENCY", "2"))  # Documents ingested at once
+ADMISSION_INGEST_QUEUE = int(os.getenv("ADMISSION_INGEST_QUEUE", "8"))  # Waiting ingestions before 429
+ADMISSION_QA_CONCURRENCY = int(os.getenv("ADMISSION_QA_CONCURRENCY", "8"))  # Retrieval + LLM calls at once
+ADMISSION_QA_QUEUE = int(os.getenv("ADMISSION_QA_QUEUE", "32"))  # Waiting question batches before 429
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", "30"))  # seconds in queue before 503
+METRICS_PUBLISH_INTERVAL = float(os.getenv("METRICS_PUBLISH_INTERVAL", "5"))  # seconds between each worker's admission stats updates for /metrics
+
+# ------------------ Artifact Store ------------------
+# SQLite file shared by all workers/replicas (put it on a shared volume)
+ARTIFACT_STORE_ENABLED = os.getenv("ARTIFACT_STORE_ENABLED", "true").lower() == "true"
+ARTIFACT_STORE_PATH = os.getenv("ARTIFACT_STORE_PATH", str(Path(__file__).resolve().parent / "temp" / "artifacts.db"))
+ARTIFACT_STORE_MAX_MB = int(os.getenv("ARTIFACT_STORE_MAX_MB", "2048"))  # Least recently used artifacts are evicted above this
+ARTIFACT_STORE_COMPRESSION_LEVEL = int(os.getenv("ARTIFACT_STORE_COMPRESSION_LEVEL", "3"))  # zstd level
+
+# ------------------ State Store ------------------
+# SQLite file with the document registry and ingestion jobs, shared by all
+# server workers (and replicas on the same volume)
+STATE_STORE_PATH = os.getenv("STATE_STORE_PATH", str(Path(__file__).resolve().parent / "temp" / "state.db"))
+
+# ------------------ Chunk Store ------------------
+# Chunk texts, one memory-mapped file per document; Qdrant payloads only carry
+# document_id and chunk_index. Must be shared by every worker that searches.
+CHUNK_STORE_PATH = os.getenv("CHUNK_STORE_PATH", str(Path(__file__).resolve().parent / "temp" / "chunks"))
+
+# ------------------ Index Snapshot ------------------
+# Written with `python -m app.service.snapshot export` (or app.ingest --snapshot)
+# and loaded at startup, so a new replica answers on indexed documents at once
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "")  # "" = start cold
+SNAPSHOT_VECTOR_DTYPE = os.getenv("SNAPSHOT_VECTOR_DTYPE", "float32")  # "float16" halves the vectors' size
+
+# ------------------ Tracing ------------------
+# OpenTelemetry spans per request; the trace id is returned in TRACE_HEADER.
+# Look a trace up with: python -m app.service.tracing <trace id>
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", str(Path(__file__).resolve().parent / "temp" / "traces.jsonl"))  # One span per line
+TRACE_EXPORT_MAX_MB = float(os.getenv("TRACE_EXPORT_MAX_MB", "100"))  # Above this the file is rotated to <path>.1 (replacing the previous one), 0 = never
+TRACE_SAMPLE_RATIO = float(os.getenv("TRACE_SAMPLE_RATIO", "1.0"))  # Share of requests traced
+TRACE_HEADER = os.getenv("TRACE_HEADER", "X-Trace-Id")
+OTEL_EXPORTER_OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "")  # Export to a collector instead of the file
+
 # ------------------ Limits ------------------
-TOP_K_RETRIEVAL = int(os.getenv("TOP_K_RETRIEVAL", "3"))
+TOP_K_RETRIEVAL = int(os.getenv("TOP_K_RETRIEVAL", "3"))  # Chunks retrieved per question (MMR keeps this many of MMR_CANDIDATES)
+
+# ------------------ Diversity (MMR) ------------------
+MMR_ENABLED = os.getenv("MMR_ENABLED", "false").lower() == "true"  # Re-rank hits to drop near-duplicate chunks
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))  # 1.0 = pure relevance, 0.0 = pure diversity
+MMR_CANDIDATES = int(os.getenv("MMR_CANDIDATES", "20"))  # Hits fetched per search before MMR selection
 
 # ------------------ Security ------------------
 ENABLE_AUTH = os.getenv("ENABLE_AUTH", "True").lower() == "true"  # Enable authentication
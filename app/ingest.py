@@ -0,0 +1,540 @@
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import app.service.chunk_store as chunk_store
+import app.service.chunker as chunker
+import app.service.registry as registry
+import app.service.snapshot as snapshot
+import app.service.vector_store as vector_store
+import app.utils.downloader__ as fetcher
+from app.config import (
+    BULK_CHECKPOINT_PATH,
+    BULK_EMBED_BATCH,
+    BULK_PARSE_WORKERS,
+    LOG_LEVEL,
+)
+
+# Offline bulk ingestion: index a whole document library before traffic arrives.
+#
+#   python -m app.ingest /data/policies --base-url https://docs.example.com/policies
+#   python -m app.ingest --urls library.txt --workers 8 --snapshot /artifacts/index.snap
+#
+#   parse   BULK_PARSE_WORKERS processes read or download documents, extract
+#           their text with the API's parsers and chunk it
+#   plan    compare the chunks with the points already stored (incremental, as
+#           sync_document), so a re-run only embeds what changed; skipped when
+#           the collection was empty at the start
+#   embed   one process holding the model embeds the new chunks of several
+#           documents per call (BULK_EMBED_BATCH chunks)
+#   upsert  the points of every embedded batch go in one write_points
+#
+# Chunk texts go from the parse workers to the embedding process, and vectors
+# back, in shared memory blocks; queues only carry the block names. Plan and
+# upsert run in one thread of the main process, the only one talking to Qdrant.
+# A document is appended to the checkpoint once its points and chunk texts are
+# stored; an interrupted run resumes by skipping the documents found there.
+logging.basicConfig(
+    level=getattr(logging, LOG_LEVEL),
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = {"pdf", "docx", "doc", "eml", "msg"}
+WINDOW_PER_WORKER = 4  # documents parsed or waiting to be stored, per parse worker
+BATCH_WAIT = 0.05  # seconds the embedding process waits for more documents to fill a batch
+
+_OFFSET = np.dtype("<i8")
+
+
+# =========================
+# Shared memory blocks
+# =========================
+def share_texts(texts: Sequence[str]) -> str:
+    """
+    Copy texts into a new shared memory block and return its name.
+
+    Layout: int64 count n, (n + 1) int64 offsets, the UTF-8 texts concatenated.
+    """
+    encoded = [text.encode("utf-8") for text in texts]
+    offsets = np.zeros(len(encoded) + 2, dtype=_OFFSET)
+    offsets[0] = len(encoded)
+    np.cumsum([len(e) for e in encoded], out=offsets[2:])
+    block = SharedMemory(create=True, size=offsets.nbytes + int(offsets[-1]))
+    block.buf[:offsets.nbytes] = offsets.tobytes()
+    block.buf[offsets.nbytes:offsets.nbytes + int(offsets[-1])] = b"".join(encoded)
+    block.close()
+    return block.name
+
+
+def read_texts(name: str, indices: Optional[Sequence[int]] = None) -> List[str]:
+    """Texts of a block made by share_texts: all of them, or those at `indices`."""
+    block = SharedMemory(name=name)
+    try:
+        count = int(np.frombuffer(bytes(block.buf[:_OFFSET.itemsize]), dtype=_OFFSET)[0])
+        header = _OFFSET.itemsize * (count + 2)
+        offsets = np.frombuffer(bytes(block.buf[_OFFSET.itemsize:header]), dtype=_OFFSET) + header
+        return [
+            str(block.buf[offsets[i]:offsets[i + 1]], "utf-8")
+            for i in (range(count) if indices is None else indices)
+        ]
+    finally:
+        block.close()
+
+
+def share_vectors(vectors: np.ndarray) -> str:
+    """Copy a float32 array into a new shared memory block and return its name."""
+    block = SharedMemory(create=True, size=max(1, vectors.nbytes))
+    np.ndarray(vectors.shape, dtype=np.float32, buffer=block.buf)[:] = vectors
+    block.close()
+    return block.name
+
+
+def release(name: str):
+    """Free a shared memory block once nobody reads it anymore."""
+    try:
+        block = SharedMemory(name=name)
+    except FileNotFoundError:
+        return
+    block.close()
+    block.unlink()
+
+
+# =========================
+# Sources and checkpoint
+# =========================
+def _is_url(source: str) -> bool:
+    return source.startswith(("http://", "https://"))
+
+
+def collect_sources(paths: Sequence[str], url_lists: Sequence[str] = (), base_url: str = None) -> List[Tuple[str, str]]:
+    """
+    Documents to ingest, as (source, url) pairs.
+
+    Args:
+        paths: Directories (searched recursively), files or document URLs
+        url_lists: Files with one document URL per line
+        base_url: URL the library is served under. A local file then gets the
+            url base_url/<path relative to the directory given>, and so the
+            document id the API computes for that URL; otherwise its file:// URI.
+
+    Returns:
+        list: (path or URL to read the document from, URL it is indexed under),
+        without duplicates
+    """
+    sources = {}
+
+    def add_file(path: Path, root: Path):
+        if path.suffix.lower().lstrip(".") not in SUPPORTED_EXTENSIONS:
+            return
+        if base_url:
+            url = f"{base_url.rstrip('/')}/{path.relative_to(root).as_posix()}"
+        else:
+            url = path.resolve().as_uri()
+        sources.setdefault(url, str(path))
+
+    for entry in paths:
+        if _is_url(entry):
+            sources.setdefault(entry, entry)
+            continue
+        path = Path(entry)
+        if path.is_dir():
+            for file in sorted(path.rglob("*")):
+                if file.is_file():
+                    add_file(file, path)
+        elif path.is_file():
+            add_file(path, path.parent)
+        else:
+            logger.warning(f"⚠️ Skipping {entry}: no such file or directory")
+
+    for url_list in url_lists:
+        with open(url_list, encoding="utf-8") as f:
+            for line in f:
+                url = line.strip()
+                if url and not url.startswith("#"):
+                    sources.setdefault(url, url)
+
+    return [(source, url) for url, source in sources.items()]
+
+
+def load_checkpoint(path: str) -> Dict[str, dict]:
+    """Documents a previous run finished storing, by document id."""
+    done = {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # last line of an interrupted run
+                if record.get("status") == registry.STATUS_READY:
+                    done[record["document_id"]] = record
+                else:
+                    done.pop(record["document_id"], None)
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def _checkpoint(path: str, record: dict):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+# =========================
+# Parse workers
+# =========================
+async def _extract(source: str) -> Optional[str]:
+    if _is_url(source):
+        download = await fetcher.fetch_document(source)
+        if not download:
+            raise ValueError("download failed")
+        body, file_ext = download
+        try:
+            return await fetcher.extract_text(body, file_ext)
+        finally:
+            fetcher.release(body)
+    path = Path(source)
+    return await fetcher.extract_text(path, path.suffix.lower().lstrip("."))
+
+
+def _parse(source: str, url: str) -> dict:
+    """Parse worker: extract and chunk one document; its chunk texts go to a shared memory block."""
+    start = time.perf_counter()
+    result = {"url": url, "document_id": registry.document_id_for(url)}
+    try:
+        text = asyncio.run(_extract(source))
+        chunks = chunker.chunk_text(text) if text else []
+        if not chunks:
+            raise ValueError("no text extracted")
+        result.update(
+            texts=share_texts(chunks),
+            chunks=len(chunks),
+            hashes=[chunker.chunk_hash(chunk) for chunk in chunks],
+        )
+    except Exception as e:
+        result["error"] = getattr(e, "detail", None) or str(e) or type(e).__name__
+    result["parse_s"] = time.perf_counter() - start
+    return result
+
+
+# =========================
+# Embedding process
+# =========================
+def _embed_loop(requests, results, batch_size: int):
+    """
+    Embedding process: embed the new chunks of queued documents, filling
+    batches of about `batch_size` chunks across documents.
+
+    Requests are (document_id, texts block, chunk indices), None to stop.
+    """
+    import app.service.embedder as embedder
+
+    embedder.get_model()
+    stopping = False
+    while not stopping:
+        batch, size = [], 0
+        request = requests.get()
+        while request is not None:
+            batch.append(request)
+            size += len(request[2])
+            if size >= batch_size:
+                break
+            try:
+                request = requests.get(timeout=BATCH_WAIT)
+            except queue.Empty:
+                break
+        else:
+            stopping = True
+        if not batch:
+            continue
+
+        start = time.perf_counter()
+        documents = [(document_id, len(indices)) for document_id, _, indices in batch]
+        try:
+            texts = [text for _, name, indices in batch for text in read_texts(name, indices)]
+            vectors = np.asarray(embedder.embed_passages(texts), dtype=np.float32)
+            results.put(("embedded", {"documents": documents, "vectors": share_vectors(vectors),
+                                      "busy_s": time.perf_counter() - start}))
+        except Exception as e:
+            results.put(("embed_failed", {"documents": documents, "error": str(e),
+                                          "busy_s": time.perf_counter() - start}))
+    results.put(("stop", {}))
+
+
+# =========================
+# Plan and upsert (main process)
+# =========================
+def _store_loop(results, requests, slots: threading.Semaphore, stats: dict, checkpoint: str, fresh: bool):
+    """
+    Plan parsed documents, send their new chunks to the embedding process and
+    store embedded batches. Every finished document releases a slot.
+
+    With `fresh` (the collection was empty when the run started) no document
+    can have stored points, so they are not looked up.
+    """
+    pending = {}  # document_id -> parse result and plan, until stored
+
+    def finish(document: dict, error: str = None):
+        pending.pop(document["document_id"], None)
+        if document.get("texts"):
+            release(document["texts"])
+        if error:
+            stats["failed"] += 1
+            logger.error(f"Ingestion failed for {document['url']}: {error}")
+            registry.mark_failed(document["document_id"], document["url"])
+            _checkpoint(checkpoint, {"document_id": document["document_id"], "url": document["url"],
+                                     "status": registry.STATUS_FAILED, "error": error})
+        else:
+            stats["indexed"] += 1
+            registry.mark_ready(document["document_id"], document["url"], document["chunks"])
+            _checkpoint(checkpoint, {"document_id": document["document_id"], "url": document["url"],
+                                     "status": registry.STATUS_READY, "chunks": document["chunks"],
+                                     "embedded": len(document["new"]), "at": time.time()})
+        slots.release()
+
+    def store(documents: List[dict], vectors_block: Optional[str]):
+        start = time.perf_counter()
+        block = SharedMemory(name=vectors_block) if vectors_block else None
+        vectors = None
+        try:
+            rows = sum(len(d["new"]) for d in documents)
+            # Points are written straight from the shared block
+            vectors = (np.ndarray((rows, vector_store.VECTOR_SIZE), dtype=np.float32, buffer=block.buf)
+                       if block else np.zeros((0, vector_store.VECTOR_SIZE), dtype=np.float32))
+            for d in documents:
+                chunk_store.write(d["document_id"], read_texts(d["texts"]), d["ids"], d["url"])
+            vector_store.write_points(
+                [d["ids"][i] for d in documents for i in d["new"]],
+                vectors,
+                [{"document_id": d["document_id"], "chunk_index": i} for d in documents for i in d["new"]],
+                [operation for d in documents for operation in d["operations"]],
+            )
+        except Exception as e:
+            for d in documents:
+                finish(d, f"storing failed: {e}")
+            return
+        finally:
+            vectors = None  # the block cannot be closed while an array views it
+            if block:
+                block.close()
+                block.unlink()
+            stats["upsert_s"] += time.perf_counter() - start
+
+        for d in documents:
+            stats["chunks"] += d["chunks"]
+            stats["embedded"] += len(d["new"])
+            stats["deleted"] += d["deleted"]
+            finish(d)
+
+    while True:
+        kind, message = results.get()
+        if kind == "stop":
+            return
+        if kind == "parsed":
+            stats["parse_s"] += message["parse_s"]
+            if "error" in message:
+                finish(message, message["error"])
+                continue
+            start = time.perf_counter()
+            try:
+                if fresh:
+                    ids = vector_store.chunk_point_ids(message["document_id"], message["hashes"])
+                    plan = {"ids": ids, "new": list(range(len(ids))), "operations": [], "deleted": 0}
+                else:
+                    plan = vector_store.plan_sync(message["document_id"], message["hashes"])
+            except Exception as e:
+                finish(message, f"reading stored points failed: {e}")
+                continue
+            finally:
+                stats["plan_s"] += time.perf_counter() - start
+            document = pending[message["document_id"]] = {**message, **plan}
+            if plan["new"]:
+                requests.put((document["document_id"], document["texts"], plan["new"]))
+            else:
+                store([document], None)
+        elif kind == "embedded":
+            stats["embed_s"] += message["busy_s"]
+            stats["batches"] += 1
+            store([pending[document_id] for document_id, _ in message["documents"]], message["vectors"])
+        elif kind == "embed_failed":
+            stats["embed_s"] += message["busy_s"]
+            for document_id, _ in message["documents"]:
+                finish(pending[document_id], f"embedding failed: {message['error']}")
+
+
+def _acquire(slots: threading.Semaphore, embedding, store_thread: Optional[threading.Thread]):
+    """Take a slot, unless the stage that would free it is gone."""
+    while not slots.acquire(timeout=1):
+        if not embedding.is_alive():
+            raise RuntimeError(f"The embedding process died (exit code {embedding.exitcode})")
+        if store_thread is not None and not store_thread.is_alive():
+            raise RuntimeError("The store thread died")
+
+
+def ingest(
+    sources: Sequence[Tuple[str, str]],
+    workers: int = BULK_PARSE_WORKERS,
+    batch_size: int = BULK_EMBED_BATCH,
+    checkpoint: str = BULK_CHECKPOINT_PATH,
+    hooks=(),
+) -> dict:
+    """
+    Index documents in bulk, skipping those already in the checkpoint.
+
+    Args:
+        sources: (source, url) pairs from collect_sources
+        workers: Parse processes
+        batch_size: Chunks per embedding call
+        checkpoint: JSONL file of finished documents, appended to as they finish
+        hooks: Functions run before the worker processes are forked (e.g. to
+            install test stand-ins)
+
+    Returns:
+        dict: Run report (see print_report)
+    """
+    for hook in hooks:
+        hook()
+    started = time.perf_counter()
+    done = load_checkpoint(checkpoint)
+    todo = [(source, url) for source, url in sources if registry.document_id_for(url) not in done]
+    logger.info(f"{len(sources)} documents, {len(sources) - len(todo)} already in the checkpoint {checkpoint}")
+    Path(checkpoint).parent.mkdir(parents=True, exist_ok=True)
+
+    stats = dict.fromkeys(("indexed", "failed", "chunks", "embedded", "deleted", "batches"), 0)
+    stats.update(dict.fromkeys(("parse_s", "plan_s", "embed_s", "upsert_s"), 0.0))
+    if todo:
+        _run(todo, workers, batch_size, checkpoint, stats)
+    seconds = time.perf_counter() - started
+    return {
+        "documents": len(sources),
+        "skipped": len(sources) - len(todo),
+        "indexed": stats["indexed"],
+        "failed": stats["failed"],
+        "chunks": stats["chunks"],
+        "embedded": stats["embedded"],
+        "deleted": stats["deleted"],
+        "seconds": seconds,
+        "docs_per_s": stats["indexed"] / seconds,
+        "chunks_per_s": stats["chunks"] / seconds,
+        "stages": {
+            # utilization: busy time over the run's wall time, per process or thread of the stage
+            "parse": _stage(stats["parse_s"], seconds, max(1, workers)),
+            "plan": _stage(stats["plan_s"], seconds),
+            "embed": dict(_stage(stats["embed_s"], seconds), batches=stats["batches"],
+                          chunks_per_batch=stats["embedded"] / stats["batches"] if stats["batches"] else 0),
+            "upsert": _stage(stats["upsert_s"], seconds),
+        },
+    }
+
+
+def _run(todo, workers: int, batch_size: int, checkpoint: str, stats: dict):
+    # Documents parsed, or parsed and not stored yet, at any time. Also bounds
+    # how many documents the embedding process can batch together.
+    window = max(1, workers) * WINDOW_PER_WORKER
+    slots = threading.Semaphore(window)
+
+    # Fork every process before any thread starts; blocks are tracked (and
+    # freed if a process dies) by the single resource tracker they all share
+    context = multiprocessing.get_context("fork")
+    resource_tracker.ensure_running()
+    requests, results = context.Queue(), context.Queue()
+    embedding = context.Process(target=_embed_loop, args=(requests, results, batch_size), name="ingest-embedder")
+    embedding.start()
+    pool = ProcessPoolExecutor(max_workers=max(1, workers), mp_context=context)
+    store_thread = None
+    try:
+        for source, url in todo:
+            _acquire(slots, embedding, store_thread)
+            future = pool.submit(_parse, source, url)
+            future.add_done_callback(lambda f, url=url: results.put(("parsed", _parse_result(f, url))))
+            if store_thread is None:
+                # The first submit started the pool's processes
+                vector_store.init_collection()
+                fresh = vector_store.get_client().count(collection_name=vector_store.COLLECTION_NAME, exact=True).count == 0
+                store_thread = threading.Thread(
+                    target=_store_loop, args=(results, requests, slots, stats, checkpoint, fresh),
+                    name="ingest-store", daemon=True,
+                )
+                store_thread.start()
+        # Wait until every document is stored
+        for _ in range(window):
+            _acquire(slots, embedding, store_thread)
+        requests.put(None)
+        embedding.join()
+        store_thread.join()
+    finally:
+        pool.shutdown(cancel_futures=True)
+        if embedding.is_alive():
+            embedding.terminate()
+
+
+def _parse_result(future, url: str) -> dict:
+    # A parse worker that died (e.g. killed for memory) breaks the future, not the run
+    try:
+        return future.result()
+    except Exception as e:
+        return {"url": url, "document_id": registry.document_id_for(url), "error": f"parse worker failed: {e}", "parse_s": 0.0}
+
+
+def _stage(busy: float, seconds: float, processes: int = 1) -> dict:
+    return {"processes": processes, "busy_s": busy, "utilization": busy / (seconds * processes) if seconds else 0.0}
+
+
+def print_report(report: dict):
+    print(f"{report['indexed']} documents indexed, {report['failed']} failed, {report['skipped']} skipped (checkpoint)")
+    print(f"{report['chunks']} chunks ({report['embedded']} embedded, {report['deleted']} stale points deleted) "
+          f"in {report['seconds']:.1f}s: {report['docs_per_s']:.2f} docs/s, {report['chunks_per_s']:.0f} chunks/s")
+    print(f"{'stage':<8}{'procs':>6}{'busy s':>10}{'util':>7}")
+    for name, stage in report["stages"].items():
+        print(f"{name:<8}{stage['processes']:>6}{stage['busy_s']:>10.1f}{stage['utilization']:>7.0%}")
+    embed = report["stages"]["embed"]
+    if embed["batches"]:
+        print(f"{embed['batches']} embedding batches, {embed['chunks_per_batch']:.0f} chunks each on average")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk offline ingestion of a document library.")
+    parser.add_argument("sources", nargs="*", help="directories, files or document URLs")
+    parser.add_argument("--urls", action="append", default=[], metavar="FILE", help="file with one document URL per line")
+    parser.add_argument("--base-url", help="URL the library is served under, so local files get the ids the API gives them")
+    parser.add_argument("--workers", type=int, default=BULK_PARSE_WORKERS, help="parse processes")
+    parser.add_argument("--batch", type=int, default=BULK_EMBED_BATCH, help="chunks per embedding call")
+    parser.add_argument("--checkpoint", default=BULK_CHECKPOINT_PATH)
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint: index every document again")
+    parser.add_argument("--report", help="also write the run report to this JSON file")
+    parser.add_argument("--snapshot", help="then export every indexed document to this index snapshot (SNAPSHOT_PATH)")
+    args = parser.parse_args(argv)
+
+    sources = collect_sources(args.sources, args.urls, args.base_url)
+    if not sources:
+        parser.error("no documents found")
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    report = ingest(sources, args.workers, args.batch, args.checkpoint)
+    print_report(report)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.snapshot:
+        snapshot.export(args.snapshot)
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
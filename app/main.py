@@ -2,13 +2,16 @@ import logging
 from contextlib import asynccontextmanager
 import asyncio
 import time
-from fastapi import FastAPI, Request
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-import app.utils.downloader as parser
-import uvicorn
 
-from app.config import APP_NAME, APP_VERSION, LOG_LEVEL
-from app.routes import rag
+from app.config import APP_NAME, APP_VERSION, LOG_LEVEL, PRELOAD_ON_STARTUP, SNAPSHOT_PATH, TRACE_HEADER
+from app.routes import rag, documents
+import app.service.ingestion as ingestion
+import app.service.admission as admission
+import app.service.snapshot as snapshot
+import app.service.tracing as tracing
 
 # Setup logging
 logging.basicConfig(
@@ -29,12 +32,25 @@ async def lifespan(app: FastAPI):
     # from app.services.qdrant import get_qdrant_service
     
     logger.info("Initializing services...")
-    
-    # Load embedding model at startup (will be cached)
-    # get_embedding_model()
-    
-    # # Initialize Qdrant connection
-    # qdrant_service = await get_qdrant_service()
+    tracing.setup()
+
+    # Heavy libraries and clients are imported lazily; load them before taking
+    # traffic rather than on the first request
+    if PRELOAD_ON_STARTUP:
+        await asyncio.to_thread(rag.warm_up)
+
+    # Documents indexed before this replica started are warm from the first request
+    if SNAPSHOT_PATH:
+        try:
+            await asyncio.to_thread(snapshot.load, SNAPSHOT_PATH)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not load index snapshot {SNAPSHOT_PATH}, starting cold: {e}")
+
+    # Background workers for POST /api/v1/documents
+    await ingestion.start(rag.vectorize)
+
+    # This worker's admission stats, for /metrics answered by the other workers
+    publisher = asyncio.create_task(admission.publish_periodically())
     
     logger.info("All services initialized successfully")
     
@@ -42,13 +58,16 @@ async def lifespan(app: FastAPI):
     
     # Shutdown: Cleanup resources
     logger.info("Shutting down...")
+    publisher.cancel()
+    await ingestion.stop()
+    tracing.shutdown()
 
 # Initialize FastAPI app
 app = FastAPI(
     title=APP_NAME,
     version=APP_VERSION,
     description="A fast and accurate RAG system API",
-    # lifespan=,
+    lifespan=lifespan,
     # Document authentication methods
     openapi_tags=[
         {
@@ -71,6 +90,19 @@ app.add_middleware(
 
 # Add routes with API version prefix
 app.include_router(rag.router, prefix="/api/v1", tags=["RAG"])
+app.include_router(documents.router, prefix="/api/v1", tags=["RAG"])
+
+@app.exception_handler(admission.Overloaded)
+async def overloaded_handler(request: Request, exc: admission.Overloaded):
+    """
+    Fast rejection when a lane is saturated, so clients back off instead of piling up.
+    """
+    logger.warning(f"Rejected {request.method} {request.url.path}: {exc}")
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 # Add request timing middleware
 @app.middleware("http")
@@ -89,6 +121,24 @@ async def add_process_time_header(request: Request, call_next):
     logger.info(f"Request processed in {process_time:.2f}s: {request.method} {request.url.path}")
     
     return response
+
+@app.middleware("http")
+async def trace_request(request: Request, call_next):
+    """
+    Root span of the request (continuing a W3C traceparent if the caller sent
+    one). The trace id goes back in the TRACE_HEADER header.
+    """
+    with tracing.span(
+        f"{request.method} {request.url.path}",
+        headers=request.headers,
+        **{"http.method": request.method, "http.target": request.url.path},
+    ) as span:
+        response = await call_next(request)
+        span.set_attribute("http.status_code", response.status_code)
+        trace_id = tracing.trace_id()
+        if trace_id:
+            response.headers[TRACE_HEADER] = trace_id
+    return response
   
 @app.get("/", tags=["Root"])
 async def root():
@@ -105,13 +155,20 @@ async def root():
         "docs_url": "/docs"
     }
     
+@app.get("/metrics", tags=["Root"], dependencies=[Depends(rag.verify_auth)])
+async def metrics():
+    """
+    Admission control metrics (active, queue depth, wait times per lane),
+    summed over all server workers (`workers`). Scale out on qa/ingest
+    `queued` and `wait_p95_s`; `background` counts ingestion jobs waiting
+    outside the bounded queue. Same authentication as the API routes.
+    """
+    return admission.server_stats()
+
 if __name__ == "__main__":
-    # Run the app with uvicorn when executed directly
-    uvicorn.run(
-        "app.main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,  # Set to False in production
-        log_level=LOG_LEVEL.lower()
-    )
+    # Same as `python -m app.server`: pre-fork workers sharing one copy of the
+    # model (SERVER_WORKERS); pass --reload for development
+    from app.server import main
+
+    main()
 
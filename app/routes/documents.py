@@ -0,0 +1,45 @@
+import app.service.ingestion as ingestion
+from app.routes.rag import verify_auth
+from fastapi import APIRouter, HTTPException, Depends
+from pydantic import BaseModel
+import logging
+
+router = APIRouter(prefix="/documents")
+logger = logging.getLogger(__name__)
+
+
+class DocumentRequest(BaseModel):
+    url: str
+
+
+@router.post("", status_code=202, tags=["RAG"], dependencies=[Depends(verify_auth)])
+async def create_document(request: DocumentRequest):
+    """
+    Enqueue a document URL (eml, .pdf, .docx) for background ingestion.
+    args:
+        url: Document URL to ingest
+    Returns:
+        dict: Job id, document id and job status
+    Raises:
+        HTTPException: If the ingestion queue is full
+    """
+    try:
+        job = ingestion.submit(request.url)
+    except ingestion.QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    return {"job_id": job["job_id"], "document_id": job["document_id"], "status": job["status"]}
+
+
+@router.get("/jobs/{job_id}", tags=["RAG"], dependencies=[Depends(verify_auth)])
+async def get_document_job(job_id: str):
+    """
+    Status of an ingestion job.
+    Returns:
+        dict: Job record (status is one of queued, running, succeeded, failed)
+    Raises:
+        HTTPException: If the job id is unknown
+    """
+    job = ingestion.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job
@@ -3,6 +3,14 @@ import app.service.chunker as chunker
 import app.service.embedder as embedder
 import app.service.vector_store as vector_store
 import app.service.retrival as retrival
+import app.service.registry as registry
+import app.service.artifact_store as artifact_store
+import app.service.admission as admission
+import app.service.deadline as deadline
+import app.service.tracing as tracing
+import app.service.chunk_store as chunk_store
+import asyncio
+import time
 from fastapi import APIRouter, HTTPException, Depends, Header, Security
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import logging
@@ -11,12 +19,22 @@ from app.config import(
   AUTH_TOKEN,
   ENABLE_AUTH,
   APP_VERSION,
+  INGEST_PARALLELISM,
+  INGEST_LEASE_TIMEOUT,
+  INGEST_POLL_INTERVAL,
+  DEADLINE_HEADER,
+  ASYNC_TIMEOUT,
+  PROGRESSIVE_INDEXING,
+  PROGRESSIVE_MIN_PAGES,
+  PROGRESSIVE_FIRST_PAGES,
 )
 from pydantic import BaseModel
-from typing import List
+from typing import Dict, List, Optional, Union
 
 router = APIRouter(prefix="/hackrx")
 logger = logging.getLogger(__name__)
+_background_tasks = set()  # Keeps progressive indexing tasks referenced until done
+_inflight: Dict[str, list] = {}  # document_id -> [ingestion task, callers waiting for it]
 security = HTTPBearer(auto_error=False)
 async def verify_auth(
     api_key= Header(None, alias=API_KEY_HEADER),
@@ -62,60 +80,319 @@ async def verify_auth(
 #     """
 #     return HealthResponse(status="ok", version=APP_VERSION)
 class RAGRequest(BaseModel):
-    documents: str
+    documents: Optional[Union[str, List[str]]] = None
+    document_id: Optional[Union[str, List[str]]] = None
     questions: List[str]
+    hnsw_ef: Optional[int] = None  # Search accuracy/latency trade-off
+    exact: Optional[bool] = None  # Full scan instead of the HNSW index
+
+
+def _as_list(value) -> List[str]:
+    if not value:
+        return []
+    return [value] if isinstance(value, str) else list(value)
 
 
 @router.post("/run", tags=["RAG"], dependencies=[Depends(verify_auth)])
-async def run_rag(request: RAGRequest):
+async def run_rag(
+    request: RAGRequest,
+    request_timeout: Optional[float] = Header(None, alias=DEADLINE_HEADER),
+):
     """
-    Runs the batch processing pipeline for a document URL (eml, .pdf, .docx).
+    Runs the batch processing pipeline for one or more document URLs (eml, .pdf, .docx).
+    Documents already ingested (e.g. via POST /documents) are not processed again,
+    the rest are ingested concurrently before answering.
+
+    Every stage runs under the request deadline (REQUEST_TIMEOUT, or a shorter
+    budget in seconds from the DEADLINE_HEADER header). Stages still running at
+    the deadline are cancelled and the answers completed so far are returned.
     args:
-        url: Document URL to process
+        documents: Document URL, or list of URLs, to process
+        document_id: Id, or list of ids, of already-ingested documents
+        questions: Questions to answer from the documents
+        hnsw_ef, exact: Optional vector search overrides
+    Long PDFs may still be indexing in the background (progressive indexing);
+    answers then come from the pages indexed so far.
     Returns:
-        dict: Processing status
+        dict: Answers to the questions, with a status per question
+        (answered, deadline_exceeded or error), and the share of each
+        document's pages that was indexed ("index_completeness")
     Raises:
-        HTTPException: If document not found or processing fails
+        HTTPException: If document not found or processing fails (404/500), or
+            if a document_id is indexed but its chunk texts are not on this server (409)
+        admission.Overloaded: If the server is saturated (429/503 with Retry-After)
     """
-    isProcessed = await vectorize(request.documents)
-    if not isProcessed:
-        raise HTTPException(status_code=500, detail="Processing failed")
-    
-    result = retrival.llm_inference(request.questions)
+    urls = _as_list(request.documents)
+    document_ids = _as_list(request.document_id)
+    if not urls and not document_ids:
+        raise HTTPException(status_code=422, detail="Either 'documents' or 'document_id' is required")
+
+    for document_id in document_ids:
+        if not registry.is_searchable(document_id) and not vector_store.has_document(document_id):
+            raise HTTPException(status_code=404, detail=f"Document '{document_id}' has not been ingested")
+
+    # Keep request order, drop duplicates
+    document_ids = list(dict.fromkeys(document_ids + [registry.document_id_for(url) for url in urls]))
+    tracing.set_attributes(questions=len(request.questions), documents=len(document_ids))
+
+    with deadline.scope(deadline.budget(request_timeout)):
+        # Questions do not depend on the documents: embed them while the documents are ingested
+        embedding = asyncio.create_task(_timed(asyncio.to_thread(retrival.embed_queries, request.questions)))
+        embedding.add_done_callback(lambda task: task.cancelled() or task.exception())  # never left unretrieved
+        try:
+            cold_urls = [url for url in dict.fromkeys(urls) if not registry.is_searchable(registry.document_id_for(url))]
+            if cold_urls:
+                ingest_s, _ = await _timed(deadline.run(vectorize_many(cold_urls), "ingestion"))
+            # Requests on already-indexed documents go ahead of those that just ingested
+            priority = admission.PRIORITY_COLD if cold_urls else admission.PRIORITY_WARM
+
+            async with admission.qa.slot(priority):
+                # Search starts as soon as both the vectors and the question embeddings are ready
+                embed_s, query_vectors = await deadline.run(asyncio.shield(embedding), "query embedding")
+                if cold_urls:
+                    logger.info(
+                        f"Query embedding ({embed_s:.2f}s) overlapped ingestion ({ingest_s:.2f}s): "
+                        f"critical path {min(embed_s, ingest_s):.2f}s shorter"
+                    )
+                result = await asyncio.to_thread(
+                    retrival.llm_inference,
+                    request.questions,
+                    document_ids,
+                    hnsw_ef=request.hnsw_ef,
+                    exact=request.exact,
+                    query_vectors=query_vectors,
+                )
+        except deadline.DeadlineExceeded as e:
+            logger.warning(f"{e}, no questions answered")
+            result = retrival.unanswered(request.questions)
+        except chunk_store.MissingTextsError as e:
+            logger.error(f"⚠️ {e}")
+            raise HTTPException(status_code=409, detail=str(e))
+        finally:
+            embedding.cancel()
     if not result:
         raise HTTPException(status_code=404, detail="No answers found for the provided questions")
+    result["index_completeness"] = {document_id: registry.completeness(document_id) for document_id in document_ids}
     return result
 
 
-async def vectorize(url: str):
+def warm_up():
+    """Import heavy libraries, load the embedding model and create clients."""
+    embedder.get_model()
+    fetcher.get_parser()
+    vector_store.get_client()
+    retrival.get_client()
+    retrival.get_groq_client()
+    logger.info("Embedding model and clients loaded")
+
+
+async def _timed(awaitable):
+    """Await `awaitable`, returning (seconds taken, result)."""
+    start = time.perf_counter()
+    result = await awaitable
+    return time.perf_counter() - start, result
+
+
+async def vectorize_many(urls: List[str], parallelism: int = INGEST_PARALLELISM):
+    """
+    Ingest several documents concurrently, at most `parallelism` at a time,
+    each holding a slot of the server-wide ingestion lane.
+
+    Raises:
+        HTTPException: The first failure, once every document has finished
+        admission.Overloaded: If the ingestion lane rejected a document
+    """
+    semaphore = asyncio.Semaphore(parallelism)
+
+    async def _bounded(url: str):
+        document_id = registry.document_id_for(url)
+        if document_id in _inflight or registry.ingesting_elsewhere(document_id):
+            return await vectorize(url)  # joins an ingestion that already holds its slot
+        async with semaphore, admission.ingest.slot(admission.PRIORITY_INTERACTIVE):
+            return await vectorize(url)
+
+    results = await asyncio.gather(*(_bounded(url) for url in urls), return_exceptions=True)
+    for url, result in zip(urls, results):
+        if isinstance(result, Exception):
+            logger.error(f"Ingestion failed for {url}: {result}")
+            raise result
+    return results
+
+
+async def vectorize(url: str, document_id: str = None, progressive: bool = None):
     """
     End-to-end processing pipeline:
     - Download document
     - Chunk text
-    - Save chunks
-    - Embed chunks
-    - Upload vectors to Qdrant
+    - Embed chunks not already indexed for this document
+    - Sync vectors to Qdrant (upsert new, delete stale)
+
+    CPU-bound and blocking steps run in worker threads so that the event
+    loop keeps serving other requests while a document is ingested.
+
+    With `progressive` (default PROGRESSIVE_INDEXING, off), PDFs of
+    PROGRESSIVE_MIN_PAGES pages or more are first indexed from a quick local
+    preview (first pages plus outline) and marked partial; the full document
+    is parsed and indexed in the background. Answers given meanwhile only
+    see the preview.
+
+    Single-flight: while a document is being ingested, further calls for it
+    (another request, or a POST /documents job) wait for that ingestion
+    instead of starting their own, in this worker or another one. It is
+    cancelled only when every caller waiting for it is.
     """
-    document = await fetcher.document_downloader(url)
+    progressive = PROGRESSIVE_INDEXING if progressive is None else progressive
+    document_id = document_id or registry.document_id_for(url)
+    flight = _inflight.get(document_id)
+    if flight is None:
+        task = asyncio.create_task(_ingest(url, document_id, progressive))
+        flight = _inflight[document_id] = [task, 0]
+
+        def _landed(_):
+            if _inflight.get(document_id) is flight:
+                del _inflight[document_id]
+
+        task.add_done_callback(_landed)
+    else:
+        logger.info(f"Document {document_id} is already being ingested, waiting for it")
+
+    task = flight[0]
+    flight[1] += 1
+    try:
+        return await asyncio.shield(task)
+    except asyncio.CancelledError:
+        if flight[1] == 1 and not task.done():
+            # Nobody else waits for it: stop it, and let the next caller start afresh
+            task.cancel()
+            if _inflight.get(document_id) is flight:
+                del _inflight[document_id]
+        raise
+    finally:
+        flight[1] -= 1
+
+
+async def _ingest(url: str, document_id: str, progressive: bool):
+    waited = False
+    while not registry.claim(document_id, url):
+        if not waited:
+            logger.info(f"Document {document_id} is being ingested by another worker, waiting for it")
+            waited = True
+        await asyncio.sleep(INGEST_POLL_INTERVAL)
+    if waited and registry.is_searchable(document_id):
+        registry.release(document_id)
+        return {"retrieval": True, "document_id": document_id}
+
+    heartbeat = asyncio.create_task(_renew_lease(document_id))
+    try:
+        with tracing.span("vectorize", url=url.split("?")[0], document_id=document_id):
+            return await _vectorize(url, document_id, progressive)
+    except BaseException:
+        # Failed, or stopped at the request deadline; embeddings done so far stay
+        # cached, and a document that was already searchable stays so
+        registry.mark_failed(document_id, url)
+        raise
+    finally:
+        heartbeat.cancel()
+        registry.release(document_id)
+
+
+async def _renew_lease(document_id: str):
+    while True:
+        await asyncio.sleep(INGEST_LEASE_TIMEOUT / 3)
+        registry.renew(document_id)
+
+
+async def _vectorize(url: str, document_id: str, progressive: bool):
+    download = await fetcher.fetch_document(url, timeout=deadline.timeout(ASYNC_TIMEOUT))
+    if not download:
+        deadline.check("download")
+        raise HTTPException(status_code=404, detail="Document not found")
+    source, file_ext = download
     logger.info(f"Fetched document from URL: {url}")
+
+    keep_source = False
+    try:
+        if progressive and file_ext == "pdf" and await fetcher.cached_text(source, file_ext) is None:
+            preview = await _pdf_preview(source)
+            if preview:
+                text, covered, pages = preview
+                chunks = await _index_text(url, document_id, text)
+                registry.mark_partial(document_id, url, chunks, covered / pages)
+                logger.info(f"Indexed pages 1-{covered} of {pages} plus outline; indexing the rest in the background")
+                keep_source = True
+                task = asyncio.create_task(_complete_index(url, document_id, source, file_ext))
+                _background_tasks.add(task)
+                task.add_done_callback(_background_tasks.discard)
+                return {"retrieval": True, "document_id": document_id, "completeness": covered / pages}
+
+        try:
+            document = await fetcher.extract_text(source, file_ext)
+        except Exception as e:
+            logger.error(f"Error processing document: {e}")
+            document = None
+    finally:
+        if not keep_source:
+            fetcher.release(source)
+
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
+    chunks = await _index_text(url, document_id, document)
+    registry.mark_ready(document_id, url, chunks)
+    return {"retrieval": True, "document_id": document_id}
 
-    chunks = chunker.chunk_text(document)
-    logger.info(f"Chunking completed. Total chunks: {len(chunks)}")
 
+async def _pdf_preview(source):
     try:
-        chunked_file_path = chunker.save_chunks(chunks, url)
-        logger.info(f"Chunked text saved. Path: {chunked_file_path}")
+        return await asyncio.to_thread(fetcher.pdf_preview, source, PROGRESSIVE_FIRST_PAGES, PROGRESSIVE_MIN_PAGES)
+    except Exception as e:
+        logger.warning(f"PDF preview failed, indexing the whole document at once: {e}")
+        return None
+
+
+async def _complete_index(url: str, document_id: str, source, file_ext: str):
+    """
+    Background half of progressive indexing: parse and index the whole
+    document. The preview's chunks are replaced through the incremental sync.
+    """
+    # Not bound by the deadline of the request that started it, nor part of its trace
+    with deadline.scope(None), tracing.span("complete_index", new_trace=True, url=url.split("?")[0], document_id=document_id):
+        try:
+            async with admission.ingest.slot(admission.PRIORITY_BACKGROUND, bounded=False):
+                document = await fetcher.extract_text(source, file_ext)
+                if not document:
+                    raise ValueError("no text extracted")
+                chunks = await _index_text(url, document_id, document)
+            registry.mark_ready(document_id, url, chunks)
+            logger.info(f"Progressive indexing of {url} complete")
+        except Exception as e:
+            # The partial index stays searchable
+            logger.error(f"Completing the index of {url} failed: {getattr(e, 'detail', None) or e}")
+        finally:
+            fetcher.release(source)
+
 
-        embed_path = embedder.embed_chunks(chunked_file_path, source_file=url)
-        logger.info(f"Embedding completed. Path: {embed_path}")
+async def _index_text(url: str, document_id: str, document: str) -> int:
+    """Chunk the text and sync the document's vectors; returns the number of chunks."""
+    chunks_key = artifact_store.content_key(f"{chunker.CHUNK_SIZE}:{chunker.CHUNK_OVERLAP}:{document}".encode("utf-8"))
+    chunks = await asyncio.to_thread(
+        artifact_store.cached_json, "chunks", chunks_key, lambda: chunker.chunk_text(document)
+    )
+    logger.info(f"Chunking completed. Total chunks: {len(chunks)}")
 
-        vector_store.upload_qdrant_ready_file(embed_path)
-        logger.info(f"Vectors uploaded to Qdrant collection '{vector_store.COLLECTION_NAME}'.")
+    try:
+        hashes = [chunker.chunk_hash(chunk) for chunk in chunks]
+        stats = await asyncio.to_thread(
+            vector_store.sync_document, document_id, chunks, hashes, embedder.embed_passages, url
+        )
+        logger.info(
+            f"Vectors synced to Qdrant collection '{vector_store.COLLECTION_NAME}': "
+            f"{stats['embedded']} embedded, {stats['reused']} reused, {stats['deleted']} deleted."
+        )
 
+    except deadline.DeadlineExceeded:
+        raise
     except Exception as e:
         logger.error(f"Error during processing: {e}")
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
-    return {"retrieval": True}
+    return len(chunks)
@@ -0,0 +1,199 @@
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+from app.config import (
+    LOG_LEVEL,
+    SERVER_HOST,
+    SERVER_PORT,
+    SERVER_WORKERS,
+    TORCH_THREADS_PER_WORKER,
+)
+
+# Pre-fork server: the master process loads the embedding model (and torch)
+# once, then forks the workers. Model weights are never written after loading,
+# so their pages stay shared copy-on-write between all workers instead of
+# every worker holding its own copy.
+#
+#   python -m app.server --workers 4
+#
+# Network clients (Qdrant, Groq, LlamaParse) and the artifact and state store
+# connections are not created in the master: each worker opens its own.
+# Qdrant must run as a server; the in-process local mode is per-process.
+# The document registry and ingestion jobs are in the state store (SQLite), so
+# every worker sees the same; admission limits are split between the workers.
+logging.basicConfig(
+    level=getattr(logging, LOG_LEVEL),
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+RESPAWN_BACKOFF = 1.0  # seconds before replacing a worker that died
+STOP_TIMEOUT = 30  # seconds workers get to finish in-flight requests
+
+
+def torch_threads(workers: int) -> int:
+    """Intra-op threads per worker: TORCH_THREADS_PER_WORKER, else an even share of the cores."""
+    if TORCH_THREADS_PER_WORKER > 0:
+        return TORCH_THREADS_PER_WORKER
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def preload(threads: int, hooks=()):
+    """
+    Load read-only resources in the master, before forking.
+
+    Args:
+        threads: Torch threads per worker; also applied to OpenMP/MKL, which
+            read it when torch is imported
+        hooks: Functions run after loading (e.g. to install test stand-ins)
+    """
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(var, str(threads))
+    # Tokenizer thread pools do not survive a fork
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+    import app.service.embedder as embedder
+    from app.main import app
+
+    start = time.perf_counter()
+    embedder.get_model()
+    for hook in hooks:
+        hook()
+    logger.info(f"✅ Preloaded the embedding model in {time.perf_counter() - start:.1f}s")
+
+    # Keep everything loaded so far out of the garbage collector's scans: a
+    # collection would otherwise write to (and so un-share) those pages
+    gc.freeze()
+    return app
+
+
+def _serve(app, sock: socket.socket, threads: int):
+    """Run one uvicorn worker on the inherited listening socket."""
+    import uvicorn
+
+    if "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads)
+    config = uvicorn.Config(app, log_level=LOG_LEVEL.lower(), timeout_graceful_shutdown=STOP_TIMEOUT)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _spawn(app, sock: socket.socket, threads: int, workers: int, index: int) -> int:
+    pid = os.fork()
+    if pid:
+        return pid
+    # Worker: uvicorn installs its own SIGINT/SIGTERM handlers
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    import app.service.admission as admission
+
+    admission.share(workers, index)
+    code = 0
+    try:
+        _serve(app, sock, threads)
+    except BaseException:
+        logger.exception(f"Worker {os.getpid()} crashed")
+        code = 1
+    finally:
+        logging.shutdown()
+        os._exit(code)
+
+
+def serve(host: str = SERVER_HOST, port: int = SERVER_PORT, workers: int = SERVER_WORKERS, hooks=()):
+    """
+    Preload, bind, fork `workers` workers and supervise them until SIGTERM/SIGINT.
+
+    Workers that exit unexpectedly are replaced. On shutdown every worker gets
+    SIGTERM and STOP_TIMEOUT seconds to drain before it is killed.
+    """
+    threads = torch_threads(workers)
+    app = preload(threads, hooks)
+    sock = socket.create_server((host, port), backlog=2048)
+    sock.set_inheritable(True)
+    logger.info(f"Listening on http://{host}:{sock.getsockname()[1]} with {workers} workers x {threads} torch threads")
+
+    if workers <= 1 or not hasattr(os, "fork"):
+        _serve(app, sock, threads)
+        return
+
+    import app.service.admission as admission
+    import app.service.state_store as state_store
+
+    state_store.close()  # opened by preload hooks, if any: not to be shared with the workers
+    if min(admission.ingest.limit, admission.qa.limit) < workers:
+        logger.warning(f"⚠️ {workers} workers each keep at least one slot of every admission lane, more than its limit")
+
+    stop_deadline = None
+
+    def _stop(signum, frame):
+        nonlocal stop_deadline
+        if stop_deadline is None:
+            stop_deadline = time.monotonic() + STOP_TIMEOUT
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    children = {}  # pid -> (start time, worker index)
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    for index in range(workers):
+        pid = _spawn(app, sock, threads, workers, index)
+        children[pid] = (time.monotonic(), index)
+
+    # Polled rather than a blocking waitpid: a signal does not interrupt that
+    # one (it is retried after the handler), so the stop deadline would only
+    # be checked once some worker had exited
+    while children:
+        if stop_deadline is not None and time.monotonic() > stop_deadline:
+            logger.warning(f"⚠️ Killing {len(children)} workers that did not stop in {STOP_TIMEOUT}s")
+            for pid in children:
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+            stop_deadline = float("inf")
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if not pid:
+            time.sleep(0.1)
+            continue
+        child = children.pop(pid, None)
+        if child is None or stop_deadline is not None:
+            continue
+        started, index = child
+        logger.warning(f"⚠️ Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, replacing it")
+        if time.monotonic() - started < RESPAWN_BACKOFF * 5:
+            time.sleep(RESPAWN_BACKOFF)  # crashing on startup: do not spin
+        children[_spawn(app, sock, threads, workers, index)] = (time.monotonic(), index)
+
+    sock.close()
+    logger.info("All workers stopped")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-fork production server for the RAG API.")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS)
+    parser.add_argument("--reload", action="store_true", help="development: single process, restart on code changes")
+    args = parser.parse_args(argv)
+
+    if args.reload:
+        import uvicorn
+
+        uvicorn.run("app.main:app", host=args.host, port=args.port, reload=True, log_level=LOG_LEVEL.lower())
+        return
+    serve(args.host, args.port, args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+import numpy as np
+
+import app.service.deadline as deadline
+import app.service.state_store as state_store
+from app.config import (
+    ADMISSION_INGEST_CONCURRENCY,
+    ADMISSION_INGEST_QUEUE,
+    ADMISSION_QA_CONCURRENCY,
+    ADMISSION_QA_QUEUE,
+    ADMISSION_MAX_WAIT,
+    METRICS_PUBLISH_INTERVAL,
+)
+
+logger = logging.getLogger(__name__)
+
+# Lower value = served first
+PRIORITY_WARM = 0  # QA on documents that were already indexed
+PRIORITY_COLD = 1  # QA right after ingesting a document in the same request
+PRIORITY_INTERACTIVE = 0  # Ingestion a client is waiting on
+PRIORITY_BACKGROUND = 1  # Ingestion jobs from POST /documents
+
+
+class Overloaded(Exception):
+    """Raised when a lane cannot admit a request; maps to 429 (queue full) or 503 (waited too long)."""
+
+    def __init__(self, lane: str, status_code: int, retry_after: int):
+        reason = "queue is full" if status_code == 429 else "wait timed out"
+        super().__init__(f"Server busy: {lane} {reason}, retry in {retry_after}s")
+        self.lane = lane
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class Lane:
+    """
+    Concurrency limit with a bounded, priority-ordered wait queue.
+
+    Up to `limit` holders run at once. Further callers wait in priority
+    order (FIFO within a priority). When `max_queue` callers are already
+    waiting, new callers are rejected immediately. Unbounded (background)
+    waiters are counted in `background`, not against `max_queue`.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, max_wait: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self.queued = 0
+        self.background = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._waiters = []  # heap of (priority, seq, future, bounded)
+        self._seq = itertools.count()
+        self._wait_times = deque(maxlen=500)
+        self._service_times = deque(maxlen=500)
+
+    @asynccontextmanager
+    async def slot(self, priority: int = 0, bounded: bool = True):
+        """
+        Hold one slot of the lane for the duration of the block.
+
+        Args:
+            priority: Lower is served first
+            bounded: False for internal background work, which waits without
+                queue or time limits instead of being rejected
+
+        Raises:
+            Overloaded: If the queue is full or the wait exceeds max_wait
+            deadline.DeadlineExceeded: If the request deadline expires while waiting
+        """
+        await self._acquire(priority, bounded)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._service_times.append(time.monotonic() - start)
+            self._release()
+
+    async def _acquire(self, priority: int, bounded: bool):
+        start = time.monotonic()
+        if self.active < self.limit and not self.queued and not self.background:
+            self.active += 1
+            self._admit(start)
+            return
+        if bounded and self.queued >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(self.name, 429, self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future, bounded))
+        self._count_waiter(bounded, 1)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=deadline.timeout(self.max_wait) if bounded else None)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done():
+                # The slot was handed over just as we gave up: pass it on
+                self._release()
+            else:
+                future.cancel()
+                self._count_waiter(bounded, -1)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            if deadline.expired():
+                raise deadline.DeadlineExceeded(f"admission ({self.name})")
+            self.timed_out += 1
+            raise Overloaded(self.name, 503, self.retry_after())
+        self._admit(start)
+
+    def _count_waiter(self, bounded: bool, delta: int):
+        if bounded:
+            self.queued += delta
+        else:
+            self.background += delta
+
+    def _admit(self, start: float):
+        self.admitted += 1
+        self._wait_times.append(time.monotonic() - start)
+
+    def _release(self):
+        while self._waiters:
+            _, _, future, bounded = heapq.heappop(self._waiters)
+            if not future.done():
+                # Hand the slot straight to the next waiter, active stays the same
+                self._count_waiter(bounded, -1)
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue is likely to have drained."""
+        service = np.mean(self._service_times) if self._service_times else 1.0
+        return max(1, math.ceil(service * (self.queued + 1) / self.limit))
+
+    def stats(self) -> dict:
+        waits = np.array(self._wait_times) if self._wait_times else np.zeros(1)
+        return {
+            "active": self.active,
+            "limit": self.limit,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "background": self.background,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "wait_p50_s": float(np.percentile(waits, 50)),
+            "wait_p95_s": float(np.percentile(waits, 95)),
+            "service_avg_s": float(np.mean(self._service_times)) if self._service_times else 0.0,
+        }
+
+
+# Heavy: download, parse, embed, upsert. Light: retrieval + LLM call.
+ingest = Lane("ingest", ADMISSION_INGEST_CONCURRENCY, ADMISSION_INGEST_QUEUE, ADMISSION_MAX_WAIT)
+qa = Lane("qa", ADMISSION_QA_CONCURRENCY, ADMISSION_QA_QUEUE, ADMISSION_MAX_WAIT)
+
+
+_SUMMED = ("active", "limit", "queued", "max_queue", "background", "admitted", "rejected", "timed_out")
+
+
+def stats() -> dict:
+    return {"ingest": ingest.stats(), "qa": qa.stats()}
+
+
+def share(workers: int, index: int):
+    """
+    Scale the lanes down to worker `index` of `workers`, so that the server
+    as a whole admits the configured limits. Called in each forked worker.
+    Every worker keeps at least one slot and one queue place.
+    """
+    for lane in (ingest, qa):
+        lane.limit = max(1, lane.limit // workers + (index < lane.limit % workers))
+        lane.max_queue = max(1, lane.max_queue // workers + (index < lane.max_queue % workers))
+
+
+def publish():
+    """Record this worker's stats in the state store, for server_stats() in the other workers."""
+    now = time.time()
+    with state_store.transaction() as conn:
+        conn.execute("DELETE FROM workers WHERE updated_at < ?", (now - 3 * METRICS_PUBLISH_INTERVAL,))
+        conn.execute(
+            "INSERT INTO workers (worker, stats, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (worker) DO UPDATE SET stats = excluded.stats, updated_at = excluded.updated_at",
+            (state_store.worker_id(), json.dumps(stats()), now),
+        )
+
+
+def server_stats() -> dict:
+    """
+    Stats of the whole server: this worker's, plus those the other workers
+    published in the last three METRICS_PUBLISH_INTERVAL (older rows are of
+    workers that stopped). Counters and limits are summed; wait and service
+    times are the worst worker's.
+    """
+    rows = state_store.connection().execute(
+        "SELECT stats FROM workers WHERE worker != ? AND updated_at > ?",
+        (state_store.worker_id(), time.time() - 3 * METRICS_PUBLISH_INTERVAL),
+    ).fetchall()
+    workers = [stats()] + [json.loads(row["stats"]) for row in rows]
+    total = {"workers": len(workers)}
+    for name in ("ingest", "qa"):
+        lanes = [worker[name] for worker in workers]
+        total[name] = {
+            key: sum(lane[key] for lane in lanes) if key in _SUMMED else max(lane[key] for lane in lanes)
+            for key in lanes[0]
+        }
+    return total
+
+
+async def publish_periodically(interval: float = METRICS_PUBLISH_INTERVAL):
+    while True:
+        try:
+            await asyncio.to_thread(publish)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not publish admission stats: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,218 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.config import (
+    ARTIFACT_STORE_ENABLED,
+    ARTIFACT_STORE_PATH,
+    ARTIFACT_STORE_MAX_MB,
+    ARTIFACT_STORE_COMPRESSION_LEVEL,
+)
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional, zlib is always available
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Shared by every worker process that points at the same file (SQLite WAL mode).
+# Values are content-addressed, so a hit is always valid and nothing is ever updated.
+_local = threading.local()
+# The store's total size is kept in a one-row table by triggers, so checking
+# the budget on every write does not scan the artifacts; it is seeded once, in
+# the transaction that creates the triggers, for stores written before it existed.
+_SCHEMA = """
+BEGIN IMMEDIATE;
+CREATE TABLE IF NOT EXISTS artifacts (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (kind, key)
+);
+CREATE INDEX IF NOT EXISTS artifacts_accessed ON artifacts (accessed);
+CREATE TABLE IF NOT EXISTS artifacts_usage (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    total INTEGER NOT NULL
+);
+INSERT INTO artifacts_usage (id, total)
+    SELECT 0, COALESCE(SUM(size), 0) FROM artifacts WHERE NOT EXISTS (SELECT 1 FROM artifacts_usage);
+CREATE TRIGGER IF NOT EXISTS artifacts_added AFTER INSERT ON artifacts
+    BEGIN UPDATE artifacts_usage SET total = total + NEW.size WHERE id = 0; END;
+CREATE TRIGGER IF NOT EXISTS artifacts_removed AFTER DELETE ON artifacts
+    BEGIN UPDATE artifacts_usage SET total = total - OLD.size WHERE id = 0; END;
+CREATE TRIGGER IF NOT EXISTS artifacts_resized AFTER UPDATE OF size ON artifacts
+    BEGIN UPDATE artifacts_usage SET total = total + NEW.size - OLD.size WHERE id = 0; END;
+COMMIT;
+"""
+_TOUCH_INTERVAL = 60  # seconds; avoids a write on every cache hit
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def content_key(data) -> str:
+    """
+    SHA-256 of a document, given as bytes or as a path to stream from.
+    """
+    digest = hashlib.sha256()
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        digest.update(data)
+    else:
+        with open(data, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def _compress(data: bytes) -> bytes:
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=ARTIFACT_STORE_COMPRESSION_LEVEL).compress(data)
+    return zlib.compress(data, min(ARTIFACT_STORE_COMPRESSION_LEVEL, 9))
+
+
+def _decompress(data: bytes) -> Optional[bytes]:
+    """The stored value, or None if it was written with zstd and zstandard is not installed."""
+    if data[:4] == _ZSTD_MAGIC:
+        if zstandard is None:
+            return None
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def _connection() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        Path(ARTIFACT_STORE_PATH).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(ARTIFACT_STORE_PATH, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        _local.conn = conn
+    return conn
+
+
+def get_many(kind: str, keys: List[str]) -> Dict[str, bytes]:
+    """
+    Look up several artifacts of one kind.
+
+    Returns:
+        dict: key -> decompressed value, for the keys that were found
+    """
+    if not ARTIFACT_STORE_ENABLED or not keys:
+        return {}
+    conn = _connection()
+    found = {}
+    stale = []
+    unreadable = 0
+    now = time.time()
+    unique = list(dict.fromkeys(keys))
+    for start in range(0, len(unique), 500):  # stay under SQLite's bound-parameter limit
+        batch = unique[start:start + 500]
+        rows = conn.execute(
+            f"SELECT key, data, accessed FROM artifacts WHERE kind = ? AND key IN ({','.join('?' * len(batch))})",
+            [kind, *batch],
+        ).fetchall()
+        for key, data, accessed in rows:
+            value = _decompress(data)
+            if value is None:
+                # Written by a worker that has zstandard: a miss here, overwritten by the recomputed value
+                unreadable += 1
+                continue
+            found[key] = value
+            if now - accessed > _TOUCH_INTERVAL:
+                stale.append(key)
+    if stale:
+        conn.executemany("UPDATE artifacts SET accessed = ? WHERE kind = ? AND key = ?", [(now, kind, k) for k in stale])
+    if unreadable:
+        logger.warning(f"⚠️ {unreadable} {kind} artifacts are zstd-compressed but zstandard is not installed, recomputing them")
+    return found
+
+
+def put_many(kind: str, items: Dict[str, bytes]):
+    """Store several artifacts of one kind, then evict if the store is over budget."""
+    if not ARTIFACT_STORE_ENABLED or not items:
+        return
+    now = time.time()
+    rows = []
+    for key, value in items.items():
+        data = _compress(value)
+        rows.append((kind, key, data, len(data), now))
+    conn = _connection()
+    conn.executemany(
+        "INSERT INTO artifacts (kind, key, data, size, accessed) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT (kind, key) DO UPDATE SET data = excluded.data, size = excluded.size, accessed = excluded.accessed",
+        rows,
+    )
+    _evict(conn)
+
+
+def get(kind: str, key: str) -> Optional[bytes]:
+    return get_many(kind, [key]).get(key)
+
+
+def put(kind: str, key: str, value: bytes):
+    put_many(kind, {key: value})
+
+
+def _evict(conn: sqlite3.Connection):
+    """Drop least recently used artifacts until the store is under 90% of its budget."""
+    budget = ARTIFACT_STORE_MAX_MB * 1024 * 1024
+    total = conn.execute("SELECT total FROM artifacts_usage").fetchone()[0]
+    if total <= budget:
+        return
+    target = total - int(budget * 0.9)
+    freed = 0
+    victims = []
+    for kind, key, size in conn.execute("SELECT kind, key, size FROM artifacts ORDER BY accessed"):
+        victims.append((kind, key))
+        freed += size
+        if freed >= target:
+            break
+    conn.executemany("DELETE FROM artifacts WHERE kind = ? AND key = ?", victims)
+    logger.info(f"Artifact store over budget, evicted {len(victims)} artifacts ({freed / 2**20:.1f} MB)")
+
+
+# =========================
+# Read-through helpers
+# =========================
+def cached_json(kind: str, key: str, compute: Callable[[], object]):
+    value = get(kind, key)
+    if value is not None:
+        return json.loads(value)
+    result = compute()
+    put(kind, key, json.dumps(result, ensure_ascii=False).encode("utf-8"))
+    return result
+
+
+def cached_vectors(kind: str, keys: List[str], compute: Callable[[List[int]], np.ndarray]) -> np.ndarray:
+    """
+    Fetch one vector per key, computing only the missing ones.
+
+    Args:
+        kind: Artifact kind, e.g. the embedding model name
+        keys: One key per vector
+        compute: Called with the positions of the missing keys, returns their vectors
+
+    Returns:
+        np.ndarray: (len(keys), dim) float32 vectors in key order
+    """
+    found = get_many(kind, keys)
+    missing = [i for i, key in enumerate(keys) if key not in found]
+    computed = {}
+    if missing:
+        vectors = np.asarray(compute(missing), dtype=np.float32)
+        computed = {keys[i]: vector for i, vector in zip(missing, vectors)}
+        put_many(kind, {key: vector.tobytes() for key, vector in computed.items()})
+    return np.stack([
+        computed[key] if key in computed else np.frombuffer(found[key], dtype=np.float32)
+        for key in keys
+    ]) if keys else np.zeros((0, 0), dtype=np.float32)
@@ -0,0 +1,198 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import CHUNK_STORE_PATH
+
+logger = logging.getLogger(__name__)
+
+# Chunk texts live here instead of in the Qdrant payloads, which only carry
+# document_id and chunk_index. One file per document:
+#
+#   header   b"CHNK", uint32 version, int64 chunk count n, int64 meta length
+#   ids      n x 16 bytes: point id (UUID) of chunk i (since version 2)
+#   offsets  (n + 1) int64: chunk i is texts[offsets[i]:offsets[i + 1]]
+#   meta     JSON, e.g. {"source_file": ...}
+#   texts    UTF-8 chunk texts, concatenated
+#
+# A hit's text is the one stored under its point id. Point ids are content
+# hashes, so while a re-ingested document's points and file are not in line
+# yet, a hit either resolves to its own text or not at all, never to the text
+# that now sits at its old chunk_index.
+#
+# Files are memory-mapped, so a lookup only touches the pages of the chunks it
+# reads, and all worker processes on the host share one copy in the page cache.
+# Documents loaded from an index snapshot are mounted from the snapshot's own
+# mapping instead; a file written for the document since takes precedence.
+VERSION = 2
+_MAGIC = b"CHNK"
+_HEADER = struct.Struct("<4sIqq")
+_ID_SIZE = 16
+_SUFFIX = ".chunks"
+_open: Dict[str, tuple] = {}  # document_id -> (file identity, ids, offsets, texts, meta, id index)
+_mounted: Dict[str, tuple] = {}  # document_id -> (None, ids, offsets, texts, meta, id index)
+_lock = threading.Lock()
+
+
+class MissingTextsError(LookupError):
+    """Raised when the vector store has points of documents this chunk store does not hold."""
+
+    def __init__(self, document_ids: Sequence[str]):
+        self.document_ids = list(document_ids)
+        super().__init__(
+            f"Chunk texts of document(s) {', '.join(self.document_ids)} are not in this server's chunk "
+            f"store ({CHUNK_STORE_PATH}); send the request with the document URL to ingest it here"
+        )
+
+
+def _path(document_id: str) -> Path:
+    return Path(CHUNK_STORE_PATH) / f"{document_id}{_SUFFIX}"
+
+
+def write(document_id: str, chunks: List[str], ids: Sequence[str], source_file: Optional[str] = None):
+    """
+    Store the chunk texts of a document, replacing any previous version.
+
+    Args:
+        document_id: Document id
+        chunks: Chunk texts in chunk_index order, without the "passage: " prefix
+        ids: Point id of every chunk (vector_store.chunk_point_ids)
+        source_file: Document URL
+    """
+    encoded = [chunk.encode("utf-8") for chunk in chunks]
+    offsets = np.zeros(len(encoded) + 1, dtype="<i8")
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    meta = json.dumps({"source_file": source_file}).encode("utf-8")
+
+    path = _path(document_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write aside and rename, so readers see either the old or the new version
+    tmp = path.with_name(f"{path.name}.tmp{os.getpid()}-{threading.get_ident()}")
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, VERSION, len(encoded), len(meta)))
+        f.write(b"".join(uuid.UUID(point_id).bytes for point_id in ids))
+        f.write(offsets.tobytes())
+        f.write(meta)
+        f.writelines(encoded)
+    os.replace(tmp, path)
+
+    with _lock:
+        _open.pop(document_id, None)
+
+
+def delete(document_id: str):
+    with _lock:
+        _open.pop(document_id, None)
+        _mounted.pop(document_id, None)
+    _path(document_id).unlink(missing_ok=True)
+
+
+def mount(document_id: str, ids: memoryview, offsets: np.ndarray, texts_buffer: memoryview, meta: dict):
+    """
+    Serve a document's chunk texts from an existing buffer (e.g. a snapshot
+    mapping) until a file is written for it.
+
+    Args:
+        ids: n x 16 bytes point ids, as in the file layout
+        offsets: (n + 1) int64 offsets into texts_buffer, as in the file layout
+        texts_buffer: The document's UTF-8 chunk texts, concatenated
+        meta: e.g. {"source_file": ...}
+    """
+    with _lock:
+        _mounted[document_id] = (None, ids, offsets, texts_buffer, meta, {})
+
+
+def documents() -> List[str]:
+    """Ids of the stored documents: files and mounted ones."""
+    try:
+        stored = [path.name[:-len(_SUFFIX)] for path in Path(CHUNK_STORE_PATH).iterdir() if path.name.endswith(_SUFFIX)]
+    except FileNotFoundError:
+        stored = []
+    with _lock:
+        return sorted(set(stored).union(_mounted))
+
+
+def document(document_id: str) -> Optional[Tuple[np.ndarray, memoryview, dict]]:
+    """(offsets, texts buffer, meta) of a stored document, see the layout above."""
+    entry = _load(document_id)
+    return entry[2:5] if entry else None
+
+
+def _load(document_id: str):
+    """Map (or reuse the mapping of) a document's file; None if it is not stored."""
+    path = _path(document_id)
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return _mounted.get(document_id)
+    identity = (stat.st_ino, stat.st_mtime_ns)  # changes when another process rewrites it
+
+    with _lock:
+        cached = _open.get(document_id)
+        if cached and cached[0] == identity:
+            return cached
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, meta_len = _HEADER.unpack_from(buffer)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a chunk store file")
+        view = memoryview(buffer)
+        ids_size = count * _ID_SIZE if version >= 2 else 0  # version 1 files are read by chunk_index alone
+        ids = view[_HEADER.size:_HEADER.size + ids_size] if ids_size else None
+        offsets = np.frombuffer(buffer, dtype="<i8", count=count + 1, offset=_HEADER.size + ids_size)
+        meta_start = _HEADER.size + ids_size + offsets.nbytes
+        meta = json.loads(buffer[meta_start:meta_start + meta_len])
+        texts = view[meta_start + meta_len:]
+        _open[document_id] = (identity, ids, offsets, texts, meta, {})
+        return _open[document_id]
+
+
+def _position(entry, chunk_index: int, point_id: Optional[str]) -> Optional[int]:
+    """Where the text of a point is stored: at its chunk_index, or wherever its id is."""
+    _, ids, offsets, _, _, index = entry
+    count = len(offsets) - 1
+    if point_id is None or ids is None:
+        return chunk_index if 0 <= chunk_index < count else None
+    key = uuid.UUID(point_id).bytes
+    if 0 <= chunk_index < count and ids[chunk_index * _ID_SIZE:(chunk_index + 1) * _ID_SIZE] == key:
+        return chunk_index
+    if not index:  # built once per mapping, only when a chunk moved; published in one update
+        index.update({bytes(ids[i * _ID_SIZE:(i + 1) * _ID_SIZE]): i for i in range(count)})
+    return index.get(key)
+
+
+def texts(keys: Iterable[tuple]) -> Dict[tuple, str]:
+    """
+    Resolve many chunks at once.
+
+    Args:
+        keys: (document_id, point_id, chunk_index) of search hits, or
+            (document_id, chunk_index) to read a chunk by position
+
+    Returns:
+        dict: key -> text, for the keys found
+    """
+    found = {}
+    for key in set(keys):
+        document_id, point_id, chunk_index = key if len(key) == 3 else (key[0], None, key[1])
+        entry = _load(document_id)
+        if entry is None:
+            continue
+        position = _position(entry, chunk_index if isinstance(chunk_index, int) else -1, point_id)
+        if position is not None:
+            offsets, texts_buffer = entry[2], entry[3]
+            found[key] = str(texts_buffer[offsets[position]:offsets[position + 1]], "utf-8")
+    return found
+
+
+def source_file(document_id: str) -> Optional[str]:
+    entry = _load(document_id)
+    return entry[4].get("source_file") if entry else None
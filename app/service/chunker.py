@@ -1,8 +1,8 @@
 import os
-import json
 import re
-from pathlib import Path
+import hashlib
 from dotenv import load_dotenv
+import app.service.tracing as tracing
 
 # Load config from .env
 load_dotenv()
@@ -24,12 +24,17 @@ def split_into_sentences(text: str):
     
     return sentences
 
-def chunk_text(file_path: str):
-    path = Path(file_path)
-    if not path.exists():
-        raise FileNotFoundError(f"No such file: {file_path}")
+@tracing.traced()
+def chunk_text(text: str):
+    """
+    Split extracted document text into overlapping, sentence-aligned chunks.
+
+    Args:
+        text (str): Document text.
 
-    text = path.read_text(encoding="utf-8")
+    Returns:
+        List[str]: Chunks of at most CHUNK_SIZE characters (unless a single sentence is longer).
+    """
     sentences = split_into_sentences(text)
 
     chunks = []
@@ -56,28 +61,11 @@ def chunk_text(file_path: str):
         # Overlap last CHUNK_OVERLAP characters
         current_chunk = temp_chunk[-CHUNK_OVERLAP:]
 
+    tracing.set_attributes(chars=len(text), sentences=len(sentences), chunks=len(chunks))
     return chunks
 
-def save_chunks(chunks, url: str):
+def chunk_hash(chunk: str) -> str:
     """
-    Save the chunked text segments to a JSON file.
-
-    Args:
-        chunks (List[str]): List of text segments.
-        url (str): Original document URL.
-
-    Returns:
-        str: File path of the saved JSON file.
+    Stable content hash of a chunk, used to detect unchanged chunks on re-ingestion.
     """
-    if not chunks:
-        raise ValueError("No chunks to save")
-
-    temp_dir = Path(__file__).resolve().parent.parent / "temp"
-    temp_dir.mkdir(parents=True, exist_ok=True)
-
-    file_path = temp_dir / "chunked_file.json"
-
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(chunks, f, indent=2)
-
-    return str(file_path)
\ No newline at end of file
+    return hashlib.blake2b(chunk.encode("utf-8"), digest_size=16).hexdigest()
@@ -0,0 +1,83 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from app.config import REQUEST_TIMEOUT
+
+# Monotonic expiry time of the request being served. Context variables are
+# copied into tasks and asyncio.to_thread workers, so every stage of a request
+# sees its deadline without it being passed through each call.
+_expires_at: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request runs out of its time budget."""
+
+    def __init__(self, stage: str):
+        super().__init__(f"Deadline exceeded during {stage}")
+        self.stage = stage
+
+
+def budget(requested: Optional[float] = None) -> Optional[float]:
+    """
+    Time budget for a request: the client's value, capped by REQUEST_TIMEOUT.
+
+    Returns:
+        float: Seconds, or None for no deadline
+    """
+    limits = [t for t in (requested, REQUEST_TIMEOUT) if t and t > 0]
+    return min(limits) if limits else None
+
+
+@contextmanager
+def scope(seconds: Optional[float]):
+    """Run the block under a deadline `seconds` from now (no deadline if None)."""
+    token = _expires_at.set(time.monotonic() + seconds if seconds else None)
+    try:
+        yield
+    finally:
+        _expires_at.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, None if there is none."""
+    expires_at = _expires_at.get()
+    return None if expires_at is None else max(0.0, expires_at - time.monotonic())
+
+
+def expired() -> bool:
+    return remaining() == 0.0
+
+
+def check(stage: str):
+    """
+    Cooperative cancellation point for blocking code running in threads.
+
+    Raises:
+        DeadlineExceeded: If the current deadline has passed
+    """
+    if expired():
+        raise DeadlineExceeded(stage)
+
+
+def timeout(default: Optional[float] = None) -> Optional[float]:
+    """Timeout for a client call: `default`, shortened to the time left."""
+    left = remaining()
+    if left is None:
+        return default
+    return left if default is None else min(default, left)
+
+
+async def run(awaitable, stage: str):
+    """
+    Await `awaitable`, cancelling it when the current deadline expires.
+
+    Raises:
+        DeadlineExceeded: If the deadline expired first
+    """
+    try:
+        return await asyncio.wait_for(awaitable, timeout=remaining())
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(stage)
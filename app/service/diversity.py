@@ -0,0 +1,56 @@
+import numpy as np
+
+
+def mmr_select(
+    query_vectors: np.ndarray,
+    candidate_vectors: np.ndarray,
+    candidate_mask: np.ndarray,
+    k: int,
+    lambda_mult: float = 0.7,
+) -> np.ndarray:
+    """
+    Maximal Marginal Relevance selection for a batch of queries at once.
+
+    Each step picks, for every query in parallel, the candidate maximising
+    lambda * sim(query, c) - (1 - lambda) * max(sim(c, already selected)).
+    Vectors are expected to be L2-normalised, so dot products are cosines.
+
+    Args:
+        query_vectors: (Q, D) query embeddings
+        candidate_vectors: (Q, C, D) candidates per query, zero-padded
+        candidate_mask: (Q, C) True where a candidate is real, False for padding
+        k: Number of candidates to select per query
+        lambda_mult: 1.0 is pure relevance, 0.0 is pure diversity
+
+    Returns:
+        np.ndarray: (Q, k) indices into the candidate axis, -1 where a query
+        had fewer than k candidates
+    """
+    num_queries, num_candidates = candidate_mask.shape
+    k = min(k, num_candidates)
+    selected = np.full((num_queries, k), -1, dtype=np.int64)
+    if k == 0:
+        return selected
+
+    relevance = np.einsum("qd,qcd->qc", query_vectors, candidate_vectors)
+    similarity = np.einsum("qcd,qed->qce", candidate_vectors, candidate_vectors)
+
+    available = candidate_mask.astype(bool).copy()
+    redundancy = np.zeros((num_queries, num_candidates), dtype=relevance.dtype)
+    rows = np.arange(num_queries)
+
+    for step in range(k):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores = np.where(available, scores, -np.inf)
+        best = scores.argmax(axis=1)
+        has_candidate = available[rows, best]
+
+        selected[has_candidate, step] = best[has_candidate]
+        available[rows[has_candidate], best[has_candidate]] = False
+        redundancy = np.where(
+            has_candidate[:, None],
+            np.maximum(redundancy, similarity[rows, :, best]),
+            redundancy,
+        )
+
+    return selected
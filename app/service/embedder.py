@@ -1,39 +1,47 @@
-from sentence_transformers import SentenceTransformer
-import json
-import os
-
-# Load the BGE model
-model = SentenceTransformer("BAAI/bge-base-en-v1.5")
-
-def embed_chunks(json_path, source_file="unknown"):
-    if not os.path.exists(json_path):
-        raise FileNotFoundError(f"{json_path} not found")
-
-    # Load the chunked file
-    with open(json_path, "r", encoding="utf-8") as f:
-        chunks = json.load(f)  # List of strings
-
-    texts = [f"passage: {text}" for text in chunks]
-    embeddings = model.encode(texts, show_progress_bar=True, normalize_embeddings=True)
-
-    # Qdrant-compatible structure
-    points = [
-        {
-            "id": i,
-            "vector": emb.tolist(),
-            "payload": {
-                "text": text,
-                "source_file": source_file,
-                "chunk_index": i
-            }
-        }
-        for i, (text, emb) in enumerate(zip(texts, embeddings))
-    ]
-
-    # Save to file
-    out_path = json_path.replace(".json", "_qdrant_ready.json")
-    with open(out_path, "w", encoding="utf-8") as f:
-        json.dump(points, f, ensure_ascii=False, indent=2)
-
-    print(f"✅ Qdrant-ready file saved to {out_path}")
-    return out_path
+import threading
+import numpy as np
+import app.service.artifact_store as artifact_store
+import app.service.deadline as deadline
+import app.service.tracing as tracing
+from app.service.chunker import chunk_hash
+
+# BGE model, shared by passage and query embedding. Loaded on first use (or at
+# startup warm-up) so that importing the app does not pull in torch.
+MODEL_NAME = "BAAI/bge-base-en-v1.5"
+model = None
+_model_lock = threading.Lock()
+ENCODE_BATCH = 256  # Chunks encoded between deadline checks
+
+
+def get_model():
+    global model
+    with _model_lock:
+        if model is None:
+            from sentence_transformers import SentenceTransformer
+
+            model = SentenceTransformer(MODEL_NAME)
+    return model
+
+
+def embed_passages(chunks):
+    """
+    Embed chunk texts as BGE passages.
+
+    Args:
+        chunks (List[str]): Chunk texts, without the "passage: " prefix.
+
+    Returns:
+        np.ndarray: (len(chunks), 768) normalized float32 embeddings
+    """
+    def encode(missing):
+        texts = [f"passage: {chunks[i]}" for i in missing]
+        vectors = []
+        for start in range(0, len(texts), ENCODE_BATCH):
+            deadline.check("embedding")
+            batch = texts[start:start + ENCODE_BATCH]
+            with tracing.span("embed_batch", chunks=len(batch), chars=sum(map(len, batch))):
+                vectors.append(get_model().encode(batch, normalize_embeddings=True))
+        return np.concatenate(vectors)
+
+    # Embeddings other workers already computed are read from the shared store
+    return artifact_store.cached_vectors(f"embedding:{MODEL_NAME}", [chunk_hash(c) for c in chunks], encode)
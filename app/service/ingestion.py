@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Awaitable, Callable, List, Optional
+
+import app.service.registry as registry
+import app.service.admission as admission
+import app.service.state_store as state_store
+from app.config import (
+    INGEST_WORKERS,
+    INGEST_QUEUE_SIZE,
+    INGEST_MAX_ATTEMPTS,
+    INGEST_RETRY_BACKOFF,
+    INGEST_JOB_TTL,
+    INGEST_JOB_HISTORY,
+    INGEST_LEASE_TIMEOUT,
+    INGEST_POLL_INTERVAL,
+)
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+# Handler signature: async handler(url, document_id)
+Handler = Callable[[str, str], Awaitable[object]]
+
+# Jobs live in the state store: any server worker can pick up a job submitted
+# to another one, and GET /documents/jobs answers the same on all of them.
+# A running job's worker heartbeats it; when that stops for
+# INGEST_LEASE_TIMEOUT seconds (the worker died) the job is queued again.
+_JOB_FIELDS = "job_id, document_id, url, status, attempts, error, created_at, finished_at"
+
+_workers: List[asyncio.Task] = []
+_handler: Optional[Handler] = None
+_queue_size = INGEST_QUEUE_SIZE
+_wakeup: Optional[asyncio.Event] = None  # Set on submit, so this worker's runners need not wait for the next poll
+
+
+class QueueFullError(Exception):
+    """Raised when the ingestion queue cannot accept more jobs."""
+
+
+async def start(handler: Handler, workers: int = INGEST_WORKERS, queue_size: int = INGEST_QUEUE_SIZE):
+    """
+    Start the background ingestion worker pool.
+
+    Args:
+        handler: Coroutine function run for every job, called as handler(url, document_id)
+        workers: Number of concurrent job runners in this process
+        queue_size: Maximum number of jobs waiting to be picked up, across all workers
+    """
+    global _handler, _queue_size, _wakeup
+    if _workers:
+        return
+    _handler = handler
+    _queue_size = queue_size
+    _wakeup = asyncio.Event()
+    for n in range(workers):
+        _workers.append(asyncio.create_task(_worker(n), name=f"ingest-worker-{n}"))
+    logger.info(f"Started {workers} ingestion workers (queue size {queue_size})")
+
+
+async def stop():
+    """Cancel all workers. Jobs they were running are queued again for another worker."""
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    logger.info("Ingestion workers stopped")
+
+
+def submit(url: str) -> dict:
+    """
+    Enqueue a document for ingestion.
+
+    A job already queued or running for the same document, submitted to any
+    worker, is returned instead of enqueueing a duplicate.
+
+    Args:
+        url: Document URL
+
+    Returns:
+        dict: Job record
+
+    Raises:
+        QueueFullError: If the worker pool is not running or the queue is full
+    """
+    if not _workers:
+        raise QueueFullError("Ingestion workers are not running")
+
+    document_id = registry.document_id_for(url)
+    with state_store.transaction() as conn:
+        _prune(conn)
+        row = conn.execute(
+            f"SELECT {_JOB_FIELDS} FROM jobs WHERE document_id = ? AND status IN (?, ?)",
+            (document_id, JOB_QUEUED, JOB_RUNNING),
+        ).fetchone()
+        if row:
+            return dict(row)
+
+        queued = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (JOB_QUEUED,)).fetchone()[0]
+        if queued >= _queue_size:
+            raise QueueFullError(f"Ingestion queue is full ({_queue_size} jobs)")
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "document_id": document_id,
+            "url": url,
+            "status": JOB_QUEUED,
+            "attempts": 0,
+            "error": None,
+            "created_at": time.time(),
+            "finished_at": None,
+        }
+        conn.execute(f"INSERT INTO jobs ({_JOB_FIELDS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", tuple(job.values()))
+    _wakeup.set()
+    logger.info(f"Queued ingestion job {job['job_id']} for {url}")
+    return job
+
+
+def get_job(job_id: str) -> Optional[dict]:
+    with state_store.transaction() as conn:
+        _prune(conn)
+        row = conn.execute(f"SELECT {_JOB_FIELDS} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def _prune(conn, ttl: float = INGEST_JOB_TTL, history: int = INGEST_JOB_HISTORY):
+    """Forget finished jobs older than `ttl` seconds, and all but the `history` most recent."""
+    conn.execute(
+        """
+        DELETE FROM jobs WHERE finished_at < ? OR job_id IN (
+            SELECT job_id FROM jobs WHERE finished_at IS NOT NULL
+            ORDER BY finished_at DESC LIMIT -1 OFFSET ?
+        )
+        """,
+        (time.time() - ttl, history),
+    )
+
+
+def _claim_next() -> Optional[dict]:
+    """Mark the oldest queued job running on this worker; jobs of workers that stopped heartbeating are queued again first."""
+    now = time.time()
+    with state_store.transaction() as conn:
+        conn.execute(
+            "UPDATE jobs SET status = ?, worker = NULL WHERE status = ? AND heartbeat < ?",
+            (JOB_QUEUED, JOB_RUNNING, now - INGEST_LEASE_TIMEOUT),
+        )
+        row = conn.execute(
+            f"SELECT {_JOB_FIELDS} FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (JOB_QUEUED,)
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute(
+            "UPDATE jobs SET status = ?, worker = ?, heartbeat = ? WHERE job_id = ?",
+            (JOB_RUNNING, state_store.worker_id(), now, row["job_id"]),
+        )
+    return dict(row, status=JOB_RUNNING)
+
+
+def _save(job: dict, **fields):
+    job.update(fields)
+    columns = ", ".join(f"{name} = ?" for name in fields)
+    state_store.connection().execute(f"UPDATE jobs SET {columns} WHERE job_id = ?", (*fields.values(), job["job_id"]))
+
+
+async def _worker(n: int):
+    while True:
+        _wakeup.clear()
+        job = await asyncio.to_thread(_claim_next)
+        if job is None:
+            try:
+                async with asyncio.timeout(INGEST_POLL_INTERVAL):
+                    await _wakeup.wait()
+            except TimeoutError:
+                pass
+            continue
+        try:
+            await _run(job)
+        except asyncio.CancelledError:
+            # Shutting down: the interrupted attempt does not count
+            _save(job, status=JOB_QUEUED, worker=None, attempts=job["attempts"] - 1)
+            raise
+        except Exception as e:
+            logger.error(f"Ingestion worker {n} crashed on job {job['job_id']}: {e}")
+
+
+async def _heartbeat(job: dict):
+    while True:
+        await asyncio.sleep(INGEST_LEASE_TIMEOUT / 3)
+        await asyncio.to_thread(_save, job, heartbeat=time.time())
+
+
+async def _run(job: dict):
+    heartbeat = asyncio.create_task(_heartbeat(job))
+    try:
+        await _attempt(job)
+    finally:
+        heartbeat.cancel()
+
+
+async def _attempt(job: dict):
+    # Attempts made before a worker died count; a requeued job resumes after them
+    for attempt in range(job["attempts"] + 1, INGEST_MAX_ATTEMPTS + 1):
+        await asyncio.to_thread(_save, job, attempts=attempt)
+        try:
+            # Background work yields to ingestion that a client is waiting on
+            async with admission.ingest.slot(admission.PRIORITY_BACKGROUND, bounded=False):
+                await _handler(job["url"], job["document_id"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = getattr(e, "detail", None) or str(e)
+            await asyncio.to_thread(_save, job, error=error)
+            logger.warning(f"Ingestion job {job['job_id']} attempt {attempt}/{INGEST_MAX_ATTEMPTS} failed: {error}")
+            if attempt < INGEST_MAX_ATTEMPTS:
+                await asyncio.sleep(INGEST_RETRY_BACKOFF * 2 ** (attempt - 1))
+            continue
+
+        await asyncio.to_thread(_save, job, status=JOB_SUCCEEDED, error=None, finished_at=time.time())
+        logger.info(f"Ingestion job {job['job_id']} succeeded after {attempt} attempt(s)")
+        return
+
+    await asyncio.to_thread(_save, job, status=JOB_FAILED, finished_at=time.time())
+    registry.mark_failed(job["document_id"], job["url"])
@@ -0,0 +1,145 @@
+import time
+import uuid
+from typing import Optional
+
+import app.service.state_store as state_store
+from app.config import INGEST_LEASE_TIMEOUT
+
+# Registry of documents known to the vector store, in the state store so that
+# every server worker sees the same statuses. Qdrant stays the source of
+# truth; this only saves a round-trip on hot paths.
+# A document being ingested carries a lease (ingesting_by / ingesting_seen):
+# one worker at a time ingests it, the others wait for its result.
+
+STATUS_INGESTING = "ingesting"
+STATUS_PARTIAL = "partial"  # Searchable, the rest is still being indexed
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+
+_FIELDS = "document_id, url, status, chunks, completeness, updated_at"
+
+
+def document_id_for(url: str) -> str:
+    """
+    Derive a stable document id from a document URL.
+
+    Args:
+        url: Document URL
+
+    Returns:
+        str: UUID string, identical for identical URLs
+    """
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, url))
+
+
+def get(document_id: str) -> Optional[dict]:
+    row = state_store.connection().execute(
+        f"SELECT {_FIELDS} FROM documents WHERE document_id = ?", (document_id,)
+    ).fetchone()
+    return dict(row) if row else None
+
+
+def is_ready(document_id: str) -> bool:
+    record = get(document_id)
+    return bool(record) and record["status"] == STATUS_READY
+
+
+def is_searchable(document_id: str) -> bool:
+    """Ready, or partially indexed with the rest on its way."""
+    record = get(document_id)
+    return bool(record) and record["status"] in (STATUS_READY, STATUS_PARTIAL)
+
+
+def completeness(document_id: str) -> Optional[float]:
+    """Share of the document's pages that are indexed, None if unknown."""
+    record = get(document_id)
+    return record.get("completeness") if record else None
+
+
+def _update(conn, document_id: str, url: Optional[str], status: str, keep_searchable: bool = False,
+            chunks: Optional[int] = None, completeness: Optional[float] = None) -> dict:
+    row = conn.execute(
+        f"""
+        INSERT INTO documents (document_id, url, status, chunks, completeness, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (document_id) DO UPDATE SET
+            url = COALESCE(excluded.url, url),
+            status = CASE WHEN ? AND status IN (?, ?) THEN status ELSE excluded.status END,
+            chunks = COALESCE(excluded.chunks, chunks),
+            completeness = COALESCE(excluded.completeness, completeness),
+            updated_at = excluded.updated_at
+        RETURNING {_FIELDS}
+        """,
+        (document_id, url or None, status, chunks, completeness, time.time(),
+         keep_searchable, STATUS_READY, STATUS_PARTIAL),
+    ).fetchone()
+    return dict(row)
+
+
+def mark_partial(document_id: str, url: str, chunks: int, completeness: float) -> dict:
+    return _update(state_store.connection(), document_id, url, STATUS_PARTIAL, chunks=chunks, completeness=completeness)
+
+
+def mark_ready(document_id: str, url: str, chunks: int) -> dict:
+    return _update(state_store.connection(), document_id, url, STATUS_READY, chunks=chunks, completeness=1.0)
+
+
+def mark_failed(document_id: str, url: str) -> dict:
+    """A failed re-ingestion leaves a ready or partial document as it was."""
+    return _update(state_store.connection(), document_id, url, STATUS_FAILED, keep_searchable=True)
+
+
+def _leased(row) -> bool:
+    return bool(row) and row["ingesting_by"] not in (None, state_store.worker_id()) \
+        and row["ingesting_seen"] > time.time() - INGEST_LEASE_TIMEOUT
+
+
+def ingesting_elsewhere(document_id: str) -> bool:
+    """Another worker holds the ingestion lease of the document."""
+    return _leased(state_store.connection().execute(
+        "SELECT ingesting_by, ingesting_seen FROM documents WHERE document_id = ?", (document_id,)
+    ).fetchone())
+
+
+def claim(document_id: str, url: str) -> bool:
+    """
+    Take the ingestion lease of a document, and mark it ingesting. A ready or
+    partial document stays searchable (on its current points) while it is
+    re-ingested.
+
+    Args:
+        document_id: Document id
+        url: Document URL
+
+    Returns:
+        bool: False if another worker holds the lease and renewed it in the
+            last INGEST_LEASE_TIMEOUT seconds
+    """
+    with state_store.transaction() as conn:
+        row = conn.execute(
+            "SELECT ingesting_by, ingesting_seen FROM documents WHERE document_id = ?", (document_id,)
+        ).fetchone()
+        if _leased(row):
+            return False
+        _update(conn, document_id, url, STATUS_INGESTING, keep_searchable=True)
+        conn.execute(
+            "UPDATE documents SET ingesting_by = ?, ingesting_seen = ? WHERE document_id = ?",
+            (state_store.worker_id(), time.time(), document_id),
+        )
+    return True
+
+
+def renew(document_id: str):
+    """Heartbeat of the lease taken by claim()."""
+    state_store.connection().execute(
+        "UPDATE documents SET ingesting_seen = ? WHERE document_id = ? AND ingesting_by = ?",
+        (time.time(), document_id, state_store.worker_id()),
+    )
+
+
+def release(document_id: str):
+    """Give up the lease, if this worker still holds it."""
+    state_store.connection().execute(
+        "UPDATE documents SET ingesting_by = NULL, ingesting_seen = NULL WHERE document_id = ? AND ingesting_by = ?",
+        (document_id, state_store.worker_id()),
+    )
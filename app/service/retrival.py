@@ -1,52 +1,178 @@
 from qdrant_client import QdrantClient
-from sentence_transformers import SentenceTransformer
-from qdrant_client.http.models import Filter, FieldCondition, MatchValue
+from qdrant_client.http.models import Filter, FieldCondition, MatchAny, MatchValue, SearchRequest
 from typing import List
 import numpy as np
 import os
 from dotenv import load_dotenv
-from groq import Groq
+import app.service.embedder as embedder
 from app.config import GROQ_API_KEY, GROQ_MODEL, GROQ_TEMPERATURE, GROQ_MAX_TOKENS
+from app.config import MMR_ENABLED, MMR_LAMBDA, MMR_CANDIDATES, TOP_K_RETRIEVAL
+from app.config import LLM_QUESTIONS_PER_CALL, QDRANT_PREFER_GRPC, QDRANT_GRPC_PORT
+from app.service.diversity import mmr_select
+from app.service.vector_store import search_params
+import app.service.deadline as deadline
+import app.service.chunk_store as chunk_store
+import app.service.tracing as tracing
+from concurrent.futures import ThreadPoolExecutor, wait
 import ast
+import contextvars
+import math
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Groq client
-groq_client = Groq(api_key=GROQ_API_KEY)
+# Clients are created on first use, so importing this module stays cheap
+groq_client = None
+client = None
 
 # Qdrant settings
 QDRANT_HOST = os.getenv("QDRANT_URL", "http://localhost:6333").split("://")[-1].split(":")[0]
 QDRANT_PORT = 6333
 COLLECTION_NAME = "RAG-Hackrx"
-TOP_K = 3
+TOP_K = TOP_K_RETRIEVAL  # Chunks per question, after MMR when enabled
 
-# Load model & client
-model = SentenceTransformer("BAAI/bge-base-en-v1.5")
-client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT)
+# Per-question status in llm_inference results
+STATUS_ANSWERED = "answered"
+STATUS_DEADLINE_EXCEEDED = "deadline_exceeded"
+STATUS_ERROR = "error"
+
+
+def get_groq_client():
+    global groq_client
+    if groq_client is None:
+        from groq import Groq
+
+        groq_client = Groq(api_key=GROQ_API_KEY)
+    return groq_client
+
+
+def get_client() -> QdrantClient:
+    global client
+    if client is None:
+        client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT, prefer_grpc=QDRANT_PREFER_GRPC, grpc_port=QDRANT_GRPC_PORT)
+    return client
 
 from typing import List
 
 from typing import List, Dict
 
-def retrieve_answers(queries: List[str]) -> Dict[str, List[str]]:
-    results = {}
+def document_filter(document_id: str) -> Filter:
+    return Filter(must=[FieldCondition(key="document_id", match=MatchValue(value=document_id))])
+
 
+def documents_filter(document_ids: List[str]) -> Filter:
+    """Points of any of the documents; None (the whole collection) if there are none."""
+    if not document_ids:
+        return None
+    if len(document_ids) == 1:
+        return document_filter(document_ids[0])
+    return Filter(must=[FieldCondition(key="document_id", match=MatchAny(any=list(document_ids)))])
+
+
+@tracing.traced()
+def embed_queries(queries: List[str]) -> np.ndarray:
+    """
+    Embed questions for search. Independent of the documents, so it can run
+    while they are still being ingested.
+
+    Returns:
+        np.ndarray: (len(queries), 768) normalized embeddings
+    """
     processed_queries = [f"passage: {q}" for q in queries]
-    embeddings = model.encode(processed_queries, normalize_embeddings=True)
+    return embedder.get_model().encode(processed_queries, normalize_embeddings=True)
 
-    for query, emb in zip(queries, embeddings):
-        search_result = client.search(
-            collection_name=COLLECTION_NAME,
-            query_vector=emb.tolist(),
-            limit=3,
+
+def retrieve_answers(
+    queries: List[str],
+    document_ids: List[str] = None,
+    hnsw_ef: int = None,
+    exact: bool = None,
+    mmr: bool = None,
+    query_vectors: np.ndarray = None,
+) -> Dict[str, List[str]]:
+    """
+    Retrieve the top chunks for every query across one or more documents.
+
+    All queries are sent to Qdrant in a single batched request, each filtered
+    to the requested documents, so a query gets the top-k chunks over all of
+    them however many there are. Hits only carry document_id and chunk_index;
+    their texts are then read from the chunk store in one pass.
+
+    Args:
+        queries: Questions to search for
+        document_ids: Documents to search; None searches the whole collection
+        hnsw_ef: HNSW candidate list size for this search (config default if None)
+        exact: Force exact (brute-force) search (config default if None)
+        mmr: Over-fetch and re-rank with MMR to drop near-duplicates (config default if None)
+        query_vectors: Precomputed embed_queries(queries); computed here if None
+
+    Returns:
+        dict: Mapping of query to its context chunks
+
+    Raises:
+        chunk_store.MissingTextsError: If hits belong to documents whose chunk
+            texts this server does not hold
+    """
+    results = {}
+    document_ids = list(document_ids or [])
+    deadline.check("retrieval")
+
+    embeddings = embed_queries(queries) if query_vectors is None else query_vectors
+
+    use_mmr = MMR_ENABLED if mmr is None else mmr
+    params = search_params(hnsw_ef=hnsw_ef, exact=exact)
+    scope = documents_filter(document_ids)
+    requests = [
+        SearchRequest(
+            vector=emb.tolist(),
+            filter=scope,
+            limit=max(MMR_CANDIDATES, TOP_K) if use_mmr else TOP_K,
+            params=params,
             with_payload=True,
+            with_vector=use_mmr,
+        )
+        for emb in embeddings
+    ]
+    search_timeout = deadline.timeout()
+    with tracing.span("search_batch", searches=len(requests), documents=len(document_ids), mmr=use_mmr) as span:
+        batch_results = get_client().search_batch(
+            collection_name=COLLECTION_NAME,
+            requests=requests,
+            timeout=math.ceil(search_timeout) if search_timeout is not None else None,
         )
+        span.set_attribute("hits", sum(len(hits) for hits in batch_results))
+    if use_mmr:
+        batch_results = diversify(np.asarray(embeddings), batch_results, TOP_K)
 
-        top_chunks = [
-            hit.payload.get("text", "No text found.")
-            for hit in search_result
-        ]
+    with tracing.span("resolve_texts") as span:
+        texts = chunk_store.texts(_text_key(hit) for search_result in batch_results for hit in search_result)
+        span.set_attribute("chunks", len(texts))
+
+    # Points written before the chunk store still carry their text
+    missing = {
+        hit.payload.get("document_id")
+        for search_result in batch_results
+        for hit in search_result
+        if _text_key(hit) not in texts and hit.payload.get("text") is None
+    }
+    unknown = sorted(document_id for document_id in missing if chunk_store.document(document_id) is None)
+    if unknown:
+        # e.g. indexed by another replica whose CHUNK_STORE_PATH is not shared with this one
+        raise chunk_store.MissingTextsError(unknown)
+
+    for query, search_result in zip(queries, batch_results):
+        top_chunks = []
+        for hit in search_result:
+            document_id = hit.payload.get("document_id")
+            text = texts.get(_text_key(hit)) or hit.payload.get("text")
+            if text is None:
+                continue  # Stale point of a re-ingested document, deleted once its new points are written
+            if len(document_ids) > 1:
+                # Tell the LLM which document each chunk came from
+                source = chunk_store.source_file(document_id) or hit.payload.get("source_file", "")
+                source = str(source).split("?")[0].rsplit("/", 1)[-1]
+                text = f"[{source}] {text}"
+            top_chunks.append(text)
 
         if not top_chunks:
             top_chunks = ["No relevant answers found."] * 3
@@ -56,6 +182,36 @@ def retrieve_answers(queries: List[str]) -> Dict[str, List[str]]:
     return results
 
 
+def _text_key(hit) -> tuple:
+    return hit.payload.get("document_id"), str(hit.id), hit.payload.get("chunk_index")
+
+
+def diversify(query_vectors: np.ndarray, batch_results: list, k: int = TOP_K, lambda_mult: float = MMR_LAMBDA) -> list:
+    """
+    Reduce every over-fetched search result to k diverse hits with one batched MMR pass.
+
+    Args:
+        query_vectors: (N, D) query embedding for each search result
+        batch_results: N lists of scored points, fetched with vectors
+
+    Returns:
+        list: N lists of at most k scored points, in MMR order
+    """
+    pool = max((len(result) for result in batch_results), default=0)
+    if pool <= k:
+        return batch_results
+
+    candidates = np.zeros((len(batch_results), pool, query_vectors.shape[1]), dtype=np.float32)
+    mask = np.zeros((len(batch_results), pool), dtype=bool)
+    for i, result in enumerate(batch_results):
+        if result:
+            candidates[i, :len(result)] = [hit.vector for hit in result]
+            mask[i, :len(result)] = True
+
+    picks = mmr_select(query_vectors.astype(np.float32), candidates, mask, k, lambda_mult)
+    return [[result[j] for j in row if j >= 0] for result, row in zip(batch_results, picks)]
+
+
 def format_retrieval_results(results: List[List[str]]) -> str:
     """
     Formats the retrieval results into a readable string.
@@ -69,8 +225,88 @@ def format_retrieval_results(results: List[List[str]]) -> str:
         
     return formatted
 
-def llm_inference(questions: List[str]) -> dict:
-    answers = retrieve_answers(questions)
+@tracing.traced()
+def llm_inference(
+    questions: List[str],
+    document_ids: List[str] = None,
+    hnsw_ef: int = None,
+    exact: bool = None,
+    query_vectors: np.ndarray = None,
+) -> dict:
+    """
+    Answer the questions from the retrieved chunks, within the current deadline.
+
+    Questions are sent to the LLM in concurrent groups of LLM_QUESTIONS_PER_CALL,
+    so that groups answered before the deadline are returned even if others
+    are not.
+
+    Returns:
+        dict: "answers" in question order and a "status" per question
+        (answered, deadline_exceeded or error)
+
+    Raises:
+        chunk_store.MissingTextsError: See retrieve_answers
+    """
+    result = unanswered(questions)
+    answers, status = result["answers"], result["status"]
+    tracing.set_attributes(questions=len(questions))
+    try:
+        contexts = retrieve_answers(questions, document_ids, hnsw_ef=hnsw_ef, exact=exact, query_vectors=query_vectors)
+    except deadline.DeadlineExceeded:
+        return result
+
+    size = LLM_QUESTIONS_PER_CALL or len(questions)
+    groups = [list(range(start, min(start + size, len(questions)))) for start in range(0, len(questions), size)]
+    pool = ThreadPoolExecutor(max_workers=max(1, len(groups)))
+    # Each call runs in a copy of this context so that it sees the request deadline
+    futures = {
+        pool.submit(
+            contextvars.copy_context().run,
+            _answer_group,
+            [questions[i] for i in group],
+            {questions[i]: contexts[questions[i]] for i in group},
+        ): group
+        for group in groups
+    }
+    # Do not wait for groups still running at the deadline; their calls time out on their own
+    done, _ = wait(futures, timeout=deadline.remaining())
+    pool.shutdown(wait=False, cancel_futures=True)
+
+    for future in done:
+        group = futures[future]
+        try:
+            group_answers = future.result()
+        except Exception as e:
+            if isinstance(e, deadline.DeadlineExceeded) or deadline.expired():
+                continue  # e.g. the LLM call timed out at the deadline
+            group_answers = e
+        if isinstance(group_answers, list):
+            for i, answer in zip(group, group_answers):
+                answers[i], status[i] = answer, STATUS_ANSWERED
+        else:
+            for i in group:
+                answers[i], status[i] = f"Error parsing model response: {group_answers}", STATUS_ERROR
+    return result
+
+
+def unanswered(questions: List[str]) -> dict:
+    """Result for questions the deadline left no time to answer."""
+    return {
+        "answers": ["Not answered: the request deadline was exceeded."] * len(questions),
+        "status": [STATUS_DEADLINE_EXCEEDED] * len(questions),
+    }
+
+
+@tracing.traced("llm_call")
+def _answer_group(questions: List[str], answers: Dict[str, List[str]]):
+    """
+    One LLM call for a group of questions.
+
+    Returns:
+        list: One answer per question, or the exception explaining why the
+        response could not be used
+    """
+    deadline.check("llm")
     prompt = f"""
 You are a helpful assistant. Using only the retrieved context chunks, respond to the user's questions.
 
@@ -84,7 +320,7 @@ You are a helpful assistant. Using only the retrieved context chunks, respond to
 - **Return ONLY a Python list of strings** (no extra text, no labels, no numbering).
 
 **Input**:
-A dictionary mapping each question to its top 3 context chunks:
+A dictionary mapping each question to its top context chunks (prefixed with the source document when several documents are searched):
 {answers}
 
 **Questions**:
@@ -98,11 +334,21 @@ A dictionary mapping each question to its top 3 context chunks:
 ]
 """
 
-    response = groq_client.chat.completions.create(
+    llm_timeout = deadline.timeout()
+    response = get_groq_client().chat.completions.create(
         model=GROQ_MODEL,
         messages=[{"role": "user", "content": prompt}],
         temperature=GROQ_TEMPERATURE,
         max_tokens=GROQ_MAX_TOKENS,
+        **({"timeout": llm_timeout} if llm_timeout is not None else {}),
+    )
+    usage = getattr(response, "usage", None)
+    tracing.set_attributes(
+        model=GROQ_MODEL,
+        questions=len(questions),
+        prompt_chars=len(prompt),
+        prompt_tokens=getattr(usage, "prompt_tokens", None),
+        completion_tokens=getattr(usage, "completion_tokens", None),
     )
 
     # Try parsing the LLM response content into a Python list
@@ -110,10 +356,13 @@ A dictionary mapping each question to its top 3 context chunks:
 
     try:
         parsed_answers = ast.literal_eval(content)
-        if isinstance(parsed_answers, list) and all(isinstance(ans, str) for ans in parsed_answers):
-            return {"answers": parsed_answers}
+        if (
+            isinstance(parsed_answers, list)
+            and all(isinstance(ans, str) for ans in parsed_answers)
+            and len(parsed_answers) == len(questions)
+        ):
+            return parsed_answers
         else:
             raise ValueError("Response format is invalid.")
     except Exception as e:
-        # Fallback response or logging
-        return {"answers": [f"Error parsing model response: {e}"]}
\ No newline at end of file
+        return e
@@ -0,0 +1,305 @@
+import argparse
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from qdrant_client.models import FieldCondition, Filter, MatchAny
+
+import app.service.chunk_store as chunk_store
+import app.service.registry as registry
+import app.service.vector_store as vector_store
+from app.config import SNAPSHOT_PATH, SNAPSHOT_VECTOR_DTYPE
+from app.service.embedder import MODEL_NAME
+
+logger = logging.getLogger(__name__)
+
+# Index snapshot: what a new replica needs to answer questions on documents
+# that are already indexed, without ingesting them again. One file:
+#
+#   header    b"RAGSNAP\0", uint32 version, uint32 flags (0),
+#             int64 manifest offset, int64 manifest length
+#   per document, every part starting on a 64-byte boundary:
+#     ids       n x 16 bytes: point id (UUID) of chunk i
+#     vectors   n x VECTOR_SIZE float32 or float16, in chunk_index order
+#     offsets   (n + 1) int64 into the texts, as in the chunk store
+#     texts     UTF-8 chunk texts, concatenated
+#   manifest  JSON at the end: embedding model, vector dtype, and per
+#             document its registry fields and the file offsets of its parts
+#
+# load() maps the file and serves chunk texts straight from the mapping; only
+# documents the vector store does not hold are upserted from it.
+VERSION = 1
+_MAGIC = b"RAGSNAP\0"
+_HEADER = struct.Struct("<8sIIqq")
+_ALIGN = 64
+EXPORT_GROUP = 64  # documents whose points are read in one scroll
+_mapped: List[mmap.mmap] = []  # loaded snapshots; mounted chunk texts point into them
+
+
+def _write_part(f, data) -> int:
+    """Write data at the next aligned position; returns that position."""
+    position = f.tell()
+    padding = -position % _ALIGN
+    f.write(b"\0" * padding)
+    f.write(data)
+    return position + padding
+
+
+def _points(counts: Dict[str, int]) -> Dict[str, tuple]:
+    """
+    Point ids and vectors of the chunks 0..count-1 of several documents, read
+    in one scroll. Documents whose points do not cover exactly those chunks
+    are left out.
+    """
+    ids = {document_id: [None] * count for document_id, count in counts.items()}
+    vectors = {document_id: np.zeros((count, vector_store.VECTOR_SIZE), dtype=np.float32) for document_id, count in counts.items()}
+    broken = set()
+    offset = None
+    while True:
+        points, offset = vector_store.get_client().scroll(
+            collection_name=vector_store.COLLECTION_NAME,
+            scroll_filter=Filter(must=[FieldCondition(key="document_id", match=MatchAny(any=list(counts)))]),
+            limit=1024,
+            offset=offset,
+            with_payload=["document_id", "chunk_index"],
+            with_vectors=True,
+        )
+        for point in points:
+            document_id, i = point.payload.get("document_id"), point.payload.get("chunk_index")
+            if not isinstance(i, int) or not 0 <= i < counts[document_id] or ids[document_id][i] is not None:
+                broken.add(document_id)
+                continue
+            ids[document_id][i] = str(point.id)
+            vectors[document_id][i] = point.vector
+        if offset is None:
+            break
+    return {
+        document_id: (ids[document_id], vectors[document_id])
+        for document_id in counts
+        if document_id not in broken and None not in ids[document_id]
+    }
+
+
+def export(path: str, document_ids: Optional[Iterable[str]] = None, dtype: str = SNAPSHOT_VECTOR_DTYPE) -> dict:
+    """
+    Write the indexed state to a snapshot file.
+
+    Documents still being indexed, or whose stored points do not match their
+    chunk texts, are left out (ingestion will bring them in line).
+
+    Args:
+        path: Snapshot file, replaced atomically
+        document_ids: Documents to include, default every document in the chunk store
+        dtype: Vector encoding, "float32" or "float16" (half the size)
+
+    Returns:
+        dict: Counts of documents written and skipped, and the file size in bytes
+    """
+    vector_dtype = np.dtype(dtype).newbyteorder("<")
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f"{target.name}.tmp{os.getpid()}")
+    documents, skipped = [], 0
+
+    document_ids = list(chunk_store.documents() if document_ids is None else document_ids)
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, VERSION, 0, 0, 0))  # manifest position is filled in at the end
+        for group_start in range(0, len(document_ids), EXPORT_GROUP):
+            group = {}
+            for document_id in document_ids[group_start:group_start + EXPORT_GROUP]:
+                record = registry.get(document_id)
+                stored = chunk_store.document(document_id)
+                if (record and record["status"] != registry.STATUS_READY) or stored is None:
+                    skipped += 1
+                    continue
+                group[document_id] = (record, *stored)
+            points = _points({document_id: len(entry[1]) - 1 for document_id, entry in group.items()}) if group else {}
+
+            for document_id, (record, offsets, texts, meta) in group.items():
+                if document_id not in points:
+                    logger.warning(f"⚠️ Stored points of document {document_id} do not match its {len(offsets) - 1} chunks, leaving it out")
+                    skipped += 1
+                    continue
+                ids, vectors = points[document_id]
+                documents.append({
+                    "document_id": document_id,
+                    "url": (record or {}).get("url") or meta.get("source_file"),
+                    "chunks": len(ids),
+                    "ids": _write_part(f, b"".join(uuid.UUID(point_id).bytes for point_id in ids)),
+                    "vectors": _write_part(f, vectors.astype(vector_dtype).tobytes()),
+                    "offsets": _write_part(f, np.asarray(offsets, dtype="<i8").tobytes()),
+                    "texts": _write_part(f, texts),
+                    "text_bytes": len(texts),
+                })
+
+        manifest = json.dumps({
+            "version": VERSION,
+            "created_at": time.time(),
+            "model": MODEL_NAME,
+            "vector_size": vector_store.VECTOR_SIZE,
+            "vector_dtype": vector_dtype.name,
+            "documents": documents,
+        }).encode("utf-8")
+        position = _write_part(f, manifest)
+        f.seek(0)
+        f.write(_HEADER.pack(_MAGIC, VERSION, 0, position, len(manifest)))
+    os.replace(tmp, target)
+
+    stats = {"documents": len(documents), "skipped": skipped, "bytes": target.stat().st_size}
+    logger.info(f"✅ Wrote index snapshot {target}: {stats}")
+    return stats
+
+
+def read_manifest(buffer, path: str = "snapshot") -> dict:
+    """
+    Manifest of a mapped snapshot.
+
+    Raises:
+        ValueError: If it is not a snapshot this build can load
+    """
+    if len(buffer) < _HEADER.size:
+        raise ValueError(f"{path} is not an index snapshot")
+    magic, version, _, position, length = _HEADER.unpack_from(buffer)
+    if magic != _MAGIC:
+        raise ValueError(f"{path} is not an index snapshot")
+    if version != VERSION:
+        raise ValueError(f"{path} is a version {version} snapshot, this build reads version {VERSION}")
+    manifest = json.loads(buffer[position:position + length])
+    if manifest["model"] != MODEL_NAME or manifest["vector_size"] != vector_store.VECTOR_SIZE:
+        raise ValueError(
+            f"{path} holds {manifest['model']} embeddings ({manifest['vector_size']} dims), "
+            f"this build uses {MODEL_NAME} ({vector_store.VECTOR_SIZE} dims)"
+        )
+    return manifest
+
+
+def _stored_ids(document_ids: List[str]) -> Dict[str, Dict[int, str]]:
+    """Point id per chunk_index the vector store holds for each document, read in one scroll per group."""
+    stored = {document_id: {} for document_id in document_ids}
+    for group_start in range(0, len(document_ids), EXPORT_GROUP):
+        group = document_ids[group_start:group_start + EXPORT_GROUP]
+        offset = None
+        while True:
+            points, offset = vector_store.get_client().scroll(
+                collection_name=vector_store.COLLECTION_NAME,
+                scroll_filter=Filter(must=[FieldCondition(key="document_id", match=MatchAny(any=group))]),
+                limit=1024,
+                offset=offset,
+                with_payload=["document_id", "chunk_index"],
+                with_vectors=False,
+            )
+            for point in points:
+                stored[point.payload["document_id"]][point.payload.get("chunk_index")] = str(point.id)
+            if offset is None:
+                break
+    return stored
+
+
+def _snapshot_ids(buffer, document: dict) -> List[str]:
+    """Point ids of a snapshot document, in chunk_index order."""
+    return [str(uuid.UUID(bytes=bytes(buffer[document["ids"] + 16 * i:document["ids"] + 16 * (i + 1)])))
+            for i in range(document["chunks"])]
+
+
+def _restore_points(buffer, document: dict, vector_dtype: np.dtype):
+    count = document["chunks"]
+    ids = _snapshot_ids(buffer, document)
+    vectors = np.frombuffer(buffer, dtype=vector_dtype, count=count * vector_store.VECTOR_SIZE, offset=document["vectors"])
+    vector_store.write_points(
+        ids,
+        vectors.reshape(count, vector_store.VECTOR_SIZE),
+        [{"document_id": document["document_id"], "chunk_index": i} for i in range(count)],
+    )
+
+
+def load(path: str = SNAPSHOT_PATH) -> dict:
+    """
+    Make the documents of a snapshot warm in this process.
+
+    For every document: its chunk texts are mounted from the mapped file
+    (unless the chunk store has a file for it, which is newer), its points
+    are upserted if the vector store holds none, and it is marked ready in
+    the registry, so requests for it skip ingestion. Documents whose stored
+    point ids differ from the snapshot's (re-ingested since the export) are
+    left to ingestion.
+
+    Returns:
+        dict: Counts of documents loaded, restored (points upserted) and
+        skipped, and the seconds taken
+
+    Raises:
+        ValueError: If the file is not a snapshot this build can load
+    """
+    start = time.perf_counter()
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    manifest = read_manifest(buffer, path)
+    vector_dtype = np.dtype(manifest["vector_dtype"]).newbyteorder("<")
+    documents = manifest["documents"]
+
+    vector_store.init_collection()
+    stored = _stored_ids([d["document_id"] for d in documents]) if documents else {}
+    on_disk = set(chunk_store.documents())
+    view = memoryview(buffer)
+    loaded = restored = skipped = 0
+    for document in documents:
+        document_id, count = document["document_id"], document["chunks"]
+        # Point ids derive from the chunk contents: equal counts are not enough,
+        # a document re-ingested since the export has as many chunks but other ids
+        points = stored.get(document_id, {})
+        if points and points != dict(enumerate(_snapshot_ids(buffer, document))):
+            skipped += 1
+            continue
+        if document_id not in on_disk:
+            ids = view[document["ids"]:document["ids"] + 16 * count]
+            offsets = np.frombuffer(buffer, dtype="<i8", count=count + 1, offset=document["offsets"])
+            texts = view[document["texts"]:document["texts"] + document["text_bytes"]]
+            chunk_store.mount(document_id, ids, offsets, texts, {"source_file": document["url"]})
+        if not points:
+            _restore_points(buffer, document, vector_dtype)
+            restored += 1
+        registry.mark_ready(document_id, document["url"], count)
+        loaded += 1
+    _mapped.append(buffer)
+
+    stats = {"documents": loaded, "restored": restored, "skipped": skipped, "seconds": round(time.perf_counter() - start, 3)}
+    logger.info(f"✅ Loaded index snapshot {path}: {stats}")
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export, inspect or load index snapshots.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="write the indexed documents to a snapshot")
+    export_parser.add_argument("path")
+    export_parser.add_argument("document_ids", nargs="*", help="default: every document in the chunk store")
+    export_parser.add_argument("--dtype", choices=["float32", "float16"], default=SNAPSHOT_VECTOR_DTYPE)
+    info_parser = commands.add_parser("info", help="print a snapshot's manifest summary")
+    info_parser.add_argument("path")
+    load_parser = commands.add_parser("load", help="restore a snapshot's points into the vector store")
+    load_parser.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        print(export(args.path, args.document_ids or None, args.dtype))
+    elif args.command == "load":
+        print(load(args.path))
+    else:
+        with open(args.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            manifest = read_manifest(buffer, args.path)
+        documents = manifest["documents"]
+        print(f"version {manifest['version']}, {manifest['model']} {manifest['vector_dtype']} x {manifest['vector_size']}, "
+              f"created {time.ctime(manifest['created_at'])}")
+        print(f"{len(documents)} documents, {sum(d['chunks'] for d in documents)} chunks")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,85 @@
+import os
+import socket
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from app.config import STATE_STORE_PATH
+
+# State every worker process of the server has to agree on: the document
+# registry, ingestion jobs, and per-worker admission stats for /metrics.
+# One SQLite file in WAL mode, like the artifact store, but never evicted.
+# Connections are per thread and per process: a forked worker opens its own.
+_local = threading.local()
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    document_id TEXT PRIMARY KEY,
+    url TEXT,
+    status TEXT NOT NULL,
+    chunks INTEGER,
+    completeness REAL,
+    updated_at REAL NOT NULL,
+    ingesting_by TEXT,  -- worker holding the ingestion lease
+    ingesting_seen REAL  -- its last heartbeat
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    document_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    finished_at REAL,
+    worker TEXT,
+    heartbeat REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_document ON jobs (document_id, status);
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at);
+CREATE TABLE IF NOT EXISTS workers (
+    worker TEXT PRIMARY KEY,
+    stats TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+def worker_id() -> str:
+    """This process, as recorded on leases and stats rows."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def connection() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.owner != (os.getpid(), STATE_STORE_PATH):
+        Path(STATE_STORE_PATH).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(STATE_STORE_PATH, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        _local.conn, _local.owner = conn, (os.getpid(), STATE_STORE_PATH)
+    return conn
+
+
+@contextmanager
+def transaction():
+    """Run the block as one write transaction, so reads and writes in it are not interleaved with another worker's."""
+    conn = connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def close():
+    """Close this thread's connection, e.g. in the server master before forking."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
@@ -0,0 +1,277 @@
+import functools
+import inspect
+import json
+import logging
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from opentelemetry import context as otel_context
+from opentelemetry import propagate, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+from opentelemetry.sdk.trace.sampling import ParentBasedTraceIdRatio
+from opentelemetry.trace import Link
+
+from app.config import (
+    APP_NAME,
+    TRACING_ENABLED,
+    TRACE_EXPORT_PATH,
+    TRACE_EXPORT_MAX_MB,
+    TRACE_SAMPLE_RATIO,
+    OTEL_EXPORTER_OTLP_ENDPOINT,
+)
+
+logger = logging.getLogger(__name__)
+
+# Spans go through the OpenTelemetry API: a no-op until setup() installs a
+# provider, and any provider the host already configured is used as is.
+tracer = trace.get_tracer("app")
+_provider: Optional[TracerProvider] = None
+
+
+class JsonlSpanExporter(SpanExporter):
+    """
+    Appends finished spans to a local file, one JSON object per line. Once the
+    file reaches max_bytes it is renamed to <path>.1, replacing the previous
+    one, so the export never takes more than about twice max_bytes.
+    """
+
+    def __init__(self, path: str, max_bytes: int = int(TRACE_EXPORT_MAX_MB * 2**20)):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def export(self, spans) -> SpanExportResult:
+        lines = [json.dumps(_span_record(span), default=str) + "\n" for span in spans]
+        try:
+            # One append per batch, so lines of several worker processes do not interleave
+            with self._lock:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("".join(lines))
+                    size = f.tell()
+                if self.max_bytes and size >= self.max_bytes:
+                    self._rotate()
+        except OSError as e:
+            logger.warning(f"⚠️ Could not write {len(lines)} spans to {self.path}: {e}")
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def _rotate(self):
+        try:
+            # Another worker process may have rotated it in the meantime
+            if os.stat(self.path).st_size >= self.max_bytes:
+                os.replace(self.path, f"{self.path}.1")
+        except FileNotFoundError:
+            pass
+
+    def shutdown(self):
+        pass
+
+
+def _span_record(span) -> dict:
+    return {
+        "trace_id": format(span.context.trace_id, "032x"),
+        "span_id": format(span.context.span_id, "016x"),
+        "parent_id": format(span.parent.span_id, "016x") if span.parent else None,
+        "name": span.name,
+        "start": span.start_time / 1e9,
+        "duration_ms": round((span.end_time - span.start_time) / 1e6, 3),
+        "status": span.status.status_code.name,
+        "attributes": dict(span.attributes or {}),
+        "events": [{"name": e.name, "attributes": dict(e.attributes or {})} for e in span.events],
+        "links": [format(link.context.trace_id, "032x") for link in span.links],
+    }
+
+
+def setup():
+    """
+    Install the tracer provider: OTLP when OTEL_EXPORTER_OTLP_ENDPOINT is set
+    (needs opentelemetry-exporter-otlp), else the local JSONL file. Call once
+    per process, after any fork.
+    """
+    global _provider
+    if not TRACING_ENABLED or _provider is not None:
+        return
+    if not isinstance(trace.get_tracer_provider(), trace.ProxyTracerProvider):
+        logger.info("Using the tracer provider configured by the host")
+        return
+
+    exporter = None
+    if OTEL_EXPORTER_OTLP_ENDPOINT:
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+            exporter = OTLPSpanExporter()
+            logger.info(f"Exporting spans to {OTEL_EXPORTER_OTLP_ENDPOINT}")
+        except ImportError:
+            logger.warning("⚠️ opentelemetry-exporter-otlp is not installed, writing spans locally")
+    if exporter is None:
+        exporter = JsonlSpanExporter(TRACE_EXPORT_PATH)
+        logger.info(f"Writing spans to {TRACE_EXPORT_PATH}")
+
+    _provider = TracerProvider(
+        resource=Resource.create({"service.name": APP_NAME}),
+        sampler=ParentBasedTraceIdRatio(TRACE_SAMPLE_RATIO),
+    )
+    _provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(_provider)
+
+
+def shutdown():
+    """Flush spans still buffered."""
+    if _provider is not None:
+        _provider.shutdown()
+
+
+@contextmanager
+def span(name: str, headers=None, new_trace: bool = False, **attributes):
+    """
+    Run the block in a child span of the current one.
+
+    Args:
+        name: Span name
+        headers: Incoming request headers; a W3C traceparent in them becomes the parent
+        new_trace: Start a separate trace linked to the current span (for
+            background work that outlives the request)
+        **attributes: Span attributes; None values are dropped
+    """
+    links = None
+    parent = propagate.extract(headers) if headers is not None else None
+    if new_trace:
+        current = trace.get_current_span().get_span_context()
+        links = [Link(current)] if current.is_valid else None
+        parent = otel_context.Context()
+    with tracer.start_as_current_span(name, context=parent, links=links, attributes=_clean(attributes)) as current_span:
+        yield current_span
+
+
+def traced(name: str = None):
+    """Decorator running every call of a function (sync or async) in its own span."""
+    def decorate(func):
+        span_name = name or func.__name__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def set_attributes(**attributes):
+    """Add attributes to the current span (e.g. sizes known only at the end)."""
+    trace.get_current_span().set_attributes(_clean(attributes))
+
+
+def trace_id() -> Optional[str]:
+    """Hex id of the current trace, None when not tracing."""
+    context = trace.get_current_span().get_span_context()
+    return format(context.trace_id, "032x") if context.is_valid else None
+
+
+def _clean(attributes: dict) -> dict:
+    # OpenTelemetry only takes str/bool/int/float (or sequences of them)
+    return {
+        key: value if isinstance(value, (str, bool, int, float)) else str(value)
+        for key, value in attributes.items()
+        if value is not None
+    }
+
+
+def _records(path: str):
+    """Spans of the JSONL export, the rotated file's first."""
+    for name in (f"{path}.1", path):
+        try:
+            with open(name, encoding="utf-8") as f:
+                yield from map(json.loads, f)
+        except FileNotFoundError:
+            continue
+
+
+def load(trace_id: str, path: str = TRACE_EXPORT_PATH) -> List[dict]:
+    """All spans of a trace from the JSONL export."""
+    return [record for record in _records(path) if record["trace_id"] == trace_id]
+
+
+def linked_traces(trace_id: str, path: str = TRACE_EXPORT_PATH) -> List[str]:
+    """Ids of traces started from this one (background work), in file order."""
+    linked = [record["trace_id"] for record in _records(path) if trace_id in record.get("links", [])]
+    return list(dict.fromkeys(linked))
+
+
+def critical_path(spans: List[dict]) -> List[dict]:
+    """
+    Spans the end of the trace waited on, in start order. Walking back from
+    the end of a span, the child that finished last is on the path, then the
+    child that finished last before that one started, and so on; each of
+    them is expanded the same way.
+    """
+    ids = {s["span_id"] for s in spans}
+    children: Dict[Optional[str], List[dict]] = {}
+    for s in spans:
+        children.setdefault(s["parent_id"] if s["parent_id"] in ids else None, []).append(s)
+
+    def end(s):
+        return s["start"] + s["duration_ms"] / 1e3
+
+    def walk(s) -> List[dict]:
+        chain, cursor = [], end(s)
+        while True:
+            before = [c for c in children.get(s["span_id"], []) if end(c) <= cursor + 1e-6 and c not in chain]
+            if not before:
+                break
+            last = max(before, key=end)
+            chain.append(last)
+            cursor = last["start"]
+        return [s] + [span for child in reversed(chain) for span in walk(child)]
+
+    roots = children.get(None, [])
+    return walk(max(roots, key=end)) if roots else []
+
+
+def print_trace(trace_id: str, path: str = TRACE_EXPORT_PATH):
+    """Span tree of a trace with durations; spans on the critical path are starred."""
+    spans = load(trace_id, path)
+    if not spans:
+        print(f"No spans for trace {trace_id} in {path}")
+        return
+    on_path = {s["span_id"] for s in critical_path(spans)}
+    ids = {s["span_id"] for s in spans}
+    t0 = min(s["start"] for s in spans)
+
+    children: Dict[Optional[str], List[dict]] = {}
+    for s in sorted(spans, key=lambda s: s["start"]):
+        children.setdefault(s["parent_id"] if s["parent_id"] in ids else None, []).append(s)
+
+    def show(s, depth):
+        mark = "*" if s["span_id"] in on_path else " "
+        attributes = " ".join(f"{k}={v}" for k, v in s["attributes"].items())
+        status = "" if s["status"] != "ERROR" else " ERROR"
+        print(f"{mark} {(s['start'] - t0) * 1e3:>9.1f} {s['duration_ms']:>9.1f}  {'  ' * depth}{s['name']}{status}  {attributes}")
+        for child in children.get(s["span_id"], []):
+            show(child, depth + 1)
+
+    print(f"  {'start ms':>9} {'ms':>9}  span  (* critical path)")
+    for root in children.get(None, []):
+        show(root, 0)
+    for background in linked_traces(trace_id, path):
+        print(f"Background work continued in trace {background}")
+
+
+if __name__ == "__main__":
+    # python -m app.service.tracing <trace id from the X-Trace-Id header> [spans.jsonl]
+    if len(sys.argv) < 2:
+        sys.exit("usage: python -m app.service.tracing TRACE_ID [TRACE_EXPORT_PATH]")
+    print_trace(sys.argv[1], *sys.argv[2:3])
@@ -1,9 +1,52 @@
-import json
+import uuid
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Sequence
+import numpy as np
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+from qdrant_client.local.qdrant_local import QdrantLocal
+from qdrant_client.models import (
+    Distance,
+    VectorParams,
+    PayloadSchemaType,
+    Filter,
+    FieldCondition,
+    MatchValue,
+    FilterSelector,
+    PointIdsList,
+    DeleteOperation,
+    SetPayload,
+    SetPayloadOperation,
+    HnswConfigDiff,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    SearchParams,
+    QuantizationSearchParams,
+)
 import logging
 import os
 from dotenv import load_dotenv
+from app.config import (
+    INDEX_HNSW_PARAMS,
+    VECTOR_QUANTIZATION,
+    QUANTIZATION_ALWAYS_RAM,
+    QUANTIZATION_RESCORE,
+    QUANTIZATION_OVERSAMPLING,
+    VECTORS_ON_DISK,
+    SEARCH_HNSW_EF,
+    SEARCH_EXACT,
+    QDRANT_PREFER_GRPC,
+    QDRANT_GRPC_PORT,
+    UPSERT_BATCH_SIZE,
+    UPSERT_PARALLELISM,
+)
+import app.service.deadline as deadline
+import app.service.chunk_store as chunk_store
+import app.service.tracing as tracing
 
 load_dotenv()
 
@@ -13,16 +56,98 @@ QDRANT_PORT = int(os.getenv("QDRANT_PORT", 6333))
 COLLECTION_NAME = os.getenv("COLLECTION_NAME", "RAG-Hackrx")
 VECTOR_SIZE = 768  # Matches BGE model
 
-# Initialize client
-client = QdrantClient(url=os.getenv("QDRANT_URL", f"http://{QDRANT_HOST}:{QDRANT_PORT}"))
+# Client is created on first use, so importing this module does not contact Qdrant
+client = None
+_client_lock = threading.Lock()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# init_collection runs from concurrent ingestion threads
+_collection_lock = threading.Lock()
+_collection_ready = False
+
+def get_client() -> QdrantClient:
+    global client
+    with _client_lock:
+        if client is None:
+            client = QdrantClient(
+                url=os.getenv("QDRANT_URL", f"http://{QDRANT_HOST}:{QDRANT_PORT}"),
+                prefer_grpc=QDRANT_PREFER_GRPC,
+                grpc_port=QDRANT_GRPC_PORT,
+            )
+    return client
+
+
+def collection_params(
+    quantization: str = VECTOR_QUANTIZATION,
+    on_disk: bool = VECTORS_ON_DISK,
+    hnsw_params: dict = INDEX_HNSW_PARAMS,
+) -> dict:
+    """
+    Build the create_collection arguments for the configured index layout.
+
+    Args:
+        quantization: "none", "int8" or "binary"
+        on_disk: Keep original float32 vectors on disk instead of RAM
+        hnsw_params: {"M": ..., "ef_construction": ...}
+
+    Returns:
+        dict: vectors_config, hnsw_config and quantization_config
+    """
+    if quantization == "int8":
+        quantization_config = ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=QUANTIZATION_ALWAYS_RAM)
+        )
+    elif quantization == "binary":
+        quantization_config = BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=QUANTIZATION_ALWAYS_RAM))
+    elif quantization in ("", "none"):
+        quantization_config = None
+    else:
+        raise ValueError(f"Unsupported vector quantization: {quantization}")
+
+    return {
+        "vectors_config": VectorParams(size=VECTOR_SIZE, distance=Distance.COSINE, on_disk=on_disk),
+        "hnsw_config": HnswConfigDiff(m=hnsw_params.get("M"), ef_construct=hnsw_params.get("ef_construction")),
+        "quantization_config": quantization_config,
+    }
+
+
+def search_params(hnsw_ef: int = None, exact: bool = None, quantization: str = VECTOR_QUANTIZATION) -> SearchParams:
+    """
+    Build per-search parameters, falling back to the configured defaults.
+
+    Args:
+        hnsw_ef: Size of the HNSW candidate list; larger is slower but more accurate
+        exact: Bypass the index and do a full scan
+        quantization: Quantization the collection was created with
+    """
+    quantization_params = None
+    if quantization not in ("", "none"):
+        quantization_params = QuantizationSearchParams(
+            rescore=QUANTIZATION_RESCORE,
+            oversampling=QUANTIZATION_OVERSAMPLING,
+        )
+    return SearchParams(
+        hnsw_ef=hnsw_ef or SEARCH_HNSW_EF,
+        exact=SEARCH_EXACT if exact is None else exact,
+        quantization=quantization_params,
+    )
+
+
 def init_collection(overwrite: bool = False):
+    global _collection_ready
+    with _collection_lock:
+        if _collection_ready and not overwrite:
+            return
+        _create_collection(overwrite)
+        _collection_ready = True
+
+
+def _create_collection(overwrite: bool):
     try:
-        client.get_collection(collection_name=COLLECTION_NAME)
+        get_client().get_collection(collection_name=COLLECTION_NAME)
         if overwrite:
-            client.delete_collection(collection_name=COLLECTION_NAME)
+            get_client().delete_collection(collection_name=COLLECTION_NAME)
             logging.info(f"⚠️ Overwriting existing collection '{COLLECTION_NAME}'")
         else:
             logging.info(f"ℹ️ Collection '{COLLECTION_NAME}' already exists.")
@@ -30,22 +155,229 @@ def init_collection(overwrite: bool = False):
     except Exception:
         logging.info(f"ℹ️ Collection '{COLLECTION_NAME}' does not exist. Creating...")
 
-    client.create_collection(
+    # Index layout only applies at creation; use overwrite=True to rebuild
+    try:
+        get_client().create_collection(collection_name=COLLECTION_NAME, **collection_params())
+    except Exception:
+        # Another worker process created it in the meantime
+        if not get_client().collection_exists(collection_name=COLLECTION_NAME):
+            raise
+        return
+    # Every search is scoped to one document, so index the filter field
+    get_client().create_payload_index(
         collection_name=COLLECTION_NAME,
-        vectors_config=VectorParams(size=VECTOR_SIZE, distance=Distance.COSINE)
+        field_name="document_id",
+        field_schema=PayloadSchemaType.KEYWORD,
     )
     print(f"✅ Collection '{COLLECTION_NAME}' is ready.")
 
 
-def upload_qdrant_ready_file(json_path: str):
-    with open(json_path, "r", encoding="utf-8") as f:
-        points_raw = json.load(f)
+def document_filter(document_id: str) -> Filter:
+    return Filter(must=[FieldCondition(key="document_id", match=MatchValue(value=document_id))])
+
+
+def has_document(document_id: str) -> bool:
+    """
+    Check whether any vectors are stored for a document.
+
+    Args:
+        document_id: Document id assigned at ingestion
+
+    Returns:
+        bool: True if the collection holds at least one point for the document
+    """
+    try:
+        result = get_client().count(
+            collection_name=COLLECTION_NAME,
+            count_filter=document_filter(document_id),
+            exact=False,
+        )
+    except Exception:
+        return False
+    return result.count > 0
+
+
+def delete_document(document_id: str):
+    get_client().delete(
+        collection_name=COLLECTION_NAME,
+        points_selector=FilterSelector(filter=document_filter(document_id)),
+    )
+    chunk_store.delete(document_id)
+
+
+def chunk_point_ids(document_id: str, hashes: List[str]) -> List[str]:
+    """
+    Content-addressed point ids: the same chunk text in the same document always
+    maps to the same id. Repeated chunks are told apart by their occurrence count.
+    """
+    namespace = uuid.UUID(document_id)
+    seen = {}
+    ids = []
+    for h in hashes:
+        occurrence = seen.get(h, 0)
+        seen[h] = occurrence + 1
+        ids.append(str(uuid.uuid5(namespace, f"{h}:{occurrence}")))
+    return ids
+
+
+def stored_chunks(document_id: str) -> Dict[str, int]:
+    """
+    Ids of all points stored for a document, mapped to their chunk index.
+    """
+    stored = {}
+    offset = None
+    while True:
+        points, offset = get_client().scroll(
+            collection_name=COLLECTION_NAME,
+            scroll_filter=document_filter(document_id),
+            limit=1024,
+            offset=offset,
+            with_payload=["chunk_index"],
+            with_vectors=False,
+        )
+        for point in points:
+            stored[str(point.id)] = point.payload.get("chunk_index")
+        if offset is None:
+            return stored
+
+
+def plan_sync(document_id: str, hashes: List[str]) -> dict:
+    """
+    Compare a document's current chunks with its stored points.
+
+    Args:
+        document_id: Document id assigned at ingestion
+        hashes: chunker.chunk_hash of every current chunk, in document order
+
+    Returns:
+        dict: "ids" (point id per chunk), "new" (indices of chunks to embed
+        and upsert), "operations" (deletes of stale points and chunk_index
+        updates of moved ones) and "deleted" (number of stale points)
+    """
+    ids = chunk_point_ids(document_id, hashes)
+    stored = stored_chunks(document_id)
+    current = set(ids)
+
+    new = [i for i, point_id in enumerate(ids) if point_id not in stored]
+    moved = [i for i, point_id in enumerate(ids) if point_id in stored and stored[point_id] != i]
+    stale = [point_id for point_id in stored if point_id not in current]
+
+    operations = []
+    if stale:
+        operations.append(DeleteOperation(delete=PointIdsList(points=stale)))
+    operations.extend(
+        SetPayloadOperation(set_payload=SetPayload(payload={"chunk_index": i}, points=[ids[i]]))
+        for i in moved
+    )
+    return {"ids": ids, "new": new, "operations": operations, "deleted": len(stale)}
+
+
+@tracing.traced()
+def sync_document(
+    document_id: str,
+    chunks: List[str],
+    hashes: List[str],
+    embed: Callable[[List[str]], list],
+    source_file: str = "unknown",
+) -> dict:
+    """
+    Bring the stored points of a document in line with its current chunks.
+
+    Only chunks whose content is not stored yet are embedded and upserted.
+    Points of chunks that disappeared are deleted, and unchanged chunks keep
+    their vectors (only their chunk_index is updated if it moved). New
+    points are written with write_points; deletes and chunk_index updates go
+    after them, once every new point is stored.
+
+    Points only carry document_id and chunk_index; the chunk texts are written
+    to the chunk store, under their point ids, before the points, so every new
+    point resolves to its text as soon as it is searchable.
+
+    Args:
+        document_id: Document id assigned at ingestion
+        chunks: Current chunk texts, in document order
+        hashes: chunker.chunk_hash of every chunk
+        embed: Function embedding a list of chunk texts
+        source_file: Document URL, stored with the chunk texts
+
+    Returns:
+        dict: Counts of chunks, embedded, reused and deleted points
+    """
+    init_collection()
+    plan = plan_sync(document_id, hashes)
+    new = plan["new"]
+    vectors = embed([chunks[i] for i in new]) if new else np.zeros((0, VECTOR_SIZE), dtype=np.float32)
+    deadline.check("upsert")
+    chunk_store.write(document_id, chunks, plan["ids"], source_file)
+    write_points(
+        [plan["ids"][i] for i in new],
+        vectors,
+        [{"document_id": document_id, "chunk_index": i} for i in new],
+        plan["operations"],
+    )
+
+    stats = {"chunks": len(chunks), "embedded": len(new), "reused": len(chunks) - len(new), "deleted": plan["deleted"]}
+    tracing.set_attributes(document_id=document_id, **stats)
+    logging.info(f"✅ Synced document {document_id}: {stats}")
+    return stats
+
+
+@tracing.traced("upsert")
+def write_points(
+    ids: Sequence[str],
+    vectors: np.ndarray,
+    payloads: Sequence[dict],
+    operations: Sequence = (),
+    batch_size: int = UPSERT_BATCH_SIZE,
+    parallelism: int = UPSERT_PARALLELISM,
+    collection_name: str = COLLECTION_NAME,
+):
+    """
+    Upsert points in batches with bounded parallelism, then apply `operations`.
+
+    Batches are sent by `parallelism` threads, each streaming its share of
+    the NumPy array through upload_collection (no per-point PointStruct or
+    list conversion). Every batch is sent with wait=True: a waited-for
+    request does not make earlier un-waited ones from other connections
+    visible on a sharded or replicated collection, so each thread waits for
+    its own batches instead, and the requests in flight still overlap.
+    `operations` go last, once every point is written. Every point is
+    searchable when this function returns.
+
+    Args:
+        ids: Point ids
+        vectors: (len(ids), dim) array
+        payloads: One payload per point
+        operations: Further update operations (deletes, payload updates) to apply
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    qdrant = get_client()
+    if isinstance(getattr(qdrant, "_client", None), QdrantLocal):
+        parallelism = 1  # the in-process local mode is not thread-safe
+    tracing.set_attributes(points=len(ids), operations=len(operations), batch_size=batch_size, parallelism=parallelism)
+
+    def _upload(start: int, stop: int):
+        with tracing.span("upsert_batch", points=int(stop - start)):
+            qdrant.upload_collection(
+                collection_name=collection_name,
+                vectors=vectors[start:stop],
+                payload=payloads[start:stop],
+                ids=ids[start:stop],
+                batch_size=batch_size,
+                wait=True,
+            )
+
+    if len(ids):
+        bounds = np.linspace(0, len(ids), min(parallelism, -(-len(ids) // batch_size)) + 1, dtype=int)
+        # Threads run in a copy of this context, so their spans nest under this one
+        with ThreadPoolExecutor(max_workers=len(bounds) - 1) as pool:
+            futures = [
+                pool.submit(contextvars.copy_context().run, _upload, start, stop)
+                for start, stop in zip(bounds[:-1], bounds[1:])
+            ]
+            for future in futures:
+                future.result()
 
-    points = [
-        PointStruct(id=pt["id"], vector=pt["vector"], payload=pt["payload"])
-        for pt in points_raw
-    ]
-    
-    init_collection(True)
-    client.upsert(collection_name=COLLECTION_NAME, points=points)
-    logging.info(f"✅ Uploaded {len(points)} vectors to Qdrant collection '{COLLECTION_NAME}'.")
+    if operations:
+        with tracing.span("update_operations", operations=len(operations)):
+            qdrant.batch_update_points(collection_name=collection_name, update_operations=list(operations), wait=True)
@@ -0,0 +1,141 @@
+'''
+# File: app/test_admission.py
+# Tests for admission control lanes (priority order, 429 on full queue, 503 on
+# timeout) and their split between server workers.'''
+
+import sys
+import os
+import asyncio
+import pytest
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+import app.service.admission as admission
+import app.service.state_store as state_store
+from app.service.admission import Lane, Overloaded
+
+
+def test_waiters_served_in_priority_order():
+    async def scenario():
+        lane = Lane("test", limit=1, max_queue=10, max_wait=5)
+        order = []
+        release = asyncio.Event()
+
+        async def holder():
+            async with lane.slot():
+                await release.wait()
+
+        async def waiter(name, priority):
+            async with lane.slot(priority):
+                order.append(name)
+
+        first = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        tasks = [asyncio.create_task(waiter("cold", 1)), asyncio.create_task(waiter("warm", 0))]
+        await asyncio.sleep(0)
+        assert lane.stats()["queued"] == 2
+        release.set()
+        await asyncio.gather(first, *tasks)
+        assert order == ["warm", "cold"]
+        assert lane.active == 0 and lane.queued == 0
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_rejects_and_long_wait_times_out():
+    async def scenario():
+        lane = Lane("test", limit=1, max_queue=1, max_wait=0.05)
+        release = asyncio.Event()
+
+        async def holder():
+            async with lane.slot():
+                await release.wait()
+
+        async def waiter():
+            async with lane.slot():
+                pass
+
+        first = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(waiter())
+        await asyncio.sleep(0)
+
+        with pytest.raises(Overloaded) as rejected:
+            await waiter()
+        assert rejected.value.status_code == 429 and rejected.value.retry_after >= 1
+
+        with pytest.raises(Overloaded) as timed_out:
+            await queued
+        assert timed_out.value.status_code == 503
+
+        release.set()
+        await first
+        stats = lane.stats()
+        assert (stats["active"], stats["queued"], stats["rejected"], stats["timed_out"]) == (0, 0, 1, 1)
+
+    asyncio.run(scenario())
+
+
+def test_background_waiters_are_not_counted_against_the_queue():
+    async def scenario():
+        lane = Lane("test", limit=1, max_queue=1, max_wait=5)
+        release = asyncio.Event()
+
+        async def holder(**kwargs):
+            async with lane.slot(**kwargs):
+                await release.wait()
+
+        first = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        background = [asyncio.create_task(holder(priority=1, bounded=False)) for _ in range(3)]
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        stats = lane.stats()
+        assert (stats["queued"], stats["background"]) == (1, 3)
+
+        with pytest.raises(Overloaded):
+            await holder()  # the bounded queue is full, whatever waits in the background
+
+        release.set()
+        await asyncio.gather(first, queued, *background)
+        stats = lane.stats()
+        assert (stats["active"], stats["queued"], stats["background"], stats["rejected"]) == (0, 0, 0, 1)
+
+    asyncio.run(scenario())
+
+
+def test_metrics_require_authentication(monkeypatch, tmp_path):
+    from fastapi.testclient import TestClient
+    import app.routes.rag as rag
+    from app.main import app as api
+
+    monkeypatch.setattr(rag, "ENABLE_AUTH", True)
+    monkeypatch.setattr(state_store, "STATE_STORE_PATH", str(tmp_path / "state.db"))
+    client = TestClient(api)
+    assert client.get("/metrics").status_code == 401
+    response = client.get("/metrics", headers={"X-API-Key": "ops"})
+    assert response.status_code == 200 and "background" in response.json()["ingest"]
+
+
+def test_workers_share_the_limits_and_report_server_totals(monkeypatch, tmp_path):
+    monkeypatch.setattr(state_store, "STATE_STORE_PATH", str(tmp_path / "state.db"))
+    lanes = {}
+    for index in range(3):
+        monkeypatch.setattr(admission, "ingest", Lane("ingest", limit=2, max_queue=8, max_wait=5))
+        monkeypatch.setattr(admission, "qa", Lane("qa", limit=8, max_queue=32, max_wait=5))
+        admission.share(3, index)
+        lanes[index] = (admission.ingest.limit, admission.qa.limit, admission.qa.max_queue)
+    assert lanes == {0: (1, 3, 11), 1: (1, 3, 11), 2: (1, 2, 10)}  # qa adds up to the configured totals
+
+    # Two other workers published their stats; the third one is gone
+    this_worker = state_store.worker_id()
+    for worker, age in (("other-host:1", 0), ("other-host:2", 0), ("other-host:3", 3600)):
+        monkeypatch.setattr(state_store, "worker_id", lambda: worker)
+        admission.qa.admitted = 5
+        admission.publish()
+        state_store.connection().execute("UPDATE workers SET updated_at = updated_at - ? WHERE worker = ?", (age, worker))
+    monkeypatch.setattr(state_store, "worker_id", lambda: this_worker)
+    admission.qa.admitted = 1
+
+    totals = admission.server_stats()
+    assert totals["workers"] == 3
+    assert (totals["qa"]["admitted"], totals["qa"]["limit"], totals["ingest"]["limit"]) == (11, 6, 3)
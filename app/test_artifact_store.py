@@ -0,0 +1,93 @@
+'''
+# File: app/test_artifact_store.py
+# Tests for the shared, compressed artifact store.'''
+
+import sys
+import os
+import sqlite3
+import threading
+import numpy as np
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+import app.service.artifact_store as artifact_store
+
+
+def _use_tmp_store(monkeypatch, tmp_path, max_mb=2048):
+    monkeypatch.setattr(artifact_store, "ARTIFACT_STORE_PATH", str(tmp_path / "artifacts.db"))
+    monkeypatch.setattr(artifact_store, "ARTIFACT_STORE_MAX_MB", max_mb)
+    monkeypatch.setattr(artifact_store, "_local", threading.local())
+
+
+def test_read_through_computes_once(monkeypatch, tmp_path):
+    _use_tmp_store(monkeypatch, tmp_path)
+    calls = []
+
+    def chunk():
+        calls.append(1)
+        return ["first chunk", "second chunk"]
+
+    assert artifact_store.cached_json("chunks", "k", chunk) == ["first chunk", "second chunk"]
+    assert artifact_store.cached_json("chunks", "k", chunk) == ["first chunk", "second chunk"]
+    assert len(calls) == 1
+
+
+def test_cached_vectors_only_computes_missing(monkeypatch, tmp_path):
+    _use_tmp_store(monkeypatch, tmp_path)
+    computed = []
+
+    def embed(missing):
+        computed.append(missing)
+        return np.array([[float(i), 1.0] for i in missing])
+
+    first = artifact_store.cached_vectors("embedding", ["a", "b"], embed)
+    second = artifact_store.cached_vectors("embedding", ["b", "c", "a"], embed)
+
+    assert computed == [[0, 1], [1]]
+    assert second.dtype == np.float32
+    assert np.array_equal(second[0], first[1]) and np.array_equal(second[2], first[0])
+
+
+def test_eviction_keeps_store_under_budget(monkeypatch, tmp_path):
+    _use_tmp_store(monkeypatch, tmp_path, max_mb=1)
+    for i in range(4):
+        artifact_store.put("text", f"doc-{i}", os.urandom(400 * 1024))  # incompressible
+
+    assert artifact_store.get("text", "doc-0") is None
+    assert artifact_store.get("text", "doc-3") is not None
+
+
+def test_size_total_follows_writes_and_evictions(monkeypatch, tmp_path):
+    # A store written before the total existed is seeded when first opened
+    path = tmp_path / "artifacts.db"
+    with sqlite3.connect(path) as old:
+        old.execute("CREATE TABLE artifacts (kind TEXT NOT NULL, key TEXT NOT NULL, data BLOB NOT NULL, "
+                    "size INTEGER NOT NULL, accessed REAL NOT NULL, PRIMARY KEY (kind, key))")
+        old.execute("INSERT INTO artifacts VALUES ('text', 'old', x'00', 300 * 1024, 0)")
+    _use_tmp_store(monkeypatch, tmp_path, max_mb=1)
+
+    def total():
+        conn = artifact_store._connection()
+        usage = conn.execute("SELECT total FROM artifacts_usage").fetchone()[0]
+        assert usage == conn.execute("SELECT SUM(size) FROM artifacts").fetchone()[0]
+        return usage
+
+    assert total() == 300 * 1024
+    artifact_store.put("text", "a", os.urandom(200 * 1024))
+    artifact_store.put("text", "a", os.urandom(100 * 1024))  # replaced, not counted twice
+    assert 400 * 1024 < total() < 420 * 1024
+    for i in range(3):
+        artifact_store.put("text", f"doc-{i}", os.urandom(300 * 1024))
+    assert total() <= 0.9 * 1024 * 1024
+    assert artifact_store.get("text", "old") is None
+
+
+def test_zstd_rows_are_misses_without_zstandard(monkeypatch, tmp_path):
+    _use_tmp_store(monkeypatch, tmp_path)
+    artifact_store._connection().execute(
+        "INSERT INTO artifacts (kind, key, data, size, accessed) VALUES ('chunks', 'k', ?, 8, 0)",
+        (artifact_store._ZSTD_MAGIC + b"\x00" * 4,),
+    )
+    monkeypatch.setattr(artifact_store, "zstandard", None)
+
+    assert artifact_store.get("chunks", "k") is None
+    assert artifact_store.cached_json("chunks", "k", lambda: ["recomputed"]) == ["recomputed"]
+    assert artifact_store.get("chunks", "k") == b'["recomputed"]'
@@ -0,0 +1,81 @@
+'''
+# File: app/test_bulk_ingest.py
+# The bulk ingester indexes a library through its process pipeline, records
+# every finished document in the checkpoint and skips them when run again.'''
+
+import sys
+import os
+import io
+import json
+import docx
+import numpy as np
+from qdrant_client import QdrantClient
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+import app.ingest as ingest
+import app.service.artifact_store as artifact_store
+import app.service.chunk_store as chunk_store
+import app.service.embedder as embedder
+import app.service.registry as registry
+import app.service.state_store as state_store
+import app.service.vector_store as vector_store
+
+BASE_URL = "https://docs.example.com/policies"
+
+
+class _Model:
+    def encode(self, texts, normalize_embeddings=True, **kwargs):
+        vectors = np.stack([
+            np.random.default_rng(len(t)).standard_normal(vector_store.VECTOR_SIZE) for t in texts
+        ]).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _docx(clauses: int, name: str) -> bytes:
+    doc = docx.Document()
+    for i in range(clauses):
+        doc.add_paragraph(f"{name} clause {i}: hospitalisation expenses are payable after a waiting period of {i} months.")
+    out = io.BytesIO()
+    doc.save(out)
+    return out.getvalue()
+
+
+def test_ingest_library_and_resume(monkeypatch, tmp_path):
+    library = tmp_path / "library"
+    (library / "health").mkdir(parents=True)
+    (library / "health" / "gold.docx").write_bytes(_docx(40, "Gold"))
+    (library / "health" / "silver.docx").write_bytes(_docx(25, "Silver"))
+    (library / "motor.docx").write_bytes(_docx(10, "Motor"))
+    (library / "broken.docx").write_bytes(b"not a zip file")
+    (library / "notes.txt").write_text("not a supported document")
+
+    monkeypatch.setattr(artifact_store, "ARTIFACT_STORE_ENABLED", False)
+    monkeypatch.setattr(chunk_store, "CHUNK_STORE_PATH", str(tmp_path / "chunks"))
+    monkeypatch.setattr(vector_store, "client", QdrantClient(":memory:"))
+    monkeypatch.setattr(vector_store, "_collection_ready", False)
+    monkeypatch.setattr(embedder, "model", _Model())
+    monkeypatch.setattr(state_store, "STATE_STORE_PATH", str(tmp_path / "state.db"))
+    checkpoint = str(tmp_path / "checkpoint.jsonl")
+
+    sources = ingest.collect_sources([str(library)], base_url=BASE_URL)
+    assert sorted(url for _, url in sources) == [
+        f"{BASE_URL}/broken.docx", f"{BASE_URL}/health/gold.docx", f"{BASE_URL}/health/silver.docx", f"{BASE_URL}/motor.docx",
+    ]
+
+    report = ingest.ingest(sources, workers=2, batch_size=16, checkpoint=checkpoint)
+    assert (report["indexed"], report["failed"], report["skipped"]) == (3, 1, 0)
+    assert report["embedded"] == report["chunks"] > 0
+    assert report["stages"]["embed"]["batches"] >= 1
+
+    gold = registry.document_id_for(f"{BASE_URL}/health/gold.docx")
+    stored = vector_store.stored_chunks(gold)
+    assert sorted(stored.values()) == list(range(len(stored)))
+    assert "Gold clause 0" in chunk_store.texts([(gold, 0)])[(gold, 0)]
+    assert chunk_store.source_file(gold) == f"{BASE_URL}/health/gold.docx"
+
+    with open(checkpoint) as f:
+        records = [json.loads(line) for line in f]
+    assert sorted(r["status"] for r in records) == ["failed", "ready", "ready", "ready"]
+
+    # A second run only retries the document that failed
+    report = ingest.ingest(sources, workers=2, batch_size=16, checkpoint=checkpoint)
+    assert (report["indexed"], report["failed"], report["skipped"], report["embedded"]) == (0, 1, 3, 0)
@@ -0,0 +1,107 @@
+'''
+# File: app/test_chunk_store.py
+# Qdrant points only carry document_id and chunk_index; retrieval reads the
+# chunk texts back from the local chunk store, by point id.'''
+
+import sys
+import os
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+import app.service.vector_store as vector_store
+import app.service.chunk_store as chunk_store
+import app.service.retrival as retrival
+from app.service.chunker import chunk_hash
+
+DOCUMENT_ID = "0b6f3a52-4c1e-5d8a-9f27-3e1d2c4b5a60"
+
+
+def _ids(chunks):
+    return vector_store.chunk_point_ids(DOCUMENT_ID, [chunk_hash(c) for c in chunks])
+
+
+def test_texts_round_trip(monkeypatch, tmp_path):
+    monkeypatch.setattr(chunk_store, "CHUNK_STORE_PATH", str(tmp_path))
+    chunks = ["Grace period: 30 days.", "", "Prämie jährlich — 12 € ✓"]
+    ids = _ids(chunks)
+    chunk_store.write(DOCUMENT_ID, chunks, ids, "https://example.com/policy.pdf?sig=1")
+
+    keys = [(DOCUMENT_ID, i) for i in range(3)] + [(DOCUMENT_ID, 3), ("missing", 0)]
+    assert chunk_store.texts(keys) == {(DOCUMENT_ID, i): c for i, c in enumerate(chunks)}
+    assert chunk_store.source_file(DOCUMENT_ID) == "https://example.com/policy.pdf?sig=1"
+
+    chunk_store.write(DOCUMENT_ID, ["Rewritten."], _ids(["Rewritten."]))
+    assert chunk_store.texts([(DOCUMENT_ID, 0), (DOCUMENT_ID, 1)]) == {(DOCUMENT_ID, 0): "Rewritten."}
+
+    chunk_store.delete(DOCUMENT_ID)
+    assert chunk_store.texts([(DOCUMENT_ID, 0)]) == {}
+
+
+def test_moved_chunks_resolve_by_point_id(monkeypatch, tmp_path):
+    monkeypatch.setattr(chunk_store, "CHUNK_STORE_PATH", str(tmp_path))
+    old = ["Clause A.", "Clause B.", "Clause C."]
+    old_ids = _ids(old)
+    new = ["Clause 0: new preamble.", "Clause A.", "Clause C."]
+    chunk_store.write(DOCUMENT_ID, new, _ids(new))
+
+    # Points not updated yet still carry their old chunk_index
+    keys = [(DOCUMENT_ID, old_ids[i], i) for i in range(3)]
+    assert chunk_store.texts(keys) == {keys[0]: "Clause A.", keys[2]: "Clause C."}  # B was removed
+
+
+def test_retrieval_resolves_compact_payloads(monkeypatch, tmp_path):
+    qdrant = QdrantClient(":memory:")
+    monkeypatch.setattr(chunk_store, "CHUNK_STORE_PATH", str(tmp_path))
+    monkeypatch.setattr(vector_store, "client", qdrant)
+    monkeypatch.setattr(vector_store, "_collection_ready", False)
+    monkeypatch.setattr(retrival, "client", qdrant)
+
+    chunks = [f"Clause {i}: benefits are payable." for i in range(5)]
+    vectors = np.eye(5, vector_store.VECTOR_SIZE, dtype=np.float32)
+    vector_store.sync_document(DOCUMENT_ID, chunks, [chunk_hash(c) for c in chunks], lambda c: vectors[:len(c)], "policy.pdf")
+
+    points, _ = qdrant.scroll(vector_store.COLLECTION_NAME, limit=10)
+    assert all(set(p.payload) == {"document_id", "chunk_index"} for p in points)
+
+    results = retrival.retrieve_answers(["q"], [DOCUMENT_ID], exact=True, mmr=False, query_vectors=vectors[2:3])
+    assert results["q"][0] == chunks[2]
+
+
+def test_documents_missing_from_the_chunk_store_are_an_error(monkeypatch, tmp_path):
+    qdrant = QdrantClient(":memory:")
+    monkeypatch.setattr(chunk_store, "CHUNK_STORE_PATH", str(tmp_path / "indexing"))
+    monkeypatch.setattr(vector_store, "client", qdrant)
+    monkeypatch.setattr(vector_store, "_collection_ready", False)
+    monkeypatch.setattr(retrival, "client", qdrant)
+
+    chunks = [f"Clause {i}: benefits are payable." for i in range(5)]
+    vectors = np.eye(5, vector_store.VECTOR_SIZE, dtype=np.float32)
+    vector_store.sync_document(DOCUMENT_ID, chunks, [chunk_hash(c) for c in chunks], lambda c: vectors[:len(c)], "policy.pdf")
+
+    # A replica sharing the vector store but not the chunk store
+    monkeypatch.setattr(chunk_store, "CHUNK_STORE_PATH", str(tmp_path / "replica"))
+    monkeypatch.setattr(chunk_store, "_open", {})
+    with pytest.raises(chunk_store.MissingTextsError) as e:
+        retrival.retrieve_answers(["q"], [DOCUMENT_ID], exact=True, mmr=False, query_vectors=vectors[2:3])
+    assert e.value.document_ids == [DOCUMENT_ID]
+
+
+def test_run_answers_409_for_missing_texts(monkeypatch, tmp_path):
+    from fastapi.testclient import TestClient
+    import app.routes.rag as rag
+    import app.service.state_store as state_store
+    from app.main import app as api
+
+    def llm_inference(questions, document_ids, **kwargs):
+        raise chunk_store.MissingTextsError(document_ids)
+
+    monkeypatch.setattr(rag, "ENABLE_AUTH", False)
+    monkeypatch.setattr(state_store, "STATE_STORE_PATH", str(tmp_path / "state.db"))
+    monkeypatch.setattr(vector_store, "has_document", lambda document_id: True)
+    monkeypatch.setattr(retrival, "embed_queries", lambda questions: np.zeros((len(questions), vector_store.VECTOR_SIZE)))
+    monkeypatch.setattr(retrival, "llm_inference", llm_inference)
+
+    response = TestClient(api).post("/api/v1/hackrx/run", json={"document_id": DOCUMENT_ID, "questions": ["Grace period?"]})
+    assert response.status_code == 409
+    assert DOCUMENT_ID in response.json()["detail"]
@@ -0,0 +1,57 @@
+'''
+# File: app/test_deadline.py
+# Tests for request deadlines and partial answers.'''
+
+import sys
+import os
+import asyncio
+import time
+from types import SimpleNamespace
+import pytest
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+import app.service.deadline as deadline
+import app.service.retrival as retrival
+
+
+def test_deadline_cancels_awaited_stage():
+    async def scenario():
+        with deadline.scope(0.05):
+            with pytest.raises(deadline.DeadlineExceeded) as e:
+                await deadline.run(asyncio.sleep(5), "ingestion")
+            assert e.value.stage == "ingestion"
+            # Threads inherit the deadline
+            with pytest.raises(deadline.DeadlineExceeded):
+                await asyncio.to_thread(deadline.check, "embedding")
+        assert deadline.remaining() is None
+
+    asyncio.run(scenario())
+
+
+def test_budget_is_capped_by_config(monkeypatch):
+    monkeypatch.setattr(deadline, "REQUEST_TIMEOUT", 30)
+    assert deadline.budget(None) == 30
+    assert deadline.budget(5) == 5
+    assert deadline.budget(300) == 30
+
+
+def test_llm_inference_returns_completed_groups(monkeypatch):
+    questions = ["fast 1", "fast 2", "slow 1", "slow 2"]
+    monkeypatch.setattr(retrival, "LLM_QUESTIONS_PER_CALL", 2)
+    monkeypatch.setattr(retrival, "retrieve_answers", lambda qs, *a, **kw: {q: ["chunk"] for q in qs})
+
+    def create(messages, **kwargs):
+        slow = "slow 1" in messages[0]["content"]
+        time.sleep(1 if slow else 0)
+        content = str(["answer slow"] * 2 if slow else ["answer 1", "answer 2"])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    fake_groq = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(retrival, "groq_client", fake_groq)
+
+    with deadline.scope(0.3):
+        started = time.monotonic()
+        result = retrival.llm_inference(questions)
+        assert time.monotonic() - started < 0.8
+
+    assert result["answers"][:2] == ["answer 1", "answer 2"]
+    assert result["status"] == ["answered", "answered", "deadline_exceeded", "deadline_exceeded"]
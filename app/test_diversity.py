@@ -0,0 +1,35 @@
+'''
+# File: app/test_diversity.py
+# Tests for the batched MMR selection used to de-duplicate retrieval hits.'''
+
+import sys
+import os
+import numpy as np
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+from app.service.diversity import mmr_select
+
+
+def _unit(v):
+    v = np.asarray(v, dtype=np.float32)
+    return v / np.linalg.norm(v, axis=-1, keepdims=True)
+
+
+def test_mmr_skips_near_duplicate():
+    query = _unit([[1.0, 0.0, 0.0]])
+    # Candidates 0 and 1 are near-duplicates, 2 is less relevant but distinct
+    candidates = _unit([[[1.0, 0.1, 0.0], [1.0, 0.11, 0.0], [0.7, 0.0, 0.7]]])
+    mask = np.ones((1, 3), dtype=bool)
+
+    assert mmr_select(query, candidates, mask, k=2, lambda_mult=1.0).tolist() == [[0, 1]]
+    assert mmr_select(query, candidates, mask, k=2, lambda_mult=0.5).tolist() == [[0, 2]]
+
+
+def test_mmr_batches_queries_and_respects_padding():
+    queries = _unit([[1.0, 0.0], [0.0, 1.0]])
+    candidates = _unit([[[1.0, 0.0], [0.0, 1.0], [1.0, 1.0]], [[0.0, 1.0], [1.0, 0.0], [1.0, 1.0]]])
+    mask = np.array([[True, True, True], [True, False, False]])
+
+    picks = mmr_select(queries, candidates, mask, k=2)
+
+    assert picks[0, 0] == 0
+    assert picks[1].tolist() == [0, -1]
@@ -0,0 +1,103 @@
+'''
+# File: app/test_docx_stream.py
+# The streaming DOCX extractor must give the same text and table rows as the
+# python-docx implementation of parse_docx.'''
+
+import sys
+import os
+import io
+import docx
+from docx.oxml import OxmlElement
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+import app.utils.docx_extract as docx_extract
+from app.utils.downloader__ import parse_docx, forward_fill, UniversalTextCleaner
+
+
+def _reference_parse_docx(source):
+    """parse_docx as it was before streaming, verbatim."""
+    cleaner = UniversalTextCleaner()
+    doc = docx.Document(io.BytesIO(source))
+    raw_text = "\n".join(para.text for para in doc.paragraphs if para.text.strip())
+    cleaned_text = cleaner.clean_text(raw_text)
+    table_rows = []
+    for table in doc.tables:
+        headers = forward_fill([cell.text.strip() for cell in table.rows[0].cells])
+        for row in table.rows[1:]:
+            row_data = [cell.text.strip() for cell in row.cells]
+            if len(row_data) != len(headers):
+                continue
+            pairs = [f"{h}: {c}" for h, c in zip(headers, row_data)
+                     if h and c and str(c).strip().lower() != "none"]
+            if pairs:
+                table_rows.append(", ".join(pairs))
+    return cleaned_text, table_rows
+
+
+def _policy_docx() -> bytes:
+    doc = docx.Document()
+    doc.add_heading("Policy Wording", 0)
+    p = doc.add_paragraph("Grace period:\tthirty days")
+    p.add_run().add_break()
+    p.add_run("after the due date.")
+    doc.add_paragraph("   ")
+    hyperlink = OxmlElement("w:hyperlink")
+    run = OxmlElement("w:r")
+    text = OxmlElement("w:t")
+    text.text = "See the insurer's website."
+    run.append(text)
+    hyperlink.append(run)
+    doc.add_paragraph("Details: ")._p.append(hyperlink)
+    for i in range(3):
+        doc.add_paragraph("Page 1 of 3")  # noise removed by the cleaner
+        doc.add_paragraph(f"Clause {i}: pre-existing diseases are covered after 36 months.")
+
+    table = doc.add_table(rows=5, cols=4)
+    for c, header in enumerate(["Benefit", "", "Limit", "Waiting period"]):
+        table.cell(0, c).text = header
+    table.cell(0, 0).merge(table.cell(0, 1))  # header spanning two columns
+    for r in range(1, 5):
+        table.cell(r, 0).text = f"Benefit {r}"
+        table.cell(r, 1).text = "None" if r == 2 else f"Sub-limit {r}"
+        table.cell(r, 2).text = f"{r * 10000} INR"
+    table.cell(1, 3).text = "30 days"
+    table.cell(1, 3).merge(table.cell(3, 3))  # vertical merge
+    table.cell(4, 3).add_table(rows=1, cols=1).cell(0, 0).text = "nested, ignored"
+
+    doc.add_paragraph("Text between tables.")
+    ragged = doc.add_table(rows=3, cols=2)
+    ragged.cell(0, 0).text, ragged.cell(0, 1).text = "Room", "Rent"
+    ragged.cell(1, 0).text, ragged.cell(1, 1).text = "ICU", "2% of sum insured"
+    ragged.cell(2, 0).text = "General ward"
+    tr = ragged.rows[2]._tr
+    tr.remove(tr.tc_lst[1])  # a row with fewer cells than the header is skipped
+
+    out = io.BytesIO()
+    doc.save(out)
+    return out.getvalue()
+
+
+def test_streaming_matches_python_docx():
+    source = _policy_docx()
+    expected = _reference_parse_docx(source)
+    assert expected[1]  # the fixture does produce table rows
+    assert parse_docx(source, streaming=True) == expected
+    assert parse_docx(source, streaming=False) == expected
+
+
+def test_blocks_in_document_order():
+    blocks = list(docx_extract.iter_blocks(_policy_docx()))
+    assert [kind for kind, _ in blocks] == ["paragraph"] * 10 + ["table", "paragraph", "table"]
+    rows = blocks[10][1]
+    assert rows[0] == ["Benefit", "Benefit", "Limit", "Waiting period"]
+    assert [row[3] for row in rows[1:]] == ["30 days", "30 days", "30 days", ""]
+
+
+def test_broken_stream_falls_back_to_python_docx(monkeypatch):
+    source = _policy_docx()
+
+    def broken(_):
+        raise ValueError("unreadable")
+        yield
+
+    monkeypatch.setattr(docx_extract, "iter_blocks", broken)
+    assert parse_docx(source) == _reference_parse_docx(source)
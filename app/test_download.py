@@ -0,0 +1,79 @@
+'''
+# File: app/test_download.py
+# fetch_document keeps small bodies in memory and spills large ones to a temp
+# file, writing it from worker threads rather than on the event loop.'''
+
+import sys
+import os
+import asyncio
+import threading
+from aiohttp import web
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+import app.utils.downloader__ as fetcher
+
+BODY = os.urandom(3 * 1024 * 1024 + 123)
+
+
+async def _serve_body():
+    async def handler(request):
+        response = web.StreamResponse()
+        await response.prepare(request)
+        for start in range(0, len(BODY), 256 * 1024):
+            await response.write(BODY[start:start + 256 * 1024])
+        return response
+
+    app = web.Application()
+    app.router.add_get("/policy.pdf", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/policy.pdf"
+
+
+def test_large_bodies_are_spilled_off_the_event_loop(monkeypatch):
+    monkeypatch.setattr(fetcher, "SPILL_WRITE_BYTES", 512 * 1024)
+    writers = []
+    open_spill = fetcher._open_spill
+
+    def recording_open(path):
+        spill_file = open_spill(path)
+        writelines = spill_file.writelines
+
+        def recording_writelines(chunks):
+            writers.append(threading.get_ident())
+            writelines(chunks)
+
+        spill_file.writelines = recording_writelines
+        return spill_file
+
+    monkeypatch.setattr(fetcher, "_open_spill", recording_open)
+
+    async def scenario():
+        runner, url = await _serve_body()
+        try:
+            in_memory = await fetcher.fetch_document(url)
+            spilled = await fetcher.fetch_document(url, spill_bytes=1024 * 1024)
+        finally:
+            await runner.cleanup()
+        return in_memory, spilled, threading.get_ident()
+
+    (body, ext), (path, _), loop_thread = asyncio.run(scenario())
+    assert body == BODY and ext == "pdf"
+    try:
+        assert path.read_bytes() == BODY
+    finally:
+        path.unlink()
+    assert len(writers) > 2 and loop_thread not in writers
+
+
+def test_bodies_over_the_limit_are_rejected():
+    async def scenario():
+        runner, url = await _serve_body()
+        try:
+            return await fetcher.fetch_document(url, spill_bytes=1024 * 1024, max_bytes=2 * 1024 * 1024)
+        finally:
+            await runner.cleanup()
+
+    assert asyncio.run(scenario()) is None
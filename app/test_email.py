@@ -0,0 +1,87 @@
+'''
+# File: app/test_email.py
+# Email parsing: HTML body and tables, PDF/DOCX attachments parsed
+# concurrently but merged in message order, and the lxml backend giving the
+# same text and tables as BeautifulSoup's html.parser.'''
+
+import sys
+import os
+import io
+import asyncio
+import docx
+import fitz
+from email.message import EmailMessage
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+import app.utils.downloader__ as fetcher
+from app.utils.downloader import parse_eml
+from app.utils.email_extract import extract_html
+
+HTML = """<html><head><style>td {color: red}</style><script>var tracking = 1;</script></head><body>
+<p>Claim CLM-104 was <b>approved</b> for settlement.</p>
+<table>
+  <tr><th>Claim ID</th><th>Treatment</th><th>Amount</th></tr>
+  <tr><td>CLM-104</td><td><span>Cataract surgery</span></td><td>45000 INR</td></tr>
+  <tr><td>CLM-105</td><td>Physiotherapy</td><td>None</td></tr>
+</table>
+</body></html>"""
+
+DOCX_CLAUSE = "Rider clause: ambulance charges are covered up to 2000 INR."
+PDF_CLAUSE = "Schedule clause: room rent is capped at 1 percent of the sum insured."
+
+
+def _docx() -> bytes:
+    doc = docx.Document()
+    doc.add_paragraph(DOCX_CLAUSE)
+    table = doc.add_table(rows=2, cols=2)
+    for cell, text in zip(table.rows[0].cells + table.rows[1].cells, ["Benefit", "Limit", "Ambulance", "2000 INR"]):
+        cell.text = text
+    out = io.BytesIO()
+    doc.save(out)
+    return out.getvalue()
+
+
+def _pdf() -> bytes:
+    doc = fitz.open()
+    doc.new_page().insert_text((50, 72), PDF_CLAUSE, fontsize=9)
+    return doc.tobytes()
+
+
+def _email() -> bytes:
+    msg = EmailMessage()
+    msg["Subject"] = "Claim settlement"
+    msg.set_content("Please find the settlement summary below.")
+    msg.add_alternative(HTML, subtype="html")
+    msg.add_attachment(_pdf(), maintype="application", subtype="pdf", filename="schedule.pdf")
+    msg.add_attachment(_docx(), maintype="application", subtype="octet-stream", filename="rider.docx")
+    return bytes(msg)
+
+
+HTML_ROWS = ["Claim ID: CLM-104, Treatment: Cataract surgery, Amount: 45000 INR", "Claim ID: CLM-105, Treatment: Physiotherapy"]
+
+
+def test_parse_email_merges_attachments_in_message_order(monkeypatch):
+    async def parse_pdf(source):
+        await asyncio.sleep(0.05)  # finishes after the DOCX
+        return PDF_CLAUSE
+
+    monkeypatch.setattr(fetcher, "parse_pdf", parse_pdf)
+    text, rows = asyncio.run(fetcher.parse_email(_email()))
+
+    positions = [text.index(part) for part in ("settlement summary", "CLM-104 was approved", PDF_CLAUSE, DOCX_CLAUSE)]
+    assert positions == sorted(positions)
+    assert "tracking" not in text
+    assert rows == HTML_ROWS + ["Benefit: Ambulance, Limit: 2000 INR"]
+
+
+def test_parse_eml_parses_attachments_locally():
+    text, rows = parse_eml(_email())
+    assert text.index("CLM-104") < text.index("room rent") < text.index("ambulance charges")
+    assert rows[:1] == HTML_ROWS[:1] and "Benefit: Ambulance, Limit: 2000 INR" in rows
+
+
+def test_lxml_matches_html_parser():
+    lxml_text, lxml_tables = extract_html(HTML, "lxml")
+    soup_text, soup_tables = extract_html(HTML, "html.parser")
+    assert " ".join(lxml_text.split()) == " ".join(soup_text.split())
+    assert lxml_tables == soup_tables
+    assert lxml_tables[0][1] == ["CLM-104", "Cataract surgery", "45000 INR"]
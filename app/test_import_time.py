@@ -0,0 +1,52 @@
+'''
+# File: app/test_import_time.py
+# Importing the app must stay cheap: heavy libraries load lazily or in the
+# lifespan warm-up, not at import. Budget via IMPORT_TIME_BUDGET (seconds).'''
+
+import sys
+import os
+import subprocess
+
+ROOT = os.path.dirname(os.path.abspath(__file__)) + "/.."
+BUDGET = float(os.getenv("IMPORT_TIME_BUDGET", "2.5"))
+
+# Deferred to first use / warm-up
+HEAVY_MODULES = [
+    "torch",
+    "sentence_transformers",
+    "transformers",
+    "llama_cloud_services",
+    "groq",
+    "fitz",
+    "pdfplumber",
+    "docx",
+    "bs4",
+]
+
+
+def _import_times(module):
+    """Cumulative import time in seconds of every module imported by `module`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+def test_app_import_skips_heavy_modules():
+    times = _import_times("app.main")
+    assert [m for m in HEAVY_MODULES if m in times] == []
+
+
+def test_app_import_time_budget():
+    times = _import_times("app.main")
+    assert times["app.main"] < BUDGET, f"importing app.main took {times['app.main']:.2f}s (budget {BUDGET}s)"
@@ -0,0 +1,46 @@
+'''
+# File: app/test_incremental_index.py
+# Re-ingesting an edited document should only embed the chunks that changed.'''
+
+import sys
+import os
+import numpy as np
+from qdrant_client import QdrantClient
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+import app.service.vector_store as vector_store
+import app.service.chunk_store as chunk_store
+from app.service.chunker import chunk_hash
+
+DOCUMENT_ID = "6f1c1d1e-8c4e-5b7a-9d35-2f0a4c1b7e11"
+
+
+def _embed(calls):
+    def embed(chunks):
+        calls.append(list(chunks))
+        rng = np.random.default_rng(len(calls))
+        return rng.standard_normal((len(chunks), vector_store.VECTOR_SIZE)).astype(np.float32)
+    return embed
+
+
+def _sync(chunks, calls):
+    return vector_store.sync_document(DOCUMENT_ID, chunks, [chunk_hash(c) for c in chunks], _embed(calls), "policy.pdf")
+
+
+def test_resync_embeds_only_changed_chunks(monkeypatch, tmp_path):
+    monkeypatch.setattr(chunk_store, "CHUNK_STORE_PATH", str(tmp_path))
+    monkeypatch.setattr(vector_store, "client", QdrantClient(":memory:"))
+    monkeypatch.setattr(vector_store, "_collection_ready", False)
+    calls = []
+    original = [f"Clause {i}: benefits are payable." for i in range(10)]
+    assert _sync(original, calls) == {"chunks": 10, "embedded": 10, "reused": 0, "deleted": 0}
+
+    edited = original[:3] + ["Clause 3: benefits are payable after 30 days."] + original[4:] + ["Clause 10: new rider."]
+    assert _sync(edited, calls) == {"chunks": 11, "embedded": 2, "reused": 9, "deleted": 1}
+    assert calls[-1] == [edited[3], edited[10]]
+
+    stored = vector_store.stored_chunks(DOCUMENT_ID)
+    assert sorted(stored.values()) == list(range(11))
+    assert chunk_store.texts([(DOCUMENT_ID, 3)]) == {(DOCUMENT_ID, 3): edited[3]}
+
+    assert _sync(edited, calls) == {"chunks": 11, "embedded": 0, "reused": 11, "deleted": 0}
+    assert len(calls) == 2
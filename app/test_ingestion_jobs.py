@@ -0,0 +1,309 @@
+'''
+# File: app/test_ingestion_jobs.py
+# Background ingestion jobs: deduplication, 503 on a full queue, retries
+# until "failed", pruning of finished jobs, jobs shared between server
+# workers, /hackrx/run on documents ingested beforehand (document_id), and one
+# ingestion per document however many jobs, requests and workers ask for it.'''
+
+import sys
+import os
+import asyncio
+import multiprocessing
+import time
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+import app.service.ingestion as ingestion
+import app.service.registry as registry
+import app.service.state_store as state_store
+import app.service.retrival as retrival
+import app.service.vector_store as vector_store
+import app.routes.rag as rag
+from app.main import app as api
+
+URL = "https://docs.example.com/gold.pdf"
+
+
+@pytest.fixture(autouse=True)
+def _isolated(monkeypatch, tmp_path):
+    monkeypatch.setattr(state_store, "STATE_STORE_PATH", str(tmp_path / "state.db"))
+    monkeypatch.setattr(ingestion, "_workers", [])
+    monkeypatch.setattr(rag, "_inflight", {})
+    monkeypatch.setattr(rag, "ENABLE_AUTH", False)
+
+
+def test_submit_deduplicates_queued_and_running_jobs():
+    async def scenario():
+        release = asyncio.Event()
+        started = []
+
+        async def handler(url, document_id):
+            started.append(url)
+            await release.wait()
+
+        await ingestion.start(handler, workers=1, queue_size=10)
+        first = ingestion.submit(URL)
+        assert ingestion.submit(URL)["job_id"] == first["job_id"]  # queued
+        await _until(first["job_id"], ingestion.JOB_RUNNING)
+        assert ingestion.submit(URL)["job_id"] == first["job_id"]  # running
+        other = ingestion.submit("https://docs.example.com/silver.pdf")
+        assert other["job_id"] != first["job_id"]
+
+        release.set()
+        await _until(other["job_id"], ingestion.JOB_SUCCEEDED)
+        assert started == [URL, "https://docs.example.com/silver.pdf"]
+        # Finished: a new submission is a new job
+        assert ingestion.submit(URL)["job_id"] != first["job_id"]
+        await ingestion.stop()
+
+    asyncio.run(scenario())
+
+
+async def _until(job_id, status):
+    while ingestion.get_job(job_id)["status"] != status:
+        await asyncio.sleep(0.01)
+
+
+def test_full_queue_is_a_503():
+    # No ingestion workers running in this process
+    response = TestClient(api).post("/api/v1/documents", json={"url": URL})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "5"
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def handler(url, document_id):
+            await release.wait()
+
+        await ingestion.start(handler, workers=1, queue_size=1)
+        running = ingestion.submit(URL)
+        await _until(running["job_id"], ingestion.JOB_RUNNING)
+        ingestion.submit("https://docs.example.com/silver.pdf")
+        with pytest.raises(ingestion.QueueFullError):
+            ingestion.submit("https://docs.example.com/bronze.pdf")
+        release.set()
+        await ingestion.stop()
+
+    asyncio.run(scenario())
+    count = state_store.connection().execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+    assert count == 2
+
+
+def test_failing_job_is_retried_with_backoff_then_failed(monkeypatch):
+    monkeypatch.setattr(ingestion, "INGEST_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(ingestion, "INGEST_RETRY_BACKOFF", 0.05)
+
+    async def scenario():
+        attempts = []
+
+        async def handler(url, document_id):
+            attempts.append(time.monotonic())
+            raise ValueError("download failed")
+
+        await ingestion.start(handler, workers=1, queue_size=10)
+        job = ingestion.submit(URL)
+        await _until(job["job_id"], ingestion.JOB_FAILED)
+        await ingestion.stop()
+        return ingestion.get_job(job["job_id"]), attempts
+
+    job, attempts = asyncio.run(scenario())
+    assert (job["attempts"], job["error"]) == (3, "download failed")
+    gaps = np.diff(attempts)
+    assert gaps[0] >= 0.05 and gaps[1] >= 0.1  # doubled after each failure
+    assert registry.get(job["document_id"])["status"] == registry.STATUS_FAILED
+
+
+def test_finished_jobs_are_pruned():
+    now = time.time()
+    conn = state_store.connection()
+    for n, finished_at in enumerate([now - 7200, now - 30, now - 20, now - 10, None]):
+        conn.execute(
+            "INSERT INTO jobs (job_id, document_id, url, status, attempts, created_at, finished_at) VALUES (?, ?, ?, ?, 1, ?, ?)",
+            (f"job-{n}", f"document-{n}", URL, ingestion.JOB_QUEUED if finished_at is None else ingestion.JOB_SUCCEEDED,
+             now - 7200, finished_at),
+        )
+    ingestion._prune(conn, ttl=3600, history=2)
+    remaining = [row[0] for row in conn.execute("SELECT job_id FROM jobs ORDER BY job_id")]
+    assert remaining == ["job-2", "job-3", "job-4"]  # unfinished jobs are kept
+
+
+def test_jobs_are_shared_between_workers():
+    # Running on a worker that died two minutes ago, after one attempt
+    document_id = registry.document_id_for(URL)
+    state_store.connection().execute(
+        "INSERT INTO jobs (job_id, document_id, url, status, attempts, created_at, worker, heartbeat) "
+        "VALUES ('orphan', ?, ?, ?, 1, ?, 'other-host:1', ?)",
+        (document_id, URL, ingestion.JOB_RUNNING, time.time() - 180, time.time() - 120),
+    )
+    started = []
+
+    async def handler(url, document_id):
+        started.append(url)
+
+    async def scenario():
+        await ingestion.start(handler, workers=1, queue_size=10)
+        assert ingestion.submit(URL)["job_id"] == "orphan"  # not submitted twice
+        await _until("orphan", ingestion.JOB_SUCCEEDED)
+        await ingestion.stop()
+
+    asyncio.run(scenario())
+    assert started == [URL]
+    # Another worker process answers GET /documents/jobs/{id} the same
+    with multiprocessing.get_context("fork").Pool(1) as pool:
+        job = pool.apply(ingestion.get_job, ("orphan",))
+    assert (job["status"], job["attempts"]) == (ingestion.JOB_SUCCEEDED, 2)
+
+
+def test_run_on_ingested_document_id(monkeypatch):
+    document_id = registry.document_id_for(URL)
+    registry.mark_ready(document_id, URL, 12)
+    calls = []
+
+    def llm_inference(questions, document_ids, **kwargs):
+        calls.append(document_ids)
+        return {"answers": ["Thirty days."] * len(questions), "status": ["answered"] * len(questions)}
+
+    monkeypatch.setattr(retrival, "embed_queries", lambda questions: np.zeros((len(questions), 768)))
+    monkeypatch.setattr(retrival, "llm_inference", llm_inference)
+    monkeypatch.setattr(vector_store, "has_document", lambda document_id: False)
+    client = TestClient(api)
+
+    response = client.post("/api/v1/hackrx/run", json={"document_id": document_id, "questions": ["Waiting period?"]})
+    assert response.status_code == 200
+    assert response.json()["answers"] == ["Thirty days."]
+    assert response.json()["index_completeness"] == {document_id: 1.0}
+    assert calls == [[document_id]]
+
+    unknown = registry.document_id_for("https://docs.example.com/unknown.pdf")
+    response = client.post("/api/v1/hackrx/run", json={"document_id": unknown, "questions": ["Waiting period?"]})
+    assert response.status_code == 404
+
+
+def _stub_answers(monkeypatch):
+    monkeypatch.setattr(retrival, "embed_queries", lambda questions: np.zeros((len(questions), 768)))
+    monkeypatch.setattr(retrival, "llm_inference", lambda questions, document_ids, **kwargs: {
+        "answers": ["Thirty days."] * len(questions), "status": ["answered"] * len(questions)})
+
+
+def test_requests_wait_for_the_running_ingestion(monkeypatch):
+    _stub_answers(monkeypatch)
+    ingested = []
+    release = asyncio.Event()
+
+    async def vectorize(url, document_id, progressive):
+        ingested.append(url)
+        await release.wait()
+        registry.mark_ready(document_id, url, 12)
+        return {"retrieval": True, "document_id": document_id}
+
+    monkeypatch.setattr(rag, "_vectorize", vectorize)
+    request = rag.RAGRequest(documents=URL, questions=["Waiting period?"])
+
+    async def scenario():
+        await ingestion.start(rag.vectorize, workers=1, queue_size=10)
+        job = ingestion.submit(URL)
+        while not ingested:
+            await asyncio.sleep(0.01)
+        # A job is ingesting the document: two requests for it wait for that job
+        runs = [asyncio.create_task(rag.run_rag(request, request_timeout=None)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        assert not any(run.done() for run in runs)
+        assert registry.get(job["document_id"])["status"] == registry.STATUS_INGESTING
+        release.set()
+        results = await asyncio.gather(*runs)
+        await _until(job["job_id"], ingestion.JOB_SUCCEEDED)
+        await ingestion.stop()
+        return results
+
+    results = asyncio.run(scenario())
+    assert ingested == [URL]
+    assert [r["answers"] for r in results] == [["Thirty days."]] * 2
+    assert rag._inflight == {}
+
+
+def test_reingested_documents_stay_searchable(monkeypatch):
+    _stub_answers(monkeypatch)
+    document_id = registry.document_id_for(URL)
+    registry.mark_ready(document_id, URL, 12)
+    release = asyncio.Event()
+
+    async def vectorize(url, document_id, progressive):
+        await release.wait()
+        raise ValueError("parse failed")
+
+    monkeypatch.setattr(rag, "_vectorize", vectorize)
+
+    async def scenario():
+        reingest = asyncio.create_task(rag.vectorize(URL))
+        await asyncio.sleep(0)
+        # Still answered from the current index, without a second ingestion
+        assert registry.is_searchable(document_id)
+        result = await rag.run_rag(rag.RAGRequest(documents=URL, questions=["Waiting period?"]), request_timeout=None)
+        assert result["answers"] == ["Thirty days."]
+        release.set()
+        with pytest.raises(ValueError):
+            await reingest
+
+    asyncio.run(scenario())
+    record = registry.get(document_id)
+    assert (record["status"], record["chunks"]) == (registry.STATUS_READY, 12)
+
+
+def test_ingestion_is_cancelled_with_its_last_caller(monkeypatch):
+    cancelled = []
+
+    async def vectorize(url, document_id, progressive):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(url)
+            raise
+
+    monkeypatch.setattr(rag, "_vectorize", vectorize)
+
+    async def scenario():
+        callers = [asyncio.create_task(rag.vectorize(URL)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        callers[0].cancel()
+        await asyncio.sleep(0.01)
+        assert cancelled == [] and not callers[1].done()  # the other caller still waits for it
+        callers[1].cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+    assert cancelled == [URL]
+    assert registry.get(registry.document_id_for(URL))["status"] == registry.STATUS_FAILED
+    assert rag._inflight == {}
+
+
+def test_ingestion_by_another_worker_is_waited_for(monkeypatch):
+    monkeypatch.setattr(rag, "INGEST_POLL_INTERVAL", 0.01)
+    ingested = []
+
+    async def vectorize(url, document_id, progressive):
+        ingested.append(url)
+
+    monkeypatch.setattr(rag, "_vectorize", vectorize)
+    document_id = registry.document_id_for(URL)
+    this_worker = state_store.worker_id()
+    monkeypatch.setattr(state_store, "worker_id", lambda: "other-host:1")
+    assert registry.claim(document_id, URL)
+    monkeypatch.setattr(state_store, "worker_id", lambda: this_worker)
+
+    async def scenario():
+        waiting = asyncio.create_task(rag.vectorize(URL))
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+        # The other worker finishes
+        monkeypatch.setattr(state_store, "worker_id", lambda: "other-host:1")
+        registry.mark_ready(document_id, URL, 12)
+        registry.release(document_id)
+        monkeypatch.setattr(state_store, "worker_id", lambda: this_worker)
+        return await waiting
+
+    assert asyncio.run(scenario()) == {"retrieval": True, "document_id": document_id}
+    assert ingested == []
+    assert registry.get(document_id)["status"] == registry.STATUS_READY
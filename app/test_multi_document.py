@@ -0,0 +1,95 @@
+'''
+# File: app/test_multi_document.py
+# Requests on several documents: concurrent ingestion (vectorize_many) and
+# one top-k over the union of the documents, with each chunk tagged with its
+# source.'''
+
+import sys
+import os
+import asyncio
+import zlib
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+import app.service.vector_store as vector_store
+import app.service.chunk_store as chunk_store
+import app.service.retrival as retrival
+import app.service.registry as registry
+import app.service.state_store as state_store
+import app.routes.rag as rag
+from app.service.chunker import chunk_hash
+
+NAMES = ["gold.pdf", "silver.docx", "bronze.pdf"]
+
+
+def _vector(text):
+    vector = np.random.default_rng(zlib.crc32(text.encode())).standard_normal(vector_store.VECTOR_SIZE)
+    return (vector / np.linalg.norm(vector)).astype(np.float32)
+
+
+def _embed(chunks):
+    return np.stack([_vector(chunk) for chunk in chunks])
+
+
+def test_top_k_over_all_documents_with_sources(monkeypatch, tmp_path):
+    qdrant = QdrantClient(":memory:")
+    monkeypatch.setattr(chunk_store, "CHUNK_STORE_PATH", str(tmp_path))
+    monkeypatch.setattr(vector_store, "client", qdrant)
+    monkeypatch.setattr(vector_store, "_collection_ready", False)
+    monkeypatch.setattr(retrival, "client", qdrant)
+    monkeypatch.setattr(retrival, "COLLECTION_NAME", vector_store.COLLECTION_NAME)
+    monkeypatch.setattr(retrival, "MMR_ENABLED", False)
+
+    document_ids = []
+    for name in NAMES:
+        url = f"https://docs.example.com/{name}?sig=abc"
+        document_id = registry.document_id_for(url)
+        chunks = [f"{name} clause {i}: benefits are payable." for i in range(6)]
+        vector_store.sync_document(document_id, chunks, [chunk_hash(c) for c in chunks], _embed, url)
+        document_ids.append(document_id)
+
+    queries = ["silver", "bronze"]
+    query_vectors = np.stack([_vector("silver.docx clause 2: benefits are payable."), _vector("bronze.pdf clause 5: benefits are payable.")])
+    results = retrival.retrieve_answers(queries, document_ids, query_vectors=query_vectors)
+
+    # TOP_K chunks per question, not TOP_K per document
+    assert [len(results[q]) for q in queries] == [retrival.TOP_K, retrival.TOP_K]
+    assert results["silver"][0] == "[silver.docx] silver.docx clause 2: benefits are payable."
+    assert results["bronze"][0] == "[bronze.pdf] bronze.pdf clause 5: benefits are payable."
+
+    # A single document is searched alone and its chunks are not tagged
+    results = retrival.retrieve_answers(["silver"], document_ids[:1], query_vectors=query_vectors[:1])
+    assert all(chunk.startswith("gold.pdf clause") for chunk in results["silver"])
+
+    # The depth is TOP_K_RETRIEVAL, with or without the MMR re-ranking
+    monkeypatch.setattr(retrival, "TOP_K", 5)
+    for mmr in (False, True):
+        results = retrival.retrieve_answers(queries, document_ids, mmr=mmr, query_vectors=query_vectors)
+        assert [len(results[q]) for q in queries] == [5, 5]
+
+
+def test_vectorize_many_bounds_concurrency_and_reports_failures(monkeypatch, tmp_path):
+    monkeypatch.setattr(state_store, "STATE_STORE_PATH", str(tmp_path / "state.db"))
+    urls = [f"https://docs.example.com/{n}.pdf" for n in range(5)]
+    running, peak, done = set(), [0], []
+
+    async def vectorize(url):
+        running.add(url)
+        peak[0] = max(peak[0], len(running))
+        await asyncio.sleep(0.01)
+        running.discard(url)
+        if url.endswith("3.pdf"):
+            raise ValueError("parse failed")
+        done.append(url)
+        return {"retrieval": True, "document_id": registry.document_id_for(url)}
+
+    monkeypatch.setattr(rag, "vectorize", vectorize)
+    with pytest.raises(ValueError, match="parse failed"):
+        asyncio.run(rag.vectorize_many(urls, parallelism=2))
+    assert peak[0] == 2
+    assert sorted(done) == sorted(url for url in urls if not url.endswith("3.pdf"))  # the others still finish
+
+    done.clear()
+    results = asyncio.run(rag.vectorize_many(urls[:3], parallelism=2))
+    assert [r["document_id"] for r in results] == [registry.document_id_for(url) for url in urls[:3]]
@@ -0,0 +1,45 @@
+'''
+# File: app/test_pdf_tables.py
+# Checks that the table prefilter in parse_pdf keeps table rows unchanged.'''
+
+import sys
+import os
+import fitz
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+from app.utils.downloader import parse_pdf, page_may_have_table
+
+
+def _make_pdf(path):
+    doc = fitz.open()
+    for n in range(4):
+        page = doc.new_page()
+        page.insert_text((50, 60), f"Section {n}: coverage is subject to the policy terms.", fontsize=10)
+        if n == 2:
+            cells = [("Benefit", "Limit"), ("", "per day"), ("", "of sum insured"), ("Room rent", "1%"), ("ICU", "2%")]
+            for r in range(len(cells) + 1):
+                page.draw_line((50, 100 + r * 20), (350, 100 + r * 20))
+            for c in range(3):
+                page.draw_line((50 + c * 150, 100), (50 + c * 150, 100 + len(cells) * 20))
+            for r, (a, b) in enumerate(cells):
+                page.insert_text((54, 114 + r * 20), a, fontsize=9)
+                page.insert_text((204, 114 + r * 20), b, fontsize=9)
+        if n == 3:
+            # A lone underline is not a table
+            page.draw_line((50, 80), (200, 80))
+    doc.save(path)
+    doc.close()
+
+
+def test_prefilter_selects_ruled_pages_only(tmp_path):
+    path = str(tmp_path / "policy.pdf")
+    _make_pdf(path)
+    with fitz.open(path) as doc:
+        assert [page.number for page in doc if page_may_have_table(page)] == [2]
+
+
+def test_prefilter_keeps_table_rows(tmp_path):
+    path = str(tmp_path / "policy.pdf")
+    _make_pdf(path)
+    text, rows = parse_pdf(path, prefilter=True)
+    assert (text, rows) == parse_pdf(path, prefilter=False)
+    assert rows == ["Benefit: Room rent, Limit per day of sum insured: 1%", "Benefit: ICU, Limit per day of sum insured: 2%"]
@@ -0,0 +1,143 @@
+'''
+# File: app/test_progressive.py
+# Preview text used to index the start of long PDFs before the full parse,
+# and the partial -> ready flow of a progressively indexed document.'''
+
+import sys
+import os
+import asyncio
+import fitz
+import numpy as np
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+from app.utils.downloader__ import pdf_preview
+from app.config import PROGRESSIVE_OUTLINE_PAGES
+import app.utils.downloader__ as fetcher
+import app.service.registry as registry
+import app.service.state_store as state_store
+import app.service.retrival as retrival
+import app.routes.rag as rag
+
+URL = "https://docs.example.com/master-policy.pdf"
+
+
+def _pdf(pages, toc=None):
+    doc = fitz.open()
+    for n in range(pages):
+        page = doc.new_page()
+        if n % 10 == 0:
+            page.insert_text((50, 60), f"Chapter {n // 10 + 1} Exclusions", fontsize=18)
+        page.insert_text((50, 100), f"Clause {n}: cover applies after the waiting period.", fontsize=9)
+    if toc:
+        doc.set_toc(toc)
+    return doc.tobytes()
+
+
+def test_short_pdfs_are_not_previewed():
+    assert pdf_preview(_pdf(5), first_pages=3, min_pages=10) is None
+
+
+def test_preview_has_first_pages_and_detected_headings():
+    text, covered, pages = pdf_preview(_pdf(40), first_pages=5, min_pages=10)
+    assert (covered, pages) == (5, 40)
+    assert "Clause 4:" in text and "Clause 5:" not in text
+    assert "Section 'Chapter 2 Exclusions' starts on page 11." in text
+    assert "Chapter 1 Exclusions' starts" not in text  # already covered in full
+
+
+def test_preview_prefers_the_table_of_contents():
+    text, _, _ = pdf_preview(_pdf(40, toc=[[1, "Claims procedure", 30]]), first_pages=5, min_pages=10)
+    assert text.endswith("Section 'Claims procedure' starts on page 30.")
+
+
+def test_outline_scan_of_long_pdfs_is_bounded(monkeypatch):
+    laid_out = []
+    get_text = fitz.Page.get_text
+
+    def recording_get_text(page, option="text", *args, **kwargs):
+        if option == "dict":
+            laid_out.append(page.number)
+        return get_text(page, option, *args, **kwargs)
+
+    monkeypatch.setattr(fitz.Page, "get_text", recording_get_text)
+    text, covered, pages = pdf_preview(_pdf(600), first_pages=30, min_pages=200)
+
+    assert (covered, pages) == (30, 600)
+    after_preview = [n for n in laid_out if n >= covered]
+    assert len(after_preview) <= PROGRESSIVE_OUTLINE_PAGES and max(after_preview) > 550  # sampled across the document
+    assert "Section 'Chapter" in text
+
+
+def test_partial_index_then_complete(monkeypatch, tmp_path):
+    monkeypatch.setattr(state_store, "STATE_STORE_PATH", str(tmp_path / "state.db"))
+    monkeypatch.setattr(rag, "PROGRESSIVE_INDEXING", True)
+    indexed = []
+    full_parse = asyncio.Event()
+
+    async def fetch_document(url, timeout=None):
+        return b"%PDF", "pdf"
+
+    async def cached_text(source, file_ext):
+        return None
+
+    async def extract_text(source, file_ext):
+        await full_parse.wait()
+        return "whole document"
+
+    async def index_text(url, document_id, text):
+        indexed.append(text)
+        return len(indexed) * 10
+
+    monkeypatch.setattr(fetcher, "fetch_document", fetch_document)
+    monkeypatch.setattr(fetcher, "cached_text", cached_text)
+    monkeypatch.setattr(fetcher, "extract_text", extract_text)
+    monkeypatch.setattr(fetcher, "pdf_preview", lambda source, first_pages, min_pages: ("first pages", 30, 300))
+    monkeypatch.setattr(rag, "_index_text", index_text)
+    monkeypatch.setattr(retrival, "embed_queries", lambda questions: np.zeros((len(questions), 768)))
+    monkeypatch.setattr(retrival, "llm_inference", lambda questions, document_ids, **kwargs: {"answers": ["..."], "status": ["answered"]})
+    document_id = registry.document_id_for(URL)
+    request = rag.RAGRequest(documents=URL, questions=["Is cataract surgery covered?"])
+
+    async def scenario():
+        result = await rag.run_rag(request, request_timeout=None)
+        assert result["index_completeness"] == {document_id: 0.1}
+        record = registry.get(document_id)
+        assert (record["status"], record["chunks"]) == (registry.STATUS_PARTIAL, 10)
+        assert indexed == ["first pages"]
+
+        # Searchable meanwhile: a second request does not ingest it again
+        await rag.run_rag(request, request_timeout=None)
+        assert indexed == ["first pages"]
+
+        full_parse.set()
+        await asyncio.gather(*rag._background_tasks)
+        record = registry.get(document_id)
+        assert (record["status"], record["chunks"], record["completeness"]) == (registry.STATUS_READY, 20, 1.0)
+        assert indexed == ["first pages", "whole document"]
+        result = await rag.run_rag(request, request_timeout=None)
+        assert result["index_completeness"] == {document_id: 1.0}
+
+    asyncio.run(scenario())
+
+
+def test_progressive_indexing_is_opt_in(monkeypatch, tmp_path):
+    monkeypatch.setattr(state_store, "STATE_STORE_PATH", str(tmp_path / "state.db"))
+    monkeypatch.setattr(rag, "PROGRESSIVE_INDEXING", False)
+    previews = []
+
+    async def fetch_document(url, timeout=None):
+        return b"%PDF", "pdf"
+
+    async def extract_text(source, file_ext):
+        return "whole document"
+
+    async def index_text(url, document_id, text):
+        return 20
+
+    monkeypatch.setattr(fetcher, "fetch_document", fetch_document)
+    monkeypatch.setattr(fetcher, "extract_text", extract_text)
+    monkeypatch.setattr(fetcher, "pdf_preview", lambda *args: previews.append(args))
+    monkeypatch.setattr(rag, "_index_text", index_text)
+
+    asyncio.run(rag.vectorize(URL))
+    assert previews == []
+    assert registry.get(registry.document_id_for(URL))["status"] == registry.STATUS_READY
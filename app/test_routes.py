@@ -14,3 +14,9 @@ def test_route_exists():
     client = TestClient(app)
     routes = [route.path for route in app.routes]
     assert "/api/v1/hackrx/document" in routes
+
+
+def test_document_ingestion_routes_exist():
+    routes = [route.path for route in app.routes]
+    assert "/api/v1/documents" in routes
+    assert "/api/v1/documents/jobs/{job_id}" in routes
@@ -0,0 +1,106 @@
+'''
+# File: app/test_snapshot.py
+# A replica loading an index snapshot gets the documents' points, chunk texts
+# and registry records without ingesting them again.'''
+
+import sys
+import os
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+import app.service.vector_store as vector_store
+import app.service.chunk_store as chunk_store
+import app.service.registry as registry
+import app.service.state_store as state_store
+import app.service.snapshot as snapshot
+from app.service.chunker import chunk_hash
+
+URLS = ["https://docs.example.com/gold.pdf", "https://docs.example.com/silver.docx"]
+
+
+def _embed(chunks):
+    rng = np.random.default_rng(len(chunks))
+    return rng.standard_normal((len(chunks), vector_store.VECTOR_SIZE)).astype(np.float32)
+
+
+def _replica(monkeypatch, chunk_dir):
+    monkeypatch.setattr(chunk_store, "CHUNK_STORE_PATH", str(chunk_dir))
+    monkeypatch.setattr(chunk_store, "_open", {})
+    monkeypatch.setattr(chunk_store, "_mounted", {})
+    monkeypatch.setattr(state_store, "STATE_STORE_PATH", str(chunk_dir.parent / f"{chunk_dir.name}-state.db"))
+    monkeypatch.setattr(vector_store, "_collection_ready", False)
+
+
+def _vectors(document_id):
+    points, _ = vector_store.get_client().scroll(
+        collection_name=vector_store.COLLECTION_NAME,
+        scroll_filter=vector_store.document_filter(document_id),
+        limit=100,
+        with_payload=["chunk_index"],
+        with_vectors=True,
+    )
+    return {(str(p.id), p.payload["chunk_index"]): np.array(p.vector) for p in points}
+
+
+def test_export_and_load(monkeypatch, tmp_path):
+    # Indexing replica
+    _replica(monkeypatch, tmp_path / "chunks")
+    monkeypatch.setattr(vector_store, "client", QdrantClient(":memory:"))
+    ids = [registry.document_id_for(url) for url in URLS]
+    for n, (document_id, url) in enumerate(zip(ids, URLS)):
+        chunks = [f"Clause {i} of document {n}: benefits are payable." for i in range(5 + n)]
+        vector_store.sync_document(document_id, chunks, [chunk_hash(c) for c in chunks], _embed, url)
+        registry.mark_ready(document_id, url, len(chunks))
+    expected = {document_id: _vectors(document_id) for document_id in ids}
+
+    path = tmp_path / "index.snap"
+    assert snapshot.export(str(path))["documents"] == 2
+
+    # New replica: empty vector store, chunk store and registry
+    _replica(monkeypatch, tmp_path / "empty")
+    monkeypatch.setattr(vector_store, "client", QdrantClient(":memory:"))
+    assert snapshot.load(str(path))["restored"] == 2
+
+    for document_id, url in zip(ids, URLS):
+        assert registry.is_ready(document_id)
+        assert registry.get(document_id)["url"] == url
+        restored = _vectors(document_id)
+        assert restored.keys() == expected[document_id].keys()
+        for key, vector in restored.items():
+            np.testing.assert_allclose(vector, expected[document_id][key], rtol=1e-6)
+    assert chunk_store.texts([(ids[1], 5)]) == {(ids[1], 5): "Clause 5 of document 1: benefits are payable."}
+    assert chunk_store.source_file(ids[0]) == URLS[0]
+
+    # Another replica on the same vector store: nothing to upsert
+    _replica(monkeypatch, tmp_path / "empty")
+    assert snapshot.load(str(path)) | {"seconds": 0} == {"documents": 2, "restored": 0, "skipped": 0, "seconds": 0}
+
+
+def test_rejects_other_versions(tmp_path):
+    path = tmp_path / "old.snap"
+    path.write_bytes(snapshot._HEADER.pack(snapshot._MAGIC, snapshot.VERSION + 1, 0, 0, 0))
+    with pytest.raises(ValueError, match="version"):
+        snapshot.load(str(path))
+
+
+def test_skips_documents_reingested_since_the_export(monkeypatch, tmp_path):
+    _replica(monkeypatch, tmp_path / "chunks")
+    monkeypatch.setattr(vector_store, "client", QdrantClient(":memory:"))
+    document_id = registry.document_id_for(URLS[0])
+    chunks = [f"Clause {i}: the waiting period is 30 days." for i in range(4)]
+    vector_store.sync_document(document_id, chunks, [chunk_hash(c) for c in chunks], _embed, URLS[0])
+    registry.mark_ready(document_id, URLS[0], len(chunks))
+    path = tmp_path / "index.snap"
+    snapshot.export(str(path))
+
+    # Re-ingested with new content but as many chunks
+    chunks = [f"Clause {i}: the waiting period is 90 days." for i in range(4)]
+    vector_store.sync_document(document_id, chunks, [chunk_hash(c) for c in chunks], _embed, URLS[0])
+
+    # A replica sharing that vector store must not mount the old texts
+    _replica(monkeypatch, tmp_path / "empty")
+    stats = snapshot.load(str(path))
+    assert (stats["documents"], stats["restored"], stats["skipped"]) == (0, 0, 1)
+    assert not registry.is_ready(document_id)
+    assert chunk_store.document(document_id) is None
@@ -0,0 +1,86 @@
+'''
+# File: app/test_tracing.py
+# Spans of a request are exported to the local JSONL file, nest across the
+# worker threads of a stage, and the trace id is returned in a header.'''
+
+import sys
+import os
+import time
+from types import SimpleNamespace
+import pytest
+from fastapi.testclient import TestClient
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+import app.service.tracing as tracing
+import app.service.retrival as retrival
+from app.config import TRACE_HEADER
+
+
+@pytest.fixture
+def spans_path(monkeypatch, tmp_path):
+    path = str(tmp_path / "traces.jsonl")
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(tracing.JsonlSpanExporter(path)))
+    monkeypatch.setattr(tracing, "tracer", provider.get_tracer("test"))
+    return path
+
+
+def test_llm_calls_nest_under_the_request(monkeypatch, spans_path):
+    monkeypatch.setattr(retrival, "LLM_QUESTIONS_PER_CALL", 1)
+    monkeypatch.setattr(retrival, "retrieve_answers", lambda qs, *a, **kw: {q: ["chunk"] for q in qs})
+
+    def create(messages, **kwargs):
+        time.sleep(0.3 if "slow" in messages[0]["content"] else 0.1)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=str(["answer"])))],
+            usage=SimpleNamespace(prompt_tokens=120, completion_tokens=8),
+        )
+
+    monkeypatch.setattr(retrival, "groq_client", SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))))
+
+    with tracing.span("POST /api/v1/hackrx/run"):
+        trace_id = tracing.trace_id()
+        retrival.llm_inference(["fast?", "slow?"])
+
+    spans = tracing.load(trace_id, spans_path)
+    by_name = {}
+    for s in spans:
+        by_name.setdefault(s["name"], []).append(s)
+    inference = by_name["llm_inference"][0]
+    assert inference["parent_id"] == by_name["POST /api/v1/hackrx/run"][0]["span_id"]
+    assert len(by_name["llm_call"]) == 2
+    assert all(s["parent_id"] == inference["span_id"] for s in by_name["llm_call"])
+    assert by_name["llm_call"][0]["attributes"]["prompt_tokens"] == 120
+
+    path = tracing.critical_path(spans)
+    assert [s["name"] for s in path] == ["POST /api/v1/hackrx/run", "llm_inference", "llm_call"]
+    assert path[-1]["duration_ms"] >= 300
+
+
+def test_trace_id_header_continues_caller_trace(spans_path):
+    from main import app
+
+    caller_trace = "4bf92f3577b34da6a3ce929d0e0e4736"
+    response = TestClient(app).get("/", headers={"traceparent": f"00-{caller_trace}-00f067aa0ba902b7-01"})
+    assert response.headers[TRACE_HEADER] == caller_trace
+    root, = tracing.load(caller_trace, spans_path)
+    assert root["name"] == "GET /" and root["attributes"]["http.status_code"] == 200
+
+
+def test_export_is_rotated_at_its_size_limit(monkeypatch, tmp_path):
+    path = str(tmp_path / "traces.jsonl")
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(tracing.JsonlSpanExporter(path, max_bytes=4096)))
+    monkeypatch.setattr(tracing, "tracer", provider.get_tracer("test"))
+
+    trace_ids = []
+    for n in range(60):
+        with tracing.span("request", n=n, padding="x" * 100):
+            trace_ids.append(tracing.trace_id())
+
+    assert not os.path.exists(path) or os.path.getsize(path) < 4096
+    assert os.path.getsize(path + ".1") < 4096 + 1024
+    assert not os.path.exists(path + ".2")
+    assert tracing.load(trace_ids[-1], path)[0]["attributes"]["n"] == 59
+    assert tracing.load(trace_ids[0], path) == []  # rotated out twice
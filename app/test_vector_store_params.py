@@ -0,0 +1,49 @@
+'''
+# File: app/test_vector_store_params.py
+# Collection layout (HNSW, quantization, on-disk vectors) and per-search
+# parameters built from the config.'''
+
+import sys
+import os
+import pytest
+from qdrant_client.models import BinaryQuantization, ScalarQuantization, ScalarType
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+import app.service.vector_store as vector_store
+from app.service.vector_store import collection_params, search_params
+
+HNSW = {"M": 32, "ef_construction": 400}
+
+
+def test_quantization_modes():
+    int8 = collection_params(quantization="int8", on_disk=False, hnsw_params=HNSW)["quantization_config"]
+    assert isinstance(int8, ScalarQuantization) and int8.scalar.type == ScalarType.INT8
+    assert int8.scalar.always_ram == vector_store.QUANTIZATION_ALWAYS_RAM
+
+    binary = collection_params(quantization="binary", on_disk=False, hnsw_params=HNSW)["quantization_config"]
+    assert isinstance(binary, BinaryQuantization)
+
+    assert collection_params(quantization="none", on_disk=False, hnsw_params=HNSW)["quantization_config"] is None
+    with pytest.raises(ValueError, match="int4"):
+        collection_params(quantization="int4", on_disk=False, hnsw_params=HNSW)
+
+
+def test_on_disk_vectors_and_hnsw_mapping():
+    params = collection_params(quantization="int8", on_disk=True, hnsw_params=HNSW)
+    assert params["vectors_config"].on_disk is True
+    assert params["vectors_config"].size == vector_store.VECTOR_SIZE
+    assert (params["hnsw_config"].m, params["hnsw_config"].ef_construct) == (32, 400)
+    assert collection_params(quantization="none", on_disk=False, hnsw_params=HNSW)["vectors_config"].on_disk is False
+
+
+def test_search_params_default_to_config_and_are_overridable(monkeypatch):
+    monkeypatch.setattr(vector_store, "SEARCH_HNSW_EF", 64)
+    monkeypatch.setattr(vector_store, "SEARCH_EXACT", True)
+    defaults = search_params(quantization="none")
+    assert (defaults.hnsw_ef, defaults.exact, defaults.quantization) == (64, True, None)
+
+    overridden = search_params(hnsw_ef=256, exact=False, quantization="none")
+    assert (overridden.hnsw_ef, overridden.exact) == (256, False)
+
+    quantized = search_params(quantization="int8")
+    assert quantized.quantization.rescore == vector_store.QUANTIZATION_RESCORE
+    assert quantized.quantization.oversampling == vector_store.QUANTIZATION_OVERSAMPLING
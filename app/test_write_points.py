@@ -0,0 +1,82 @@
+'''
+# File: app/test_write_points.py
+# write_points: batches larger than UPSERT_BATCH_SIZE are uploaded by
+# parallel threads, each waiting for its own batches, then the remaining
+# operations are applied; every point is stored when it returns.'''
+
+import sys
+import os
+import threading
+import uuid
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.models import DeleteOperation, PointIdsList, SetPayload, SetPayloadOperation
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+import app.service.vector_store as vector_store
+
+COLLECTION = "write-points-test"
+
+
+class _Recorder:
+    """Thread-safe stand-in for a remote client, recording every write."""
+
+    _client = None  # not the local mode, so write_points uses its threads
+
+    def __init__(self):
+        self._wrapped = QdrantClient(":memory:")
+        self._lock = threading.Lock()
+        self.calls = []
+
+    def upload_collection(self, **kwargs):
+        with self._lock:
+            self.calls.append(("upload_collection", len(kwargs["ids"]), kwargs["wait"]))
+            return self._wrapped.upload_collection(**kwargs)
+
+    def batch_update_points(self, **kwargs):
+        with self._lock:
+            self.calls.append(("batch_update_points", len(kwargs["update_operations"]), kwargs["wait"]))
+            return self._wrapped.batch_update_points(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._wrapped, name)
+
+
+def _points(n, start=0):
+    ids = [str(uuid.UUID(int=i)) for i in range(start, start + n)]
+    vectors = np.random.default_rng(start).standard_normal((n, vector_store.VECTOR_SIZE)).astype(np.float32)
+    return ids, vectors, [{"document_id": "doc", "chunk_index": i} for i in range(start, start + n)]
+
+
+def _stored(qdrant):
+    points, _ = qdrant.scroll(collection_name=COLLECTION, limit=1000, with_payload=True)
+    return {str(p.id): p.payload["chunk_index"] for p in points}
+
+
+def test_parallel_waited_batches_then_operations(monkeypatch):
+    qdrant = _Recorder()
+    monkeypatch.setattr(vector_store, "client", qdrant)
+    qdrant.create_collection(COLLECTION, **vector_store.collection_params(quantization="none", on_disk=False))
+
+    # Every batch is waited for by the thread that sent it
+    vector_store.write_points(*_points(20), batch_size=8, parallelism=3, collection_name=COLLECTION)
+    assert [name for name, _, _ in qdrant.calls] == ["upload_collection"] * 3
+    assert sum(n for _, n, _ in qdrant.calls) == 20 and all(wait for _, _, wait in qdrant.calls)
+    assert len(_stored(qdrant)) == 20
+
+    # Operations go after every point is written
+    qdrant.calls.clear()
+    ids, _, _ = _points(20)
+    operations = [
+        DeleteOperation(delete=PointIdsList(points=ids[:2])),
+        SetPayloadOperation(set_payload=SetPayload(payload={"chunk_index": 99}, points=[ids[5]])),
+    ]
+    vector_store.write_points(*_points(40, start=100), operations, batch_size=8, parallelism=3, collection_name=COLLECTION)
+    uploads, last = qdrant.calls[:-1], qdrant.calls[-1]
+    assert [name for name, _, _ in uploads] == ["upload_collection"] * 3
+    assert sum(n for _, n, _ in uploads) == 40 and all(wait for _, _, wait in uploads)
+    assert last == ("batch_update_points", 2, True)
+
+    stored = _stored(qdrant)
+    assert len(stored) == 20 - 2 + 40
+    assert ids[0] not in stored and stored[ids[5]] == 99
+    assert all(str(uuid.UUID(int=i)) in stored for i in range(100, 140))
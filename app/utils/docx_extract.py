@@ -0,0 +1,161 @@
+import io
+import logging
+import posixpath
+import zipfile
+from typing import Iterator, List, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Streaming DOCX text extraction: the main document part is iterparsed straight
+# from the zip and every element is dropped once it has been read, so memory
+# stays flat however long the document is. Produces the same text as
+# python-docx's Document.paragraphs / Document.tables (top-level paragraphs
+# and tables of the body; merged cells repeated like _Row.cells) without
+# building its object model.
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+_OFFICE_DOCUMENT = "/officeDocument"
+
+BODY, P, TBL, TR, TC = _W + "body", _W + "p", _W + "tbl", _W + "tr", _W + "tc"
+_R, _HYPERLINK = _W + "r", _W + "hyperlink"
+_T, _TAB, _PTAB, _BR, _CR, _NO_BREAK_HYPHEN = (
+    _W + "t", _W + "tab", _W + "ptab", _W + "br", _W + "cr", _W + "noBreakHyphen"
+)
+_TYPE, _VAL = _W + "type", _W + "val"
+
+Block = Tuple[str, Union[str, List[List[str]]]]
+
+
+def _main_part(zf: zipfile.ZipFile) -> str:
+    """Name of the main document part, from the package relationships."""
+    try:
+        from lxml import etree
+
+        rels = etree.fromstring(zf.read("_rels/.rels"))
+        for rel in rels.iter(_REL + "Relationship"):
+            if rel.get("Type", "").endswith(_OFFICE_DOCUMENT):
+                return posixpath.normpath(rel.get("Target").lstrip("/"))
+    except (KeyError, ValueError) as e:
+        logger.debug(f"No package relationships ({e}), assuming word/document.xml")
+    return "word/document.xml"
+
+
+def paragraph_text(p) -> str:
+    """Text of a w:p element, as python-docx's Paragraph.text."""
+    parts = []
+    for child in p:
+        if child.tag == _R:
+            runs = (child,)
+        elif child.tag == _HYPERLINK:
+            runs = child.iterchildren(_R)
+        else:
+            continue
+        for run in runs:
+            for e in run:
+                tag = e.tag
+                if tag == _T:
+                    parts.append(e.text or "")
+                elif tag == _TAB or tag == _PTAB:
+                    parts.append("\t")
+                elif tag == _CR:
+                    parts.append("\n")
+                elif tag == _BR:
+                    # Page and column breaks have no text
+                    if e.get(_TYPE, "textWrapping") == "textWrapping":
+                        parts.append("\n")
+                elif tag == _NO_BREAK_HYPHEN:
+                    parts.append("-")
+    return "".join(parts)
+
+
+def _property(element, properties: str, name: str):
+    """Element `name` of the w:tcPr / w:trPr child of `element`, or None."""
+    pr = element.find(_W + properties)
+    return None if pr is None else pr.find(_W + name)
+
+
+def _resolve_row(tcs, grid_before: int, above: dict) -> Tuple[List[str], dict]:
+    """
+    Cell texts of a row, one per layout-grid column each cell spans.
+
+    Args:
+        tcs: (text, grid span, vMerge value or None) per w:tc
+        grid_before: Empty grid columns at the start of the row
+        above: Resolved cells of the previous row, grid offset -> (text, span)
+
+    Returns:
+        (cell texts, resolved cells of this row by grid offset)
+    """
+    cells, resolved = [], {}
+    offset = grid_before
+    for text, span, v_merge in tcs:
+        if v_merge == "continue" and offset in above:
+            # Continuation of a vertical merge: the cell above holds the content
+            text, span = above[offset]
+        resolved[offset] = (text, span)
+        cells.extend([text] * span)
+        offset += span
+    return cells, resolved
+
+
+def iter_blocks(source) -> Iterator[Block]:
+    """
+    Stream the top-level blocks of a DOCX body in document order.
+
+    Args:
+        source: DOCX bytes, or path
+
+    Yields:
+        ("paragraph", text), or ("table", rows) with the cell texts of every
+        row (stripped, merged cells repeated per grid column)
+    """
+    from lxml import etree
+
+    with zipfile.ZipFile(io.BytesIO(source) if isinstance(source, (bytes, bytearray, memoryview)) else source) as zf:
+        with zf.open(_main_part(zf)) as part:
+            # Open elements from the root down, to tell top-level blocks from nested ones
+            path = []
+            rows, row_cells, paragraphs, above = [], [], [], {}
+            for event, element in etree.iterparse(part, events=("start", "end"), huge_tree=True):
+                if event == "start":
+                    path.append(element.tag)
+                    continue
+
+                tag = element.tag
+                depth = len(path)
+                top_level = depth == 3 and path[1] == BODY
+                in_cell = depth == 6 and path[1:5] == [BODY, TBL, TR, TC]
+
+                if tag == P and (top_level or in_cell):
+                    text = paragraph_text(element)
+                    if top_level:
+                        yield "paragraph", text
+                    else:
+                        paragraphs.append(text)
+                elif tag == TC and depth == 5 and path[1:4] == [BODY, TBL, TR]:
+                    span = _property(element, "tcPr", "gridSpan")
+                    v_merge = _property(element, "tcPr", "vMerge")
+                    row_cells.append((
+                        "\n".join(paragraphs).strip(),
+                        int(span.get(_VAL)) if span is not None else 1,
+                        None if v_merge is None else v_merge.get(_VAL, "continue"),
+                    ))
+                    paragraphs = []
+                elif tag == TR and depth == 4 and path[1:3] == [BODY, TBL]:
+                    before = _property(element, "trPr", "gridBefore")
+                    cells, above = _resolve_row(row_cells, int(before.get(_VAL)) if before is not None else 0, above)
+                    rows.append(cells)
+                    row_cells = []
+                elif tag == TBL and top_level:
+                    yield "table", rows
+                    rows, above = [], {}
+
+                path.pop()
+                if top_level or tag == TR and depth == 4:
+                    # Done with it: free the element and the siblings already read
+                    element.clear()
+                    parent = element.getparent()
+                    while element.getprevious() is not None:
+                        del parent[0]
+                elif tag == TC and depth == 5:
+                    element.clear()  # siblings stay: the row's w:trPr is read at its end
@@ -1,17 +1,19 @@
 import os
+import io
 import re
 import asyncio
-import tempfile
-from pathlib import Path
 from collections import Counter
 import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
 import aiohttp
 import fitz  # PyMuPDF
 import pdfplumber
 import docx
 import email
 from email import policy
-from bs4 import BeautifulSoup
+from app.config import PDF_TABLE_WORKERS, PDF_TABLE_PARALLEL_MIN_PAGES, EMAIL_ATTACHMENT_WORKERS
+from app.utils.email_extract import extract_html, document_attachments
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -100,44 +102,133 @@ def is_likely_header(row):
 # =========================
 # Format-Specific Parsers
 # =========================
-def parse_pdf(path):
+# Every parser takes either a file path or the document bytes.
+def is_in_memory(source):
+    return isinstance(source, (bytes, bytearray, memoryview))
+
+def open_pdf(source):
+    if is_in_memory(source):
+        return fitz.open(stream=bytes(source), filetype="pdf")
+    return fitz.open(source)
+
+def page_may_have_table(page):
+    """
+    Cheap check whether pdfplumber could find a table on a PyMuPDF page.
+
+    pdfplumber's default "lines" strategy builds cells from ruling edges, so a
+    table needs at least two horizontal and two vertical edges. Edges are
+    counted the way pdfplumber derives them from lines, rects and curves,
+    without length filtering, so pages rejected here never yield tables.
+    """
+    horizontal = vertical = 0
+    for drawing in page.get_drawings():
+        for item in drawing["items"]:
+            kind = item[0]
+            if kind == "re":
+                horizontal += 2
+                vertical += 2
+            elif kind == "l":
+                if item[1].y == item[2].y:
+                    horizontal += 1
+                else:
+                    vertical += 1
+            elif kind == "qu":
+                quad = item[1]
+                corners = [quad.ul, quad.ur, quad.lr, quad.ll, quad.ul]
+                for p0, p1 in zip(corners, corners[1:]):
+                    horizontal += p0.y == p1.y
+                    vertical += p0.x == p1.x
+            else:
+                # Curves: count both ways to stay conservative
+                horizontal += 1
+                vertical += 1
+            if horizontal >= 2 and vertical >= 2:
+                return True
+    return False
+
+
+def _extract_page_tables(source, page_numbers):
+    """Run pdfplumber table extraction on the given 0-based page numbers."""
+    with pdfplumber.open(io.BytesIO(source) if is_in_memory(source) else source) as pdf:
+        return [pdf.pages[n].extract_tables() for n in page_numbers]
+
+
+_table_pool = None
+
+def _get_table_pool():
+    global _table_pool
+    if _table_pool is None:
+        # spawn: the app process is multi-threaded, forking it is unsafe
+        _table_pool = ProcessPoolExecutor(
+            max_workers=PDF_TABLE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _table_pool
+
+
+def extract_pdf_tables(source, page_numbers):
+    """
+    Extract raw tables for the given pages, in page order.
+    Large page sets are split across a process pool.
+    """
+    if len(page_numbers) < PDF_TABLE_PARALLEL_MIN_PAGES or PDF_TABLE_WORKERS <= 1:
+        return _extract_page_tables(source, page_numbers)
+
+    if isinstance(source, memoryview):
+        source = bytes(source)
+
+    batches = [page_numbers[i::PDF_TABLE_WORKERS] for i in range(PDF_TABLE_WORKERS)]
+    batches = [b for b in batches if b]
+    pool = _get_table_pool()
+    results = list(pool.map(_extract_page_tables, [source] * len(batches), batches))
+
+    by_page = {}
+    for batch, tables in zip(batches, results):
+        by_page.update(zip(batch, tables))
+    return [by_page[n] for n in page_numbers]
+
+
+def parse_pdf(source, prefilter=True):
     sanitizer = TextSanitizer()
-    with fitz.open(path) as doc:
+    with open_pdf(source) as doc:
         raw_text = "\n\n".join(page.get_text("text") for page in doc)
+        if prefilter:
+            table_pages = [page.number for page in doc if page_may_have_table(page)]
+        else:
+            table_pages = list(range(doc.page_count))
     cleaned_text = sanitizer.clean(raw_text)
 
     rows = []
     seen = set()
-    with pdfplumber.open(path) as pdf:
-        for page in pdf.pages:
-            for table in page.extract_tables():
-                if not table or len(table) < 2:
+    for page_tables in extract_pdf_tables(source, table_pages):
+        for table in page_tables:
+            if not table or len(table) < 2:
+                continue
+            headers = []
+            start_row = 0
+            for i in range(min(3, len(table))):
+                if is_likely_header(table[i]):
+                    headers.append(table[i])
+                    start_row = i + 1
+                else:
+                    break
+            if not headers:
+                headers = [table[0]]
+                start_row = 1
+            merged = forward_fill_row(merge_table_headers(headers))
+            for row in table[start_row:]:
+                row_data = [str(cell).replace("\n", " ").strip() if cell else "" for cell in forward_fill_row(row)]
+                if len(row_data) != len(merged):
                     continue
-                headers = []
-                start_row = 0
-                for i in range(min(3, len(table))):
-                    if is_likely_header(table[i]):
-                        headers.append(table[i])
-                        start_row = i + 1
-                    else:
-                        break
-                if not headers:
-                    headers = [table[0]]
-                    start_row = 1
-                merged = forward_fill_row(merge_table_headers(headers))
-                for row in table[start_row:]:
-                    row_data = [str(cell).replace("\n", " ").strip() if cell else "" for cell in forward_fill_row(row)]
-                    if len(row_data) != len(merged):
-                        continue
-                    entry = ", ".join(f"{h}: {v}" for h, v in zip(merged, row_data) if h and v)
-                    if entry and entry not in seen:
-                        seen.add(entry)
-                        rows.append(entry)
+                entry = ", ".join(f"{h}: {v}" for h, v in zip(merged, row_data) if h and v)
+                if entry and entry not in seen:
+                    seen.add(entry)
+                    rows.append(entry)
     return cleaned_text, rows
 
-def parse_docx(path):
+def parse_docx(source):
     sanitizer = TextSanitizer()
-    doc = docx.Document(path)
+    doc = docx.Document(io.BytesIO(source) if is_in_memory(source) else source)
     raw_text = "\n".join(p.text for p in doc.paragraphs if p.text.strip())
     cleaned_text = sanitizer.clean(raw_text)
 
@@ -153,20 +244,22 @@ def parse_docx(path):
                 rows.append(", ".join(pairs))
     return cleaned_text, rows
 
-def parse_eml(path):
+def parse_eml(source):
     sanitizer = TextSanitizer()
-    with open(path, 'rb') as f:
-        msg = email.message_from_binary_file(f, policy=policy.default)
+    if is_in_memory(source):
+        msg = email.message_from_bytes(bytes(source), policy=policy.default)
+    else:
+        with open(source, 'rb') as f:
+            msg = email.message_from_binary_file(f, policy=policy.default)
 
     text_parts, rows = [], []
     for part in msg.walk():
         if part.get_content_type() == "text/plain":
             text_parts.append(part.get_content())
         elif part.get_content_type() == "text/html":
-            soup = BeautifulSoup(part.get_content(), "html.parser")
-            text_parts.append(soup.get_text())
-            for table in soup.find_all("table"):
-                html_rows = [[td.get_text(strip=True) for td in tr.find_all(["td", "th"])] for tr in table.find_all("tr")]
+            text, tables = extract_html(part.get_content())
+            text_parts.append(text)
+            for html_rows in tables:
                 if html_rows and len(html_rows) > 1:
                     headers = forward_fill_row(html_rows[0])
                     for row in html_rows[1:]:
@@ -176,20 +269,39 @@ def parse_eml(path):
                         if entry:
                             rows.append(entry)
     cleaned_text = sanitizer.clean("\n".join(text_parts))
+
+    # PDF/DOCX attachments go through their own parser, in parallel, merged in order
+    attachments = document_attachments(msg)
+    if attachments:
+        with ThreadPoolExecutor(max_workers=min(EMAIL_ATTACHMENT_WORKERS, len(attachments))) as pool:
+            for text, attachment_rows in pool.map(_parse_attachment, attachments):
+                if text:
+                    cleaned_text = f"{cleaned_text} {text}".strip()
+                rows.extend(attachment_rows)
     return cleaned_text, rows
 
+def _parse_attachment(attachment):
+    filename, ext, payload = attachment
+    try:
+        return parse_local_file(f"attachment.{ext}", payload)
+    except Exception as e:
+        logger.warning(f"Skipping attachment {filename}: {e}")
+        return "", []
+
 
 # =========================
 # File Handler
 # =========================
-def parse_local_file(file_path):
+def parse_local_file(file_path, content=None):
+    """Parse a document by extension; `content` holds its bytes if already in memory."""
     ext = os.path.splitext(file_path)[1].lower()
+    source = file_path if content is None else content
     if ext == ".pdf":
-        return parse_pdf(file_path)
+        return parse_pdf(source)
     elif ext == ".docx":
-        return parse_docx(file_path)
+        return parse_docx(source)
     elif ext == ".eml":
-        return parse_eml(file_path)
+        return parse_eml(source)
     else:
         raise ValueError(f"Unsupported file extension: {ext}")
 
@@ -212,8 +324,6 @@ async def fetch_document(url: str, output_file: str = None):
     try:
         logger.info(f"Fetching document from {url}")
         suffix = '.' + url.split('?')[0].split('.')[-1].lower()
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
-        path = Path(temp_file.name)
 
         headers = {'User-Agent': 'DocFetcher/1.0'}
         async with aiohttp.ClientSession() as session:
@@ -221,21 +331,14 @@ async def fetch_document(url: str, output_file: str = None):
                 if response.status != 200:
                     logger.error(f"Failed to fetch file: HTTP {response.status}")
                     return None
-                with open(path, 'wb') as f:
-                    async for chunk in response.content.iter_chunked(4096):
-                        f.write(chunk)
+                content = await response.read()
 
-        text, tables = parse_local_file(str(path))
+        text, tables = parse_local_file(f"document{suffix}", content)
         output = save_output(text, tables, output_file)
         return output
 
     except Exception as e:
         logger.error(f"Error: {e}")
-    finally:
-        try:
-            path.unlink(missing_ok=True)
-        except Exception:
-            pass
     return None
 
 
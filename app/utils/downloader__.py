@@ -1,5 +1,4 @@
 from email import utils
-from llama_cloud_services import LlamaParse
 import asyncio
 import time
 import os
@@ -10,11 +9,15 @@ import tempfile
 import logging
 import mimetypes
 import re 
+import io
+import uuid
 from collections import Counter
-import docx
 import email
 from email import policy
-from bs4 import BeautifulSoup
+from app.utils.email_extract import extract_html, document_attachments
+import app.utils.docx_extract as docx_extract
+import app.service.artifact_store as artifact_store
+import app.service.tracing as tracing
 
 logger = logging.getLogger(__name__)
 
@@ -28,19 +31,36 @@ from app.config import (
     LLAMA_DISABLE_IMG,
     LLAMA_HIDE_HEADERS,
     LLAMA_HIDE_FOOTERS,
-    ASYNC_TIMEOUT
+    ASYNC_TIMEOUT,
+    DOCUMENT_MAX_BYTES,
+    DOCUMENT_SPILL_BYTES,
+    EMAIL_ATTACHMENT_WORKERS,
+    DOCX_STREAMING,
+    PROGRESSIVE_OUTLINE_PAGES,
 )
 
-parser = LlamaParse(
-    api_key=LLAMA_API_KEY,
-    verbose=True,
-    language=LLAMA_LANGUAGE,
-    disable_ocr=LLAMA_DISABLE_OCR,
-    disable_image_extraction=LLAMA_DISABLE_IMG,
-    hide_headers=LLAMA_HIDE_HEADERS,
-    hide_footers=LLAMA_HIDE_FOOTERS,
-    fast_mode=LLAMA_FAST_MODE,
-)
+# Created on first use: llama_cloud_services is slow to import
+parser = None
+SPILL_WRITE_BYTES = 4 * 1024 * 1024  # Spilled downloads are written in blocks this size, off the event loop
+
+
+def get_parser():
+    global parser
+    if parser is None:
+        from llama_cloud_services import LlamaParse
+
+        parser = LlamaParse(
+            api_key=LLAMA_API_KEY,
+            verbose=True,
+            language=LLAMA_LANGUAGE,
+            disable_ocr=LLAMA_DISABLE_OCR,
+            disable_image_extraction=LLAMA_DISABLE_IMG,
+            hide_headers=LLAMA_HIDE_HEADERS,
+            hide_footers=LLAMA_HIDE_FOOTERS,
+            fast_mode=LLAMA_FAST_MODE,
+        )
+    return parser
+
 
 class UniversalTextCleaner:
     def __init__(self):
@@ -118,6 +138,24 @@ def forward_fill(row):
         filled.append(last)
     return filled
 
+def table_pairs(rows):
+    """
+    One "header: cell, ..." line per row of a table, the first row being the
+    header. Rows whose cell count differs from the header's are skipped.
+    """
+    if not rows:
+        return []
+    headers = forward_fill(rows[0])
+    lines = []
+    for row in rows[1:]:
+        if len(row) != len(headers):
+            continue
+        pairs = [f"{h}: {c}" for h, c in zip(headers, row)
+                 if h and c and str(c).strip().lower() != "none"]
+        if pairs:
+            lines.append(", ".join(pairs))
+    return lines
+
 def merge_headers(header_rows):
     merged = []
     num_cols = max(len(r) for r in header_rows)
@@ -133,77 +171,170 @@ def is_header_row(row):
     return filled_count >= len(row) / 2
 
 
-async def fetch_document(url: str, timeout: int = ASYNC_TIMEOUT):
+def _is_in_memory(source):
+    return isinstance(source, (bytes, bytearray, memoryview))
+
+
+def _open_spill(path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return open(path, 'wb')
+
+
+def _close_spill(spill_file, chunks):
+    spill_file.writelines(chunks)
+    spill_file.close()
+
+
+@tracing.traced()
+async def fetch_document(
+    url: str,
+    timeout: int = ASYNC_TIMEOUT,
+    spill_bytes: int = DOCUMENT_SPILL_BYTES,
+    max_bytes: int = DOCUMENT_MAX_BYTES,
+):
+    """
+    Download a document into memory.
+
+    Bodies larger than spill_bytes are streamed to a temp file instead, and
+    bodies larger than max_bytes are rejected.
+
+    Returns:
+        (source, file_ext): source is the body as bytes, or the Path of the
+        spilled temp file; None if the download fails
+    """
     safe_url = url.split('?')[0]
     logger.info(f"Starting download of PDF from {safe_url}")
     file_ext = safe_url.split('.')[-1].lower()
+    tracing.set_attributes(url=safe_url, file_ext=file_ext)
     logger.debug(f"Detected file extension: {file_ext}")
 
-    # Save to project-level temp folder
-    temp_dir = Path(__file__).resolve().parent.parent / "temp"
-    temp_dir.mkdir(parents=True, exist_ok=True)
-    file_path = temp_dir / f"{int(time.time())}.{file_ext}"
-    temp_path = file_path
+    temp_path = Path(__file__).resolve().parent.parent / "temp" / f"{int(time.time())}_{uuid.uuid4().hex[:8]}.{file_ext}"
+    spill_file = None
 
     headers = {'User-Agent': 'HackRx-RAG-System/1.0'}
 
     try:
         async with aiohttp.ClientSession() as session:
             async with session.get(url, timeout=timeout, headers=headers) as response:
+                tracing.set_attributes(**{"http.status_code": response.status})
                 if response.status != 200:
                     logger.error(f"Download failed: HTTP {response.status}")
                     return None
-                
-                with open(temp_path, 'wb') as f:
-                    async for chunk in response.content.iter_chunked(4096):
-                        f.write(chunk)
+                if response.content_length and response.content_length > max_bytes:
+                    logger.error(f"Document too large: {response.content_length} bytes (limit {max_bytes})")
+                    return None
 
-        logger.info(f"Downloaded {file_ext.upper()} to {temp_path}")
-        return temp_path, file_ext
+                chunks = []
+                size = 0
+                buffered = 0  # bytes in chunks not yet written to the spill file
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    size += len(chunk)
+                    if size > max_bytes:
+                        logger.error(f"Document exceeds {max_bytes} bytes, aborting download")
+                        return None
+                    chunks.append(chunk)
+                    buffered += len(chunk)
+                    if spill_file is None and size > spill_bytes:
+                        # Too big to keep in memory: move it to disk. File I/O
+                        # runs in a thread so other requests keep being served
+                        spill_file = await asyncio.to_thread(_open_spill, temp_path)
+                    if spill_file is not None and buffered >= SPILL_WRITE_BYTES:
+                        await asyncio.to_thread(spill_file.writelines, chunks)
+                        chunks, buffered = [], 0
+
+        tracing.set_attributes(bytes=size, spilled=spill_file is not None)
+        if spill_file is not None:
+            await asyncio.to_thread(_close_spill, spill_file, chunks)
+            logger.info(f"Downloaded {file_ext.upper()} ({size} bytes) to {temp_path}")
+            return temp_path, file_ext
+
+        logger.info(f"Downloaded {file_ext.upper()} ({size} bytes) into memory")
+        return b"".join(chunks), file_ext
     
     except asyncio.TimeoutError:
         logger.error(f"Timeout after {timeout}s")
     except Exception as e:
         logger.error(f"Error: {e}")
-    
-    try:
-        temp_path.unlink()
-    except Exception:
-        pass
+    finally:
+        if spill_file is not None and not spill_file.closed:
+            spill_file.close()
+            temp_path.unlink(missing_ok=True)
     
     return None
 
 
-async def parse_pdf(path):
-    documents = await parser.aload_data(path)
-    return documents
-def parse_docx(path):
-    cleaner = UniversalTextCleaner()
-    doc = docx.Document(path)
+@tracing.traced()
+async def parse_pdf(source):
+    """
+    Parse a PDF with LlamaParse.
 
-    # Text
-    raw_text = "\n".join(para.text for para in doc.paragraphs if para.text.strip())
-    cleaned_text = cleaner.clean_text(raw_text)
+    Args:
+        source: PDF bytes or path
 
-    # Tables
-    table_rows = []
-    for table in doc.tables:
-        headers = forward_fill([cell.text.strip() for cell in table.rows[0].cells])
-        for row in table.rows[1:]:
-            row_data = [cell.text.strip() for cell in row.cells]
-            if len(row_data) != len(headers):
-                continue
-            pairs = [f"{h}: {c}" for h, c in zip(headers, row_data)
-                     if h and c and str(c).strip().lower() != "none"]
-            if pairs:
-                table_rows.append(", ".join(pairs))
+    Returns:
+        str: Text of all parsed pages
+    """
+    if _is_in_memory(source):
+        documents = await get_parser().aload_data(bytes(source), extra_info={"file_name": "document.pdf"})
+    else:
+        documents = await get_parser().aload_data(str(source))
+    text = "\n\n".join(doc.text for doc in documents)
+    tracing.set_attributes(pages=len(documents), chars=len(text))
+    return text
+@tracing.traced()
+def parse_docx(source, streaming: bool = DOCX_STREAMING):
+    """
+    Parse a DOCX: body paragraphs and table rows.
+
+    By default the document XML is streamed (docx_extract); with
+    streaming=False, or if the stream cannot be read, python-docx loads the
+    whole document. Both give the same output.
 
+    Returns:
+        (cleaned text, table rows as "header: cell, ..." lines)
+    """
+    paragraphs, tables = [], []
+    if streaming:
+        try:
+            for kind, value in docx_extract.iter_blocks(source):
+                (paragraphs if kind == "paragraph" else tables).append(value)
+        except Exception as e:
+            logger.warning(f"⚠️ Streaming DOCX extraction failed ({e}), loading it with python-docx")
+            streaming = False
+    if not streaming:
+        paragraphs, tables = _docx_blocks(source)
+
+    cleaner = UniversalTextCleaner()
+    cleaned_text = cleaner.clean_text("\n".join(text for text in paragraphs if text.strip()))
+    table_rows = [line for rows in tables for line in table_pairs(rows)]
+
+    tracing.set_attributes(streaming=streaming, paragraphs=len(paragraphs), tables=len(tables), chars=len(cleaned_text))
     return cleaned_text, table_rows
 
-def parse_email(path):
+def _docx_blocks(source):
+    """Paragraph texts and table cell texts through python-docx's object model."""
+    import docx
+
+    doc = docx.Document(io.BytesIO(source) if _is_in_memory(source) else source)
+    paragraphs = [para.text for para in doc.paragraphs]
+    tables = [[[cell.text.strip() for cell in row.cells] for row in table.rows] for table in doc.tables]
+    return paragraphs, tables
+
+@tracing.traced()
+async def parse_email(source):
+    """
+    Parse an email: plain-text and HTML bodies, HTML tables, and PDF/DOCX
+    attachments, which are parsed concurrently and appended in message order.
+
+    Returns:
+        (text, table_rows)
+    """
     cleaner = UniversalTextCleaner()
-    with open(path, 'rb') as f:
-        msg = email.message_from_binary_file(f, policy=policy.default)
+    if _is_in_memory(source):
+        msg = email.message_from_bytes(bytes(source), policy=policy.default)
+    else:
+        with open(source, 'rb') as f:
+            msg = email.message_from_binary_file(f, policy=policy.default)
 
     text_parts = []
     table_rows = []
@@ -213,101 +344,170 @@ def parse_email(path):
         if content_type == "text/plain":
             text_parts.append(part.get_content())
         elif content_type == "text/html":
-            html_content = part.get_content()
-            soup = BeautifulSoup(html_content, "html.parser")
-            text_parts.append(soup.get_text())
-
-            # Extract HTML tables
-            for html_table in soup.find_all("table"):
-                rows = []
-                for tr in html_table.find_all("tr"):
-                    cells = [td.get_text(strip=True) for td in tr.find_all(["td", "th"])]
-                    rows.append(cells)
-                if rows and len(rows) > 1:
-                    headers = forward_fill(rows[0])
-                    for row in rows[1:]:
-                        if len(row) != len(headers):
-                            continue
-                        pairs = [f"{h}: {c}" for h, c in zip(headers, row)
-                                 if h and c and str(c).strip().lower() != "none"]
-                        if pairs:
-                            table_rows.append(", ".join(pairs))
+            text, tables = extract_html(part.get_content())
+            text_parts.append(text)
+
+            for rows in tables:
+                table_rows.extend(table_pairs(rows))
 
     cleaned_text = cleaner.clean_text("\n".join(text_parts))
+
+    attachments = document_attachments(msg)
+    tracing.set_attributes(attachments=len(attachments))
+    if attachments:
+        semaphore = asyncio.Semaphore(EMAIL_ATTACHMENT_WORKERS)
+
+        async def _bounded(attachment):
+            async with semaphore:
+                return await _parse_attachment(*attachment)
+
+        # Attachment text is cleaned by its own parser, keep it out of the body cleaning
+        for text, rows in await asyncio.gather(*(_bounded(a) for a in attachments)):
+            if text:
+                cleaned_text = f"{cleaned_text} {text}".strip()
+            table_rows.extend(rows)
+
     return cleaned_text, table_rows
 
-async def save_file(content):
-    temp_dir = Path(__file__).resolve().parent.parent / "temp"
-    temp_dir.mkdir(exist_ok=True)
-    
-    filename = f"pdf_to_text.txt"
 
-    file_path = temp_dir / filename
+async def _parse_attachment(filename, ext, payload):
+    try:
+        if ext == "pdf":
+            return await parse_pdf(payload), []
+        return await asyncio.to_thread(parse_docx, payload)
+    except Exception as e:
+        logger.warning(f"Skipping attachment {filename}: {e}")
+        return "", []
+
+
+async def _text_key(source, file_ext: str) -> str:
+    # Same bytes parse to the same text: reuse what any worker already extracted
+    return f"{file_ext}:{await asyncio.to_thread(artifact_store.content_key, source)}"
 
-    # Save content
-    with open(file_path, "w", encoding="utf-8") as f:
-        f.write(str(content))
 
-    logger.info(f"Saved parsed content to {file_path}")
-    return str(file_path) 
+async def cached_text(source, file_ext: str):
+    """Text of these exact bytes if any worker already extracted it, else None."""
+    final_output = await asyncio.to_thread(artifact_store.get, "text", await _text_key(source, file_ext))
+    return final_output.decode("utf-8") if final_output is not None else None
 
-async def document_downloader(url: str):
+
+@tracing.traced()
+async def extract_text(source, file_ext: str):
     """
-    Download a document (PDF, DOCX, or email) and extract its text.
+    Extract the text of a downloaded document, reusing cached text when possible.
 
     Args:
-        url: URL of the document
+        source: Document bytes, or Path of a spilled download
+        file_ext: File extension from the URL
 
     Returns:
-        Extracted text as string, or None if processing fails
+        Extracted text as string, or None for unsupported file types
     """
-    safe_url = url
-    if '%' not in url and ('&' in url or '+' in url or '=' in url):
-        # Only encode the query part, not the entire URL
-        parts = url.split('?', 1)
-        if len(parts) > 1:
-            base_url, query = parts
-            # Don't re-encode percent signs
-            safe_url = f"{base_url}?{query}"
-    try:
-        result = await fetch_document(url)
-        if not result:
-            logger.error("Failed to download document")
-            return None
+    text_key = await _text_key(source, file_ext)
+    final_output = await asyncio.to_thread(artifact_store.get, "text", text_key)
+    tracing.set_attributes(file_ext=file_ext, cached=final_output is not None)
+    if final_output is not None:
+        logger.info(f"Using cached text for {file_ext.upper()} document")
+        return final_output.decode("utf-8")
+
+    if file_ext == "pdf":
+        final_output = await parse_pdf(source)
+
+
+    elif file_ext in ["docx", "doc"]:
+        text,table = await asyncio.to_thread(parse_docx, source)
+        final_output = text.strip()
+        if table:
+            final_output += "; " + "; ".join(table)
+
+
+    elif file_ext in ["eml", "msg"]:
+        logger.debug("Processing email file")
+        text,table = await parse_email(source)
+        final_output = text.strip()
+        if table:
+            final_output += "; " + "; ".join(table)
+            
+    else:
+        logger.error(f"Unsupported file type: {file_ext}")
+        return None
+    logger.info(f"Extracted {len(final_output)} characters from {file_ext.upper()}")
+    tracing.set_attributes(chars=len(final_output))
+    await asyncio.to_thread(artifact_store.put, "text", text_key, final_output.encode("utf-8"))
+    return final_output
 
-        doc_path, file_ext = result
 
+def release(source):
+    """Delete the temp file of a spilled download (no-op for in-memory bodies)."""
+    if isinstance(source, Path):
         try:
-            if file_ext == "pdf":
-                final_output =  await parse_pdf(doc_path)
-
-
-            elif file_ext in ["docx", "doc"]:
-                text,table = parse_docx(doc_path)
-                final_output = text.strip()
-                if table:
-                    final_output += "; " + "; ".join(table)
-
-
-            elif file_ext in ["eml", "msg"]:
-                logger.debug(f"Processing email file: {doc_path}")
-                text,table = parse_email(doc_path)
-                final_output = text.strip()
-                if table:
-                    final_output += "; " + "; ".join(table)
-                    
-            else:
-                logger.error(f"Unsupported file type: {file_ext}")
-                return None
-            saved_path = await save_file(final_output)
-            logger.info(f"Document saved at: {saved_path}")
-            return saved_path
-        finally:
-            try:
-                Path(doc_path).unlink(missing_ok=True)
-            except Exception as e:
-                logger.warning(f"Failed to delete temp file: {e}")
+            source.unlink(missing_ok=True)
+        except Exception as e:
+            logger.warning(f"Failed to delete temp file: {e}")
 
-    except Exception as e:
-        logger.error(f"Error processing document: {e}")
-        return None
+
+@tracing.traced()
+def pdf_preview(source, first_pages: int, min_pages: int):
+    """
+    Quick local text of a long PDF, for progressive indexing.
+
+    Covers the first `first_pages` pages in full, plus an outline of the rest:
+    the PDF's table of contents, or headings detected by font size on a
+    sample of the remaining pages when it has none.
+
+    Args:
+        source: PDF bytes, or Path of a spilled download
+        first_pages: Pages to include in full
+        min_pages: Shorter PDFs return None (not worth indexing progressively)
+
+    Returns:
+        (text, pages covered, page count), or None
+    """
+    import fitz
+
+    with fitz.open(stream=bytes(source), filetype="pdf") if _is_in_memory(source) else fitz.open(source) as doc:
+        page_count = doc.page_count
+        tracing.set_attributes(pages=page_count)
+        if page_count < min_pages:
+            return None
+        covered = min(first_pages, page_count)
+        texts = [doc[n].get_text() for n in range(covered)]
+
+        outline = [(title, page) for _, title, page in doc.get_toc(simple=True) if page > covered]
+        if not outline and not doc.get_toc(simple=True):
+            outline = _detected_headings(doc, covered)
+
+    text = "\n\n".join(texts)
+    if outline:
+        text += "\n\nDocument outline:\n" + "\n".join(
+            f"Section '{title.strip()}' starts on page {page}." for title, page in outline
+        )
+    tracing.set_attributes(covered=covered, outline=len(outline), chars=len(text))
+    return text, covered, page_count
+
+
+def _detected_headings(doc, start: int, max_pages: int = PROGRESSIVE_OUTLINE_PAGES):
+    """
+    (heading, page number) for lines set noticeably larger than the body text,
+    from page `start` on. At most `max_pages` pages, spread evenly over the
+    rest, are scanned: laying out every page would cost most of a full parse
+    before the first answer. Headings elsewhere come with the full index.
+    """
+    def lines(page):
+        for block in page.get_text("dict")["blocks"]:
+            for line in block.get("lines", []):
+                spans = [span for span in line["spans"] if span["text"].strip()]
+                if spans:
+                    yield "".join(span["text"] for span in spans).strip(), max(span["size"] for span in spans)
+
+    sizes = Counter(round(size) for n in range(min(start, doc.page_count)) for _, size in lines(doc[n]))
+    body_size = sizes.most_common(1)[0][0] if sizes else 10
+    rest = range(start, doc.page_count)
+    sampled = rest[::max(1, -(-len(rest) // max_pages))] if max_pages > 0 else range(0)
+    tracing.set_attributes(outline_pages_scanned=len(sampled))
+    return [
+        (text, n + 1)
+        for n in sampled
+        for text, size in lines(doc[n])
+        if size >= body_size * 1.15 and 3 <= len(text) <= 120
+    ]
@@ -0,0 +1,94 @@
+import logging
+from app.config import EMAIL_HTML_PARSER
+
+try:
+    import lxml.html as lxml_html
+except ImportError:  # lxml is optional, BeautifulSoup's html.parser is the fallback
+    lxml_html = None
+
+logger = logging.getLogger(__name__)
+
+# Elements whose text BeautifulSoup's get_text() leaves out
+_NON_TEXT_TAGS = ("script", "style", "template")
+
+# Attachment content types we have a document parser for
+ATTACHMENT_TYPES = {
+    "application/pdf": "pdf",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": "docx",
+}
+
+
+def document_attachments(msg):
+    """
+    Collect the PDF/DOCX attachments of an email, in message order.
+
+    Attached emails (message/rfc822) are not returned: msg.walk() already
+    descends into them, so their parts are handled with the outer message.
+
+    Returns:
+        list: (filename, extension, payload bytes) tuples
+    """
+    attachments = []
+    for part in msg.walk():
+        if not part.is_attachment():
+            continue
+        filename = part.get_filename() or ""
+        ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else ATTACHMENT_TYPES.get(part.get_content_type())
+        if ext not in ATTACHMENT_TYPES.values():
+            continue
+        payload = part.get_payload(decode=True)
+        if payload:
+            attachments.append((filename or f"attachment.{ext}", ext, payload))
+    return attachments
+
+
+def extract_html(html: str, backend: str = EMAIL_HTML_PARSER):
+    """
+    Extract the visible text and the tables of an HTML document.
+
+    Args:
+        html: HTML markup
+        backend: "lxml" for the native lxml parser, otherwise a BeautifulSoup
+            parser name such as "html.parser"
+
+    Returns:
+        (text, tables): text as returned by BeautifulSoup.get_text(), and every
+        table as a list of rows of stripped cell strings
+    """
+    if backend == "lxml":
+        if lxml_html is not None:
+            return _extract_lxml(html)
+        logger.warning("lxml is not installed, falling back to html.parser")
+        backend = "html.parser"
+    return _extract_soup(html, backend)
+
+
+def _extract_soup(html, backend):
+    from bs4 import BeautifulSoup  # only needed without lxml
+
+    soup = BeautifulSoup(html, backend)
+    tables = [
+        [[td.get_text(strip=True) for td in tr.find_all(["td", "th"])] for tr in table.find_all("tr")]
+        for table in soup.find_all("table")
+    ]
+    return soup.get_text(), tables
+
+
+def _extract_lxml(html):
+    if not html.strip():
+        return "", []
+    try:
+        root = lxml_html.fromstring(html)
+    except ValueError:
+        # Unicode input with an XML encoding declaration
+        root = lxml_html.fromstring(html.encode("utf-8"))
+
+    for element in list(root.iter(*_NON_TEXT_TAGS)):
+        element.drop_tree()
+
+    # Single walk per table; cell text is stripped per text node like get_text(strip=True)
+    tables = [
+        [["".join(t.strip() for t in td.itertext()) for td in tr.iter("td", "th")] for tr in table.iter("tr")]
+        for table in root.iter("table")
+    ]
+    return root.text_content(), tables
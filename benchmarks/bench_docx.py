@@ -0,0 +1,125 @@
+"""
+Benchmark DOCX extraction: python-docx object model vs the streaming
+extractor (app/utils/docx_extract.py).
+
+Generates (or loads) long policy wordings with large benefit tables and, for
+each, runs parse_docx both ways in a fresh subprocess, reporting time, peak
+memory growth (max RSS over the RSS before parsing) and whether the output
+matches.
+
+Usage:
+    python -m benchmarks.bench_docx                          # generated fixture
+    python -m benchmarks.bench_docx policy1.docx policy2.docx
+    python -m benchmarks.bench_docx --paragraphs 20000 --tables 100 --rows 50
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = [("python-docx", False), ("streaming", True)]
+
+
+def make_policy_docx(paragraphs: int, tables: int, rows: int, cols: int = 5) -> bytes:
+    """A policy wording: clauses with a benefit table every paragraphs/tables clauses."""
+    import docx
+
+    doc = docx.Document()
+    doc.add_heading("Policy Wording", 0)
+    every = max(1, paragraphs // max(1, tables))
+    made = 0
+    for i in range(paragraphs):
+        doc.add_paragraph(
+            f"Clause {i}: the insurer shall indemnify hospitalisation expenses incurred for "
+            f"in-patient care, subject to the waiting period of {i % 48} months and the sub-limits below."
+        )
+        if i % every == every - 1 and made < tables:
+            made += 1
+            table = doc.add_table(rows=rows, cols=cols)
+            for c in range(cols):
+                table.cell(0, c).text = ["Benefit", "Plan A", "Plan B", "Waiting period", "Notes"][c % 5]
+            for r in range(1, rows):
+                for c in range(cols):
+                    table.cell(r, c).text = f"B{made}.{r}" if c == 0 else f"{(r * c) % 97 * 1000} INR"
+    out = io.BytesIO()
+    doc.save(out)
+    return out.getvalue()
+
+
+def _rss_kb() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def measure(path: str, streaming: bool):
+    """Runs in the subprocess: parse once, print timings as JSON."""
+    from app.utils.downloader__ import parse_docx
+
+    with open(path, "rb") as f:
+        source = f.read()
+    before = _rss_kb()
+    t0 = time.perf_counter()
+    text, rows = parse_docx(source, streaming=streaming)
+    elapsed = time.perf_counter() - t0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KB on Linux
+    digest = hashlib.sha256(json.dumps([text, rows]).encode()).hexdigest()
+    print(json.dumps({"seconds": elapsed, "peak_mb": (peak - before) / 1024, "digest": digest,
+                      "chars": len(text), "rows": len(rows)}))
+
+
+def bench(name: str, path: str) -> bool:
+    print(f"{name}: {os.path.getsize(path) / 2**20:.1f} MB")
+    results = {}
+    for label, streaming in MODES:
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_docx", "--measure", path] + (["--streaming"] if streaming else []),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip().splitlines()[-1]
+        results[label] = json.loads(out)
+
+    baseline = results["python-docx"]
+    for label, _ in MODES:
+        r = results[label]
+        same = r["digest"] == baseline["digest"]
+        print(f"  {label:<12}{r['seconds'] * 1000:>10.0f} ms{r['peak_mb']:>10.1f} MB peak"
+              f"  {r['chars']} chars, {r['rows']} table rows  {'OK' if same else 'MISMATCH'}")
+    print(f"  speedup {baseline['seconds'] / results['streaming']['seconds']:.1f}x")
+    return results["streaming"]["digest"] == baseline["digest"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("docx", nargs="*")
+    parser.add_argument("--paragraphs", type=int, default=5000)
+    parser.add_argument("--tables", type=int, default=40)
+    parser.add_argument("--rows", type=int, default=40)
+    parser.add_argument("--measure", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--streaming", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.measure, args.streaming)
+        return
+
+    fixtures = [(path, path) for path in args.docx]
+    if not fixtures:
+        path = os.path.join(tempfile.mkdtemp(), "policy.docx")
+        with open(path, "wb") as f:
+            f.write(make_policy_docx(args.paragraphs, args.tables, args.rows))
+        fixtures = [(f"generated ({args.paragraphs} paragraphs, {args.tables} tables x {args.rows} rows)", path)]
+
+    ok = all([bench(name, path) for name, path in fixtures])
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark HTML extraction for email parsing across HTML backends.
+
+Generates (or loads) HTML-heavy .eml files and times extract_html on every
+HTML part with each backend, checking that text (whitespace-normalized) and
+table cells match the html.parser baseline. Also times the full
+downloader.parse_eml with the configured backend (EMAIL_HTML_PARSER).
+
+Usage:
+    python -m benchmarks.bench_email                      # generated fixture
+    python -m benchmarks.bench_email claim1.eml claim2.eml
+    python -m benchmarks.bench_email --tables 200 --rows 30
+"""
+import argparse
+import email
+import sys
+import time
+from email import policy
+from email.message import EmailMessage
+
+from app.config import EMAIL_HTML_PARSER
+from app.utils.downloader import parse_eml
+from app.utils.email_extract import extract_html
+
+BACKENDS = ["html.parser", "lxml"]
+
+
+def make_html_email(parts: int, tables: int, rows: int) -> bytes:
+    """An email with `parts` HTML alternatives, each full of claim tables."""
+    msg = EmailMessage()
+    msg["Subject"] = "Claim settlement details"
+    msg.set_content("Please find the claim settlement summary below.")
+    for p in range(parts):
+        body = ["<html><head><style>td {padding: 2px}</style></head><body>"]
+        for t in range(tables):
+            body.append(f"<p>Claim batch {p}-{t}: amounts are <b>subject</b> to policy deductibles.</p>")
+            body.append("<table><tr><th>Claim ID</th><th>Treatment</th><th>Amount</th><th>Status</th></tr>")
+            for r in range(rows):
+                body.append(f"<tr><td>CLM-{p}{t}{r}</td><td><span>Procedure</span> {r}</td><td>{r * 1250} INR</td><td>Approved</td></tr>")
+            body.append("</table>")
+        body.append("</body></html>")
+        msg.add_attachment("".join(body), subtype="html", disposition="inline")
+    return bytes(msg)
+
+
+def html_parts(raw: bytes):
+    msg = email.message_from_bytes(raw, policy=policy.default)
+    return [part.get_content() for part in msg.walk() if part.get_content_type() == "text/html"]
+
+
+def normalized(results):
+    """Whitespace runs are collapsed by the text sanitizer, so compare without them."""
+    return [(" ".join(text.split()), tables) for text, tables in results]
+
+
+def bench(name: str, raw: bytes) -> bool:
+    parts = html_parts(raw)
+    size_mb = sum(len(p) for p in parts) / 2**20
+    print(f"{name}: {len(raw) / 2**20:.1f} MB email, {len(parts)} HTML parts ({size_mb:.1f} MB HTML)")
+
+    baseline = None
+    ok = True
+    for backend in BACKENDS:
+        t0 = time.perf_counter()
+        results = normalized(extract_html(p, backend) for p in parts)
+        elapsed = time.perf_counter() - t0
+        if baseline is None:
+            baseline = results
+        same = results == baseline
+        ok &= same
+        print(f"  {backend:<12}{elapsed * 1000:>10.1f} ms{size_mb / elapsed:>10.1f} MB/s  {'OK' if same else 'MISMATCH'}")
+
+    t0 = time.perf_counter()
+    text, rows = parse_eml(raw)
+    print(f"  parse_eml ({EMAIL_HTML_PARSER}) {(time.perf_counter() - t0) * 1000:.1f} ms, {len(text)} chars, {len(rows)} table rows")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("emls", nargs="*")
+    parser.add_argument("--parts", type=int, default=5)
+    parser.add_argument("--tables", type=int, default=100)
+    parser.add_argument("--rows", type=int, default=20)
+    args = parser.parse_args()
+
+    fixtures = [(path, open(path, "rb").read()) for path in args.emls]
+    if not fixtures:
+        fixtures = [("generated.eml", make_html_email(args.parts, args.tables, args.rows))]
+
+    ok = all([bench(name, raw) for name, raw in fixtures])
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Bulk offline ingestion (app/ingest.py) against indexing the same library one
+document at a time, the way the API's vectorize does.
+
+Generates a library of policy PDFs and DOCX files, then for every mode runs a
+fresh subprocess (in-process Qdrant, empty chunk store, no artifact store) and
+reports documents per second and, for the bulk run, the busy share of every
+stage.
+
+  sequential  one process: extract, chunk, sync_document (embeds per document)
+  bulk N      app.ingest with N parse workers, one embedding process
+
+Embedders:
+  weights   BGE-base-sized read-only weights used as an embedding table (no torch)
+  fake      no weights at all
+  real      the BGE model (needs sentence-transformers and torch)
+
+PDFs are parsed with PyMuPDF instead of LlamaParse, as in the load test.
+
+Usage:
+    python -m benchmarks.bench_ingest --docs 200 --workers 1 2 4
+    python -m benchmarks.bench_ingest --embedder fake --docs 500 --batch 4096
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def make_library(directory: str, docs: int, pages: int):
+    """Half PDFs, half DOCX policy wordings."""
+    from benchmarks.bench_docx import make_policy_docx
+    from benchmarks.bench_pdf_tables import make_synthetic_pdf
+
+    pdf = os.path.join(directory, "template.pdf")
+    make_synthetic_pdf(pdf, pages)
+    with open(pdf, "rb") as f:
+        pdf_bytes = f.read()
+    docx_bytes = make_policy_docx(paragraphs=pages * 30, tables=max(1, pages // 10), rows=6)
+    os.remove(pdf)
+    for i in range(docs):
+        # Same bytes under several names: the artifact store is off, so each is parsed and embedded
+        name, data = (f"policy-{i:05d}.pdf", pdf_bytes) if i % 2 == 0 else (f"wording-{i:05d}.docx", docx_bytes)
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(data)
+
+
+def _install(workdir: str, embedder_name: str):
+    os.environ["ARTIFACT_STORE_ENABLED"] = "false"
+    os.environ["CHUNK_STORE_PATH"] = os.path.join(workdir, "chunks")
+    os.environ["TRACING_ENABLED"] = "false"
+    from qdrant_client import QdrantClient
+
+    import app.service.embedder as embedder
+    import app.service.vector_store as vector_store
+    import app.utils.downloader__ as fetcher
+    from benchmarks.bench_workers import WeightsModel
+    from benchmarks.loadtest import FakeModel, LocalPDFParser, LockedClient
+
+    if embedder_name == "weights":
+        embedder.model = WeightsModel()
+    elif embedder_name == "fake":
+        embedder.model = FakeModel()
+    vector_store.client = LockedClient(QdrantClient(":memory:"))
+    fetcher.parser = LocalPDFParser()
+
+
+def run_mode(args):
+    """Runs in the subprocess: index the library once, print the report as JSON."""
+    workdir = tempfile.mkdtemp(prefix="bench-ingest-run-")
+    _install(workdir, args.embedder)
+    import app.ingest as ingest
+
+    sources = ingest.collect_sources([args.library])
+    if args.mode == "bulk":
+        report = ingest.ingest(sources, args.current_workers, args.batch, os.path.join(workdir, "checkpoint.jsonl"))
+    else:
+        report = sequential(sources)
+    print(json.dumps(report))
+
+
+def sequential(sources) -> dict:
+    import app.service.chunker as chunker
+    import app.service.embedder as embedder
+    import app.service.registry as registry
+    import app.service.vector_store as vector_store
+    from app.ingest import _extract
+
+    start = time.perf_counter()
+    chunks = 0
+    for source, url in sources:
+        text = asyncio.run(_extract(source))
+        document_chunks = chunker.chunk_text(text)
+        hashes = [chunker.chunk_hash(c) for c in document_chunks]
+        vector_store.sync_document(registry.document_id_for(url), document_chunks, hashes, embedder.embed_passages, url)
+        chunks += len(document_chunks)
+    seconds = time.perf_counter() - start
+    return {"indexed": len(sources), "failed": 0, "chunks": chunks, "seconds": seconds,
+            "docs_per_s": len(sources) / seconds, "chunks_per_s": chunks / seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=10, help="pages per PDF (DOCX files are about as long)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--batch", type=int, default=2048, help="chunks per embedding call")
+    parser.add_argument("--embedder", choices=["weights", "fake", "real"], default="weights")
+    parser.add_argument("--skip-sequential", action="store_true")
+    parser.add_argument("--out", default=None, help="JSON report path")
+    parser.add_argument("--mode", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--library", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--current-workers", type=int, default=1, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args)
+        return
+
+    library = tempfile.mkdtemp(prefix="bench-ingest-")
+    make_library(library, args.docs, args.pages)
+    print(f"{args.docs} documents, embedder {args.embedder}, {os.cpu_count()} CPUs")
+
+    modes = [] if args.skip_sequential else [("sequential", 1)]
+    modes += [("bulk", workers) for workers in args.workers]
+    results = []
+    print(f"{'mode':<12}{'docs/s':>8}{'chunks/s':>10}{'s':>8}   parse  plan  embed  upsert (busy share)")
+    for mode, workers in modes:
+        command = [
+            sys.executable, "-m", "benchmarks.bench_ingest", "--mode", mode, "--library", library,
+            "--current-workers", str(workers), "--batch", str(args.batch), "--embedder", args.embedder,
+        ]
+        output = subprocess.run(command, capture_output=True, text=True, env=dict(os.environ, LOG_LEVEL="WARNING"))
+        if output.returncode != 0:
+            print(output.stderr[-2000:])
+            continue
+        report = json.loads(output.stdout.strip().splitlines()[-1])
+        label = mode if mode == "sequential" else f"bulk x{workers}"
+        stages = report.get("stages")
+        utilization = "  ".join(f"{stages[s]['utilization']:>5.0%}" for s in ("parse", "plan", "embed", "upsert")) if stages else ""
+        print(f"{label:<12}{report['docs_per_s']:>8.2f}{report['chunks_per_s']:>10.0f}{report['seconds']:>8.1f}   {utilization}")
+        results.append(dict(report, mode=mode, workers=workers))
+
+    if args.out:
+        from benchmarks.loadtest import git_commit
+
+        with open(args.out, "w") as f:
+            json.dump({"commit": git_commit(), "docs": args.docs, "embedder": args.embedder,
+                       "cpus": os.cpu_count(), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
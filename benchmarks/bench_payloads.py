@@ -0,0 +1,116 @@
+"""
+Compare full payloads (chunk text in Qdrant) with compact payloads (document_id
+and chunk_index only, texts in the local chunk store).
+
+Loads the same synthetic chunks both ways and reports:
+
+  payload MB     JSON size of all stored payloads (what the collection keeps
+                 in memory besides the vectors)
+  response KB    size of one search_batch response (QUESTIONS x top-k hits)
+  search ms      search_batch round trip
+  resolve ms     chunk_store.texts for all hits (compact only)
+
+Usage:
+    QDRANT_URL=http://localhost:6333 python -m benchmarks.bench_payloads
+    python -m benchmarks.bench_payloads --chunks 20000   # in-process local mode
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import uuid
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.models import SearchRequest
+
+import app.service.chunk_store as chunk_store
+import app.service.vector_store as vector_store
+
+COLLECTION = "bench-payloads"
+QUESTIONS = 16
+TOP_K = 3
+CHUNK_WORDS = 180
+
+
+def make_chunks(n: int, documents: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    words = ["benefit", "premium", "insured", "clause", "period", "hospital", "waiting", "policy", "claim", "cover"]
+    chunks = [" ".join(rng.choice(words, CHUNK_WORDS)) for _ in range(n)]
+    document_ids = [str(uuid.UUID(int=d + 1)) for d in range(documents)]
+    vectors = rng.standard_normal((n, vector_store.VECTOR_SIZE)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return chunks, document_ids, vectors
+
+
+def payloads(chunks, document_ids, compact: bool):
+    per_document = -(-len(chunks) // len(document_ids))
+    result = []
+    for i, text in enumerate(chunks):
+        document_id, chunk_index = document_ids[i // per_document], i % per_document
+        payload = {"document_id": document_id, "chunk_index": chunk_index}
+        if not compact:
+            payload.update({"text": f"passage: {text}", "source_file": f"https://example.com/{document_id}.pdf", "chunk_hash": "0" * 64})
+        result.append(payload)
+    return result
+
+
+def run(client, label, chunks, document_ids, vectors, compact):
+    if client.collection_exists(COLLECTION):
+        client.delete_collection(COLLECTION)
+    client.create_collection(COLLECTION, **vector_store.collection_params())
+    points = payloads(chunks, document_ids, compact)
+    ids = [str(uuid.UUID(int=i + 1)) for i in range(len(chunks))]
+    vector_store.write_points(ids, vectors, points, collection_name=COLLECTION)
+
+    if compact:
+        per_document = -(-len(chunks) // len(document_ids))
+        for d, document_id in enumerate(document_ids):
+            part = slice(d * per_document, (d + 1) * per_document)
+            chunk_store.write(document_id, chunks[part], ids[part], f"https://example.com/{document_id}.pdf")
+
+    payload_bytes = sum(len(json.dumps(p)) for p in points)
+    queries = vectors[:QUESTIONS]
+    requests = [SearchRequest(vector=q.tolist(), limit=TOP_K, with_payload=True) for q in queries]
+
+    t0 = time.perf_counter()
+    results = client.search_batch(collection_name=COLLECTION, requests=requests)
+    search_ms = (time.perf_counter() - t0) * 1000
+    response_bytes = sum(len(hit.model_dump_json()) for hits in results for hit in hits)
+
+    resolve_ms = 0.0
+    if compact:
+        chunk_store._open.clear()  # cold lookup: map the files again
+        t0 = time.perf_counter()
+        keys = [(h.payload["document_id"], str(h.id), h.payload["chunk_index"]) for hits in results for h in hits]
+        texts = chunk_store.texts(keys)
+        resolve_ms = (time.perf_counter() - t0) * 1000
+        assert len(texts) == len(set(keys))
+
+    print(f"{label:<9}{payload_bytes / 2**20:>12.2f}{response_bytes / 1024:>14.1f}{search_ms:>12.1f}{resolve_ms:>12.2f}")
+    client.delete_collection(COLLECTION)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--documents", type=int, default=40)
+    args = parser.parse_args()
+
+    url = os.getenv("QDRANT_URL")
+    client = QdrantClient(url=url) if url else QdrantClient(":memory:")
+    vector_store.client = client  # write_points uses the module client
+    chunks, document_ids, vectors = make_chunks(args.chunks, args.documents)
+
+    with tempfile.TemporaryDirectory() as store:
+        chunk_store.CHUNK_STORE_PATH = store
+        print(f"{args.chunks} chunks in {args.documents} documents, {QUESTIONS} questions x top-{TOP_K}")
+        print(f"{'payload':<9}{'payload MB':>12}{'response KB':>14}{'search ms':>12}{'resolve ms':>12}")
+        run(client, "full", chunks, document_ids, vectors, compact=False)
+        run(client, "compact", chunks, document_ids, vectors, compact=True)
+        print(f"chunk store on disk: {sum(os.path.getsize(os.path.join(store, f)) for f in os.listdir(store)) / 2**20:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
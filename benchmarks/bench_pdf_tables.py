@@ -0,0 +1,87 @@
+"""
+Benchmark local PDF parsing with and without the table-detection prefilter.
+
+For every PDF, runs downloader.parse_pdf with prefilter=False (pdfplumber on
+every page) and prefilter=True (pdfplumber only on pages with ruling lines,
+in parallel), reports pages/sec for both and checks that the extracted table
+rows are identical.
+
+Usage:
+    python -m benchmarks.bench_pdf_tables policy1.pdf policy2.pdf
+    python -m benchmarks.bench_pdf_tables --synthetic 200   # generated 200-page PDF
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import fitz
+
+from app.utils.downloader import parse_pdf
+
+
+def make_synthetic_pdf(path, pages, table_every=10):
+    """Text-only policy pages, with a ruled benefit table every `table_every` pages."""
+    doc = fitz.open()
+    for n in range(pages):
+        page = doc.new_page()
+        body = " ".join(f"Clause {n}.{i}: the insured is covered subject to the waiting period." for i in range(30))
+        page.insert_textbox(fitz.Rect(50, 50, 550, 400), body, fontsize=9)
+        if n % table_every == 0:
+            rows, cols, top, left, height, width = 6, 3, 450, 50, 20, 160
+            for r in range(rows + 1):
+                page.draw_line((left, top + r * height), (left + cols * width, top + r * height))
+            for c in range(cols + 1):
+                page.draw_line((left + c * width, top), (left + c * width, top + rows * height))
+            cells = [["Benefit", "Limit", "Waiting"]] + [[f"Benefit {n}-{r}", f"{r * 1000} INR", f"{r} months"] for r in range(1, rows)]
+            for r, row in enumerate(cells):
+                for c, text in enumerate(row):
+                    page.insert_text((left + c * width + 4, top + r * height + 14), text, fontsize=9)
+    doc.save(path)
+    doc.close()
+
+
+def bench(path):
+    with fitz.open(path) as doc:
+        pages = doc.page_count
+
+    t0 = time.perf_counter()
+    _, baseline_rows = parse_pdf(path, prefilter=False)
+    baseline_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    _, rows = parse_pdf(path, prefilter=True)
+    prefilter_s = time.perf_counter() - t0
+
+    same = rows == baseline_rows
+    print(f"{os.path.basename(path):<30}{pages:>7}{pages / baseline_s:>14.1f}{pages / prefilter_s:>16.1f}"
+          f"{baseline_s / prefilter_s:>8.1f}x{len(rows):>7}  {'OK' if same else 'MISMATCH'}")
+    return same
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="*")
+    parser.add_argument("--synthetic", type=int, default=0, help="also benchmark a generated PDF with this many pages")
+    args = parser.parse_args()
+
+    paths = list(args.pdfs)
+    tmp = None
+    if args.synthetic or not paths:
+        tmp = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
+        tmp.close()
+        make_synthetic_pdf(tmp.name, args.synthetic or 100)
+        paths.append(tmp.name)
+
+    print(f"{'file':<30}{'pages':>7}{'base pg/s':>14}{'prefilter pg/s':>16}{'speedup':>9}{'rows':>7}  check")
+    try:
+        ok = all([bench(path) for path in paths])
+    finally:
+        if tmp:
+            os.unlink(tmp.name)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
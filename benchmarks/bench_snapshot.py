@@ -0,0 +1,122 @@
+"""
+Warm start from an index snapshot (app/service/snapshot.py) against a cold
+replica that ingests every document again.
+
+Indexes a generated library (half PDFs, half DOCX) with the bulk ingester,
+exports it as a float32 and a float16 snapshot, then starts "replicas" with
+an empty registry and chunk store:
+
+  cold            sequential ingestion of every document (what the first
+                  request for each document would do without a snapshot)
+  shared qdrant   snapshot load, points already in the vector store
+  empty qdrant    snapshot load, every point upserted from the snapshot
+
+and reports the time until every document is warm, plus the latency of the
+first chunk text lookups served from the mapped snapshot.
+
+Usage:
+    python -m benchmarks.bench_snapshot --docs 100
+    python -m benchmarks.bench_snapshot --docs 400 --embedder fake
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+
+def _reset(chunk_dir: str, qdrant=None):
+    import app.service.chunk_store as chunk_store
+    import app.service.state_store as state_store
+    import app.service.vector_store as vector_store
+
+    chunk_store.CHUNK_STORE_PATH = chunk_dir
+    chunk_store._open.clear()
+    chunk_store._mounted.clear()
+    state_store.STATE_STORE_PATH = f"{chunk_dir}-state.db"
+    if qdrant is not None:
+        vector_store.client = qdrant
+        vector_store._collection_ready = False
+
+
+def _lookups(document_ids, samples: int = 2000) -> float:
+    """p50 in microseconds of single chunk text lookups."""
+    import app.service.chunk_store as chunk_store
+
+    rng = np.random.default_rng(0)
+    timings = []
+    for document_id in rng.choice(document_ids, samples):
+        chunks = len(chunk_store.document(document_id)[0]) - 1
+        key = (document_id, int(rng.integers(chunks)))
+        start = time.perf_counter()
+        chunk_store.texts([key])
+        timings.append(time.perf_counter() - start)
+    return float(np.percentile(timings, 50) * 1e6)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--embedder", choices=["weights", "fake", "real"], default="weights")
+    parser.add_argument("--out", default=None, help="JSON report path")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-snapshot-")
+    library = os.path.join(workdir, "library")
+    os.makedirs(library)
+    os.environ["ARTIFACT_STORE_ENABLED"] = "false"  # before app.config is imported: cold means cold
+    from benchmarks.bench_ingest import _install, make_library, sequential
+
+    make_library(library, args.docs, args.pages)
+    _install(workdir, args.embedder)
+    from qdrant_client import QdrantClient
+
+    import app.ingest as ingest
+    import app.service.registry as registry
+    import app.service.snapshot as snapshot
+    import app.service.vector_store as vector_store
+    from benchmarks.loadtest import LockedClient
+
+    sources = ingest.collect_sources([library])
+    report = ingest.ingest(sources, checkpoint=os.path.join(workdir, "checkpoint.jsonl"))
+    shared = vector_store.client
+    document_ids = [registry.document_id_for(url) for _, url in sources]
+    chunks = report["chunks"]
+    print(f"{args.docs} documents, {chunks} chunks, embedder {args.embedder}, {os.cpu_count()} CPUs")
+
+    results = {"docs": args.docs, "chunks": chunks, "embedder": args.embedder}
+    for dtype in ("float32", "float16"):
+        path = os.path.join(workdir, f"index-{dtype}.snap")
+        start = time.perf_counter()
+        stats = snapshot.export(path, dtype=dtype)
+        results[f"export_{dtype}"] = {"seconds": time.perf_counter() - start, "mb": stats["bytes"] / 2**20}
+        print(f"export {dtype}: {stats['bytes'] / 2**20:.1f} MB in {results[f'export_{dtype}']['seconds']:.2f}s")
+
+    print(f"{'replica':<28}{'warm after s':>13}{'lookup p50 us':>15}")
+    _reset(os.path.join(workdir, "cold-chunks"), LockedClient(QdrantClient(":memory:")))
+    start = time.perf_counter()
+    sequential(sources)
+    results["cold"] = {"seconds": time.perf_counter() - start, "lookup_us": _lookups(document_ids)}
+    print(f"{'cold (ingest every document)':<28}{results['cold']['seconds']:>13.2f}{results['cold']['lookup_us']:>15.1f}")
+
+    for dtype in ("float32", "float16"):
+        for label, qdrant in (("shared qdrant", shared), ("empty qdrant", LockedClient(QdrantClient(":memory:")))):
+            _reset(os.path.join(workdir, f"replica-{dtype}-{label[:5]}"), qdrant)
+            stats = snapshot.load(os.path.join(workdir, f"index-{dtype}.snap"))
+            assert stats["documents"] == len(document_ids) and all(registry.is_ready(d) for d in document_ids)
+            name = f"snapshot {dtype}, {label}"
+            results[name] = dict(stats, lookup_us=_lookups(document_ids))
+            print(f"{name:<28}{stats['seconds']:>13.2f}{results[name]['lookup_us']:>15.1f}")
+
+    if args.out:
+        from benchmarks.loadtest import git_commit
+
+        with open(args.out, "w") as f:
+            json.dump(dict(results, commit=git_commit()), f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
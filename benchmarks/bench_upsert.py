@@ -0,0 +1,113 @@
+"""
+Benchmark Qdrant write throughput (points/sec) at several corpus sizes.
+
+For every size, loads random normalized 768-d vectors with document payloads
+in three ways and reports points/sec:
+
+  single     one client.upsert of PointStructs built with .tolist(), wait=True
+             (how documents used to be uploaded)
+  batched    vector_store.write_points with parallelism 1
+  parallel   vector_store.write_points with UPSERT_PARALLELISM threads
+
+With --grpc every mode is repeated over the gRPC transport (prefer_grpc).
+
+Usage:
+    QDRANT_URL=http://localhost:6333 python -m benchmarks.bench_upsert
+    QDRANT_URL=http://localhost:6333 python -m benchmarks.bench_upsert --sizes 1000 10000 100000 --grpc
+    python -m benchmarks.bench_upsert --sizes 1000 10000   # in-process local mode
+
+Without QDRANT_URL the in-process local mode is used. It has no network
+transport and is not thread-safe (parallel falls back to one thread), so use
+a real Qdrant server for meaningful numbers.
+"""
+import argparse
+import os
+import time
+import uuid
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.models import PointStruct
+
+import app.service.vector_store as vector_store
+from app.config import QDRANT_GRPC_PORT, UPSERT_BATCH_SIZE, UPSERT_PARALLELISM
+
+COLLECTION = "bench-upsert"
+
+
+def make_points(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, vector_store.VECTOR_SIZE)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [str(uuid.UUID(int=int(i) + 1)) for i in range(n)]
+    payloads = [
+        {"text": f"passage: chunk {i} " + "lorem ipsum " * 40, "document_id": f"doc-{i // 500}", "chunk_index": i % 500}
+        for i in range(n)
+    ]
+    return ids, vectors, payloads
+
+
+def single(client, ids, vectors, payloads, batch_size):
+    points = [PointStruct(id=i, vector=v.tolist(), payload=p) for i, v, p in zip(ids, vectors, payloads)]
+    client.upsert(collection_name=COLLECTION, points=points, wait=True)
+
+
+def batched(client, ids, vectors, payloads, batch_size):
+    vector_store.write_points(ids, vectors, payloads, batch_size=batch_size, parallelism=1, collection_name=COLLECTION)
+
+
+def parallel(client, ids, vectors, payloads, batch_size):
+    vector_store.write_points(ids, vectors, payloads, batch_size=batch_size, parallelism=UPSERT_PARALLELISM, collection_name=COLLECTION)
+
+
+MODES = [("single", single), ("batched", batched), ("parallel", parallel)]
+
+
+def run(client, transport, n, points, batch_size):
+    ids, vectors, payloads = points
+    vector_store.client = client  # write_points uses the module client
+    for name, load in MODES:
+        if client.collection_exists(COLLECTION):
+            client.delete_collection(COLLECTION)
+        client.create_collection(COLLECTION, **vector_store.collection_params())
+
+        t0 = time.perf_counter()
+        try:
+            load(client, ids, vectors, payloads, batch_size)
+        except Exception as e:  # e.g. a single 100k-point request over the size limit
+            print(f"{transport:<6}{n:>9}  {name:<10}{'failed':>12}  {str(e)[:60]}")
+            continue
+        elapsed = time.perf_counter() - t0
+
+        stored = client.count(COLLECTION).count
+        check = "OK" if stored == n else f"MISMATCH ({stored})"
+        print(f"{transport:<6}{n:>9}  {name:<10}{n / elapsed:>12.0f}{elapsed:>10.2f}  {check}")
+    client.delete_collection(COLLECTION)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--batch-size", type=int, default=UPSERT_BATCH_SIZE)
+    parser.add_argument("--grpc", action="store_true", help="also benchmark the gRPC transport")
+    args = parser.parse_args()
+
+    url = os.getenv("QDRANT_URL")
+    if url:
+        clients = [("http", QdrantClient(url=url))]
+        if args.grpc:
+            clients.append(("grpc", QdrantClient(url=url, prefer_grpc=True, grpc_port=QDRANT_GRPC_PORT)))
+    else:
+        print("⚠️ QDRANT_URL not set: local mode has no transport and runs single-threaded")
+        clients = [("local", QdrantClient(":memory:"))]
+
+    print(f"batch size {args.batch_size}, parallelism {UPSERT_PARALLELISM}")
+    print(f"{'via':<6}{'points':>9}  {'mode':<10}{'points/s':>12}{'s':>10}  check")
+    for n in args.sizes:
+        points = make_points(n)
+        for transport, client in clients:
+            run(client, transport, n, points, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
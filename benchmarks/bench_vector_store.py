@@ -0,0 +1,136 @@
+"""
+Benchmark vector store layouts: HNSW parameters, quantization and on-disk vectors.
+
+Builds a synthetic multi-document corpus (clustered, normalized 768-d vectors),
+loads it into one collection per configuration and reports, per configuration:
+estimated RAM, search latency (p50/p95) and recall@k against exact search.
+
+Usage:
+    python -m benchmarks.bench_vector_store --docs 50 --chunks 400 --queries 200
+    QDRANT_URL=http://localhost:6333 python -m benchmarks.bench_vector_store
+
+Without QDRANT_URL the in-process local mode is used. It always performs exact
+search and ignores HNSW and quantization, so use a real Qdrant server for
+meaningful numbers.
+"""
+import argparse
+import os
+import time
+import uuid
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.models import PointStruct, SearchRequest
+
+from app.service.vector_store import VECTOR_SIZE, collection_params, search_params, document_filter
+
+CONFIGS = [
+    # name, quantization, on_disk, hnsw params, search overrides
+    ("float32", "none", False, {"M": 16, "ef_construction": 200}, {}),
+    ("float32-m32", "none", False, {"M": 32, "ef_construction": 400}, {"hnsw_ef": 128}),
+    ("int8", "int8", False, {"M": 16, "ef_construction": 200}, {}),
+    ("int8-ondisk", "int8", True, {"M": 16, "ef_construction": 200}, {}),
+    ("binary-ondisk", "binary", True, {"M": 16, "ef_construction": 200}, {}),
+]
+
+
+def make_corpus(docs: int, chunks: int, queries: int, seed: int = 0):
+    """Clustered vectors per document, so in-document neighbours are non-trivial."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((docs, VECTOR_SIZE)).astype(np.float32)
+    vectors = np.repeat(centers, chunks, axis=0) + 0.8 * rng.standard_normal((docs * chunks, VECTOR_SIZE)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    doc_of = np.repeat(np.arange(docs), chunks)
+
+    query_docs = rng.integers(0, docs, size=queries)
+    query_vectors = centers[query_docs] + 0.8 * rng.standard_normal((queries, VECTOR_SIZE)).astype(np.float32)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    return vectors, doc_of, query_vectors, query_docs
+
+
+def ground_truth(vectors, doc_of, query_vectors, query_docs, k):
+    truth = []
+    for q, d in zip(query_vectors, query_docs):
+        idx = np.flatnonzero(doc_of == d)
+        scores = vectors[idx] @ q
+        truth.append(set(idx[np.argsort(-scores)[:k]].tolist()))
+    return truth
+
+
+def estimate_ram(n: int, quantization: str, on_disk: bool, m: int) -> int:
+    """Approximate resident bytes: vectors kept in RAM plus HNSW links."""
+    original = 0 if on_disk else n * VECTOR_SIZE * 4
+    quantized = {"int8": n * VECTOR_SIZE, "binary": n * VECTOR_SIZE // 8}.get(quantization, 0)
+    links = n * m * 2 * 4
+    return original + quantized + links
+
+
+def run_config(client, name, quantization, on_disk, hnsw, overrides, corpus, truth, k, doc_ids):
+    vectors, doc_of, query_vectors, query_docs = corpus
+    collection = f"bench-{name}"
+    if client.collection_exists(collection):
+        client.delete_collection(collection)
+    client.create_collection(collection, **collection_params(quantization=quantization, on_disk=on_disk, hnsw_params=hnsw))
+
+    t0 = time.perf_counter()
+    batch = 1000
+    for start in range(0, len(vectors), batch):
+        client.upsert(
+            collection_name=collection,
+            points=[
+                PointStruct(id=i, vector=vectors[i].tolist(), payload={"document_id": doc_ids[doc_of[i]]})
+                for i in range(start, min(start + batch, len(vectors)))
+            ],
+            wait=True,
+        )
+    load_time = time.perf_counter() - t0
+
+    params = search_params(quantization=quantization, **overrides)
+    latencies, hits = [], 0
+    for q, d, expected in zip(query_vectors, query_docs, truth):
+        t = time.perf_counter()
+        result = client.search_batch(
+            collection_name=collection,
+            requests=[SearchRequest(vector=q.tolist(), filter=document_filter(doc_ids[d]), limit=k, params=params)],
+        )[0]
+        latencies.append(time.perf_counter() - t)
+        hits += len(expected & {hit.id for hit in result})
+
+    client.delete_collection(collection)
+    latencies = np.array(latencies) * 1000
+    return {
+        "config": name,
+        "ram_mb": estimate_ram(len(vectors), quantization, on_disk, hnsw["M"]) / 2**20,
+        "load_s": load_time,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "recall": hits / (k * len(truth)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--chunks", type=int, default=300, help="chunks per document")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    url = os.getenv("QDRANT_URL")
+    client = QdrantClient(url=url) if url else QdrantClient(":memory:")
+    if not url:
+        print("⚠️ QDRANT_URL not set: local mode ignores HNSW/quantization, numbers are exact-search only")
+
+    corpus = make_corpus(args.docs, args.chunks, args.queries)
+    truth = ground_truth(*corpus, k=args.k)
+    doc_ids = [str(uuid.uuid4()) for _ in range(args.docs)]
+
+    print(f"{args.docs} docs x {args.chunks} chunks = {args.docs * args.chunks} vectors, {args.queries} queries, k={args.k}")
+    print(f"{'config':<16}{'est. RAM MB':>12}{'load s':>9}{'p50 ms':>9}{'p95 ms':>9}{'recall@k':>10}")
+    for name, quantization, on_disk, hnsw, overrides in CONFIGS:
+        r = run_config(client, name, quantization, on_disk, hnsw, overrides, corpus, truth, args.k, doc_ids)
+        print(f"{r['config']:<16}{r['ram_mb']:>12.1f}{r['load_s']:>9.2f}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['recall']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Memory and throughput of the pre-fork server (app/server.py) at several
+worker counts.
+
+For every worker count, starts `app.server.serve` in a subprocess with the
+load test stand-ins (mock LLM, PyMuPDF instead of LlamaParse, in-process
+Qdrant unless --qdrant-url), waits until every worker answers, and reports:
+
+  RSS MB       sum of the resident set of the master and all workers. Shared
+               pages are counted once per process, so this overstates usage.
+  PSS MB       sum of the proportional set size: each shared page is split
+               between the processes sharing it. This is the real total.
+  after load   PSS after the load stage (copy-on-write pages that workers
+               dirtied while serving are no longer shared)
+  rps, p50/p95 closed-loop throughput and latency on warm documents
+
+Embedders:
+  real      the BGE model (needs sentence-transformers and torch)
+  weights   BGE-base-sized read-only float32 weights (~440 MB) used as an
+            embedding table; no torch, shows the sharing of model weights
+  fake      no weights at all
+
+Warm documents are indexed in the master before forking, so with the
+in-process Qdrant every worker starts from the same (shared) index.
+
+Usage:
+    python -m benchmarks.bench_workers --workers 1 2 4 8
+    python -m benchmarks.bench_workers --embedder weights --concurrency 16 --requests 200
+    python -m benchmarks.bench_workers --embedder real --qdrant-url http://localhost:6333
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from benchmarks.loadtest import (
+    FakeModel,
+    LocalPDFParser,
+    LockedClient,
+    MockLLM,
+    free_port,
+    git_commit,
+    make_fixtures,
+    run_stage,
+    start_fixture_server,
+    wait_ready,
+)
+
+BGE_BASE_PARAMS = 110_000_000
+
+
+class WeightsModel:
+    """Model stand-in with BGE-base-sized weights: words index rows of a read-only table."""
+
+    def __init__(self, params: int = BGE_BASE_PARAMS, dim: int = 768):
+        self.table = np.random.default_rng(0).standard_normal((params // dim, dim), dtype=np.float32)
+
+    def encode(self, texts, normalize_embeddings=True, **kwargs):
+        rows = len(self.table)
+        vectors = np.stack([
+            self.table[[int.from_bytes(hashlib.blake2b(w.encode(), digest_size=8).digest(), "little") % rows
+                        for w in text.split()[:512] or [""]]].mean(axis=0)
+            for text in texts
+        ])
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+# =========================
+# Server side (the --serve subprocess)
+# =========================
+def serve(args):
+    os.environ["ARTIFACT_STORE_ENABLED"] = "false"
+    os.environ["CHUNK_STORE_PATH"] = os.path.join(args.workdir, "chunks")
+    os.environ["TRACING_ENABLED"] = "false"
+    os.environ["STATE_STORE_PATH"] = os.path.join(args.workdir, f"state-{args.current_workers}.db")
+    import app.server as server
+    import app.service.embedder as embedder
+
+    if args.embedder == "weights":
+        embedder.model = WeightsModel()
+    elif args.embedder == "fake":
+        embedder.model = FakeModel()
+
+    def install():
+        import fitz
+        from qdrant_client import QdrantClient
+
+        import app.service.chunker as chunker
+        import app.service.registry as registry
+        import app.service.retrival as retrival
+        import app.service.vector_store as vector_store
+        import app.utils.downloader__ as fetcher
+
+        qdrant = QdrantClient(url=args.qdrant_url) if args.qdrant_url else LockedClient(QdrantClient(":memory:"))
+        vector_store.client = qdrant
+        retrival.client = qdrant
+        retrival.groq_client = MockLLM(args.llm_latency, args.llm_jitter)
+        fetcher.parser = LocalPDFParser()
+
+        # Index the warm documents once, before forking
+        with fitz.open(os.path.join(args.workdir, "policy.pdf")) as doc:
+            text = "\n\n".join(page.get_text() for page in doc)
+        chunks = chunker.chunk_text(text)
+        hashes = [chunker.chunk_hash(c) for c in chunks]
+        for url in args.warm_urls:
+            document_id = registry.document_id_for(url)
+            vector_store.sync_document(document_id, chunks, hashes, embedder.embed_passages, url)
+            registry.mark_ready(document_id, url, len(chunks))
+
+    server.serve("127.0.0.1", args.port, args.workers, hooks=[install])
+
+
+# =========================
+# Memory accounting
+# =========================
+def _children(pid: int):
+    found = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                if int(f.read().rsplit(")", 1)[1].split()[1]) == pid:
+                    found.append(int(entry))
+        except (OSError, IndexError, ValueError):
+            pass
+    return found
+
+
+def _kb(path: str, field: str) -> int:
+    with open(path) as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def memory(master: int) -> dict:
+    """Total RSS and PSS in MB of the master and its workers."""
+    pids = [master] + _children(master)
+    rss = sum(_kb(f"/proc/{pid}/status", "VmRSS") for pid in pids)
+    pss = sum(_kb(f"/proc/{pid}/smaps_rollup", "Pss") for pid in pids)
+    return {"processes": len(pids), "rss_mb": rss / 1024, "pss_mb": pss / 1024}
+
+
+# =========================
+# Driver
+# =========================
+async def measure(args, base: str, docs_url: str, warm_urls, master: int) -> dict:
+    import aiohttp
+
+    timeout = aiohttp.ClientTimeout(total=300)
+    async with aiohttp.ClientSession(timeout=timeout, connector=aiohttp.TCPConnector(limit=0)) as session:
+        await wait_ready(session, base)
+        # Every worker has to be up (and through its lifespan warm-up) before measuring
+        while len(_children(master)) < (args.current_workers if args.current_workers > 1 else 0):
+            await asyncio.sleep(0.2)
+        await asyncio.sleep(args.settle)
+        idle = memory(master)
+
+        stage_args = SimpleNamespace(seed=0, requests=args.requests, cold=0.0, questions=args.questions)
+        stage = await run_stage(session, base, docs_url, warm_urls, args.concurrency, stage_args)
+        loaded = memory(master)
+
+    return {
+        "workers": args.current_workers,
+        "idle": idle,
+        "after_load": loaded,
+        "rps": stage["rps"],
+        "ok": stage["ok"],
+        "errors": stage["errors"],
+        "latency_ms": stage["latency_ms"]["all"],
+    }
+
+
+def run_workers(args, workers: int, workdir: str, docs_url: str, warm_urls) -> dict:
+    port = free_port()
+    command = [
+        sys.executable, "-m", "benchmarks.bench_workers", "--serve",
+        "--port", str(port), "--workdir", workdir, "--embedder", args.embedder,
+        "--llm-latency", str(args.llm_latency), "--llm-jitter", str(args.llm_jitter),
+        "--current-workers", str(workers), "--warm-urls", *warm_urls,
+    ]
+    if args.qdrant_url:
+        command += ["--qdrant-url", args.qdrant_url]
+    env = dict(os.environ, LOG_LEVEL="WARNING")
+    process = subprocess.Popen(command, env=env)
+    try:
+        args.current_workers = workers
+        return asyncio.run(measure(args, f"http://127.0.0.1:{port}", docs_url, warm_urls, process.pid))
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--embedder", choices=["real", "weights", "fake"], default="real")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="requests per worker count")
+    parser.add_argument("--questions", type=int, nargs=2, default=[5, 10], metavar=("MIN", "MAX"))
+    parser.add_argument("--pages", type=int, default=20, help="pages of the fixture PDF")
+    parser.add_argument("--warm-docs", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="mean mock LLM latency, seconds")
+    parser.add_argument("--llm-jitter", type=float, default=0.01)
+    parser.add_argument("--qdrant-url", default=None, help="real Qdrant server instead of local mode")
+    parser.add_argument("--settle", type=float, default=2.0, help="seconds to wait after startup before measuring")
+    parser.add_argument("--out", default=None, help="JSON report path")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--current-workers", type=int, default=1, help=argparse.SUPPRESS)
+    parser.add_argument("--warm-urls", nargs="*", default=[], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        args.workers = args.current_workers
+        serve(args)
+        return
+
+    workdir = tempfile.mkdtemp(prefix="bench-workers-")
+    make_fixtures(workdir, args.pages)
+    docs_url = start_fixture_server(workdir)
+    warm_urls = [f"{docs_url}/policy.pdf?warm={i}" for i in range(args.warm_docs)]
+
+    print(f"embedder {args.embedder}, {os.cpu_count()} CPUs, concurrency {args.concurrency}, {args.requests} requests")
+    print(f"{'workers':>7}{'RSS MB':>9}{'PSS MB':>9}{'PSS after load':>16}{'rps':>8}{'p50 ms':>8}{'p95 ms':>8}  errors")
+    results = []
+    for workers in args.workers:
+        result = run_workers(args, workers, workdir, docs_url, warm_urls)
+        results.append(result)
+        errors = ",".join(f"{code}:{n}" for code, n in result["errors"].items()) or "-"
+        print(f"{workers:>7}{result['idle']['rss_mb']:>9.0f}{result['idle']['pss_mb']:>9.0f}"
+              f"{result['after_load']['pss_mb']:>16.0f}{result['rps']:>8.1f}"
+              f"{result['latency_ms'].get('p50', 0):>8.0f}{result['latency_ms'].get('p95', 0):>8.0f}  {errors}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"commit": git_commit(), "embedder": args.embedder, "cpus": os.cpu_count(), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+"""
+End-to-end load test of POST /api/v1/hackrx/run with local stand-ins.
+
+Starts the app (uvicorn, in a subprocess) with:
+  - fixture documents served by a local static HTTP server
+  - Qdrant in in-process local mode (or --qdrant-url for a real server)
+  - a mock LLM with configurable latency instead of Groq
+  - PyMuPDF instead of LlamaParse for PDFs
+  - a fresh, disabled-by-default artifact store, so cold documents are cold
+
+It then replays a traffic mix (share of cold vs warm documents, questions
+per request) at one or more concurrency levels (closed loop: every client
+sends its next request when the previous one returns) and writes a JSON
+report with RPS, error counts and p50/p95/p99 latency overall and per
+document temperature. Pass --compare with an earlier report to print the
+change per concurrency level.
+
+Usage:
+    python -m benchmarks.loadtest --concurrency 1 4 16 --requests 200
+    python -m benchmarks.loadtest --cold 0.1 --questions 5 15 --llm-latency 0.8
+    python -m benchmarks.loadtest --out after.json --compare before.json
+    python -m benchmarks.loadtest --embedder fake   # no model download, measures everything else
+"""
+import argparse
+import ast
+import asyncio
+import functools
+import hashlib
+import http.server
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+import numpy as np
+
+QUESTIONS = [
+    "What is the grace period for premium payment?",
+    "What is the waiting period for pre-existing diseases?",
+    "Does the policy cover maternity expenses?",
+    "What is the waiting period for cataract surgery?",
+    "Are organ donor medical expenses covered?",
+    "What is the No Claim Discount offered?",
+    "Is there a benefit for preventive health check-ups?",
+    "How does the policy define a hospital?",
+    "What is the extent of coverage for AYUSH treatments?",
+    "Are there sub-limits on room rent and ICU charges?",
+    "What is the claim settlement timeline?",
+    "Which treatments are excluded in the first year?",
+]
+
+
+# =========================
+# Stand-ins (run inside the app process)
+# =========================
+class MockLLM:
+    """Groq-compatible client answering every question after a simulated latency."""
+
+    def __init__(self, latency: float, jitter: float):
+        self.latency = latency
+        self.jitter = jitter
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, messages, timeout=None, **kwargs):
+        prompt = messages[0]["content"]
+        questions = ast.literal_eval(prompt.split("**Questions**:", 1)[1].split("**Output Format**", 1)[0].strip())
+        delay = max(0.0, random.gauss(self.latency, self.jitter))
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError("mock LLM timed out")
+        time.sleep(delay)
+        content = repr([f"Mock answer to: {q}" for q in questions])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+class LocalPDFParser:
+    """LlamaParse stand-in: page text from PyMuPDF, no network."""
+
+    async def aload_data(self, source, extra_info=None):
+        import fitz
+
+        def _load():
+            with fitz.open(stream=source, filetype="pdf") if isinstance(source, bytes) else fitz.open(source) as doc:
+                return [SimpleNamespace(text=page.get_text()) for page in doc]
+
+        return await asyncio.to_thread(_load)
+
+
+class FakeModel:
+    """Deterministic random unit vectors; skips the model to measure everything else."""
+
+    def encode(self, texts, normalize_embeddings=True, **kwargs):
+        vectors = np.stack([
+            np.random.default_rng(int.from_bytes(hashlib.blake2b(t.encode(), digest_size=8).digest(), "little"))
+            .standard_normal(768)
+            for t in texts
+        ]).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class LockedClient:
+    """Serializes calls: the in-process local Qdrant is not thread-safe."""
+
+    def __init__(self, client):
+        self._wrapped = client
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        attr = getattr(self._wrapped, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def call(*args, **kwargs):
+            with self._lock:
+                return attr(*args, **kwargs)
+
+        return call
+
+
+def serve(args):
+    """Run the app with stand-ins installed (the --serve subprocess)."""
+    os.environ["ARTIFACT_STORE_ENABLED"] = "true" if args.artifact_store else "false"
+    os.environ["ARTIFACT_STORE_PATH"] = os.path.join(args.workdir, "artifacts.db")
+    import uvicorn
+    from qdrant_client import QdrantClient
+
+    import app.service.embedder as embedder
+    import app.service.retrival as retrival
+    import app.service.vector_store as vector_store
+    import app.utils.downloader__ as fetcher
+    from app.main import app
+
+    qdrant = QdrantClient(url=args.qdrant_url) if args.qdrant_url else LockedClient(QdrantClient(":memory:"))
+    vector_store.client = qdrant
+    retrival.client = qdrant
+    retrival.groq_client = MockLLM(args.llm_latency, args.llm_jitter)
+    fetcher.parser = LocalPDFParser()
+    if args.embedder == "fake":
+        embedder.model = FakeModel()
+
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+# =========================
+# Fixtures
+# =========================
+def make_fixtures(directory: str, pages: int):
+    from benchmarks.bench_pdf_tables import make_synthetic_pdf
+
+    make_synthetic_pdf(os.path.join(directory, "policy.pdf"), pages)
+
+
+def start_fixture_server(directory: str) -> str:
+    """Static file server; query strings are ignored, so ?v=... gives new document URLs for the same file."""
+    handler = functools.partial(QuietHandler, directory=directory)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# =========================
+# Load generation
+# =========================
+async def wait_ready(session, base: str, timeout: float = 300):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(f"{base}/") as response:
+                if response.status == 200:
+                    return
+        except Exception:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError("App did not start")
+
+
+async def post_run(session, base: str, document: str, questions) -> tuple:
+    """Returns (status code, seconds)."""
+    start = time.perf_counter()
+    try:
+        async with session.post(
+            f"{base}/api/v1/hackrx/run",
+            json={"documents": document, "questions": questions},
+            headers={"X-API-Key": "loadtest"},
+        ) as response:
+            await response.read()
+            status = response.status
+    except Exception:
+        status = 0  # connection error
+    return status, time.perf_counter() - start
+
+
+async def run_stage(session, base: str, docs_url: str, warm_docs, concurrency: int, args) -> dict:
+    rng = random.Random(args.seed + concurrency)
+    samples = []
+    remaining = iter(range(args.requests))
+
+    async def client():
+        for _ in remaining:
+            cold = rng.random() < args.cold
+            document = f"{docs_url}/policy.pdf?v={uuid.uuid4().hex}" if cold else rng.choice(warm_docs)
+            questions = rng.sample(QUESTIONS * 3, rng.randint(*args.questions))
+            status, seconds = await post_run(session, base, document, questions)
+            samples.append(("cold" if cold else "warm", status, seconds))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    duration = time.perf_counter() - started
+
+    async with session.get(f"{base}/metrics", headers={"X-API-Key": "loadtest"}) as response:
+        server_metrics = await response.json()
+
+    errors = {}
+    for _, status, _ in samples:
+        if status != 200:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+    ok = [s for s in samples if s[1] == 200]
+    return {
+        "concurrency": concurrency,
+        "requests": len(samples),
+        "ok": len(ok),
+        "errors": errors,
+        "duration_s": duration,
+        "rps": len(ok) / duration,
+        "latency_ms": {
+            "all": percentiles([s for _, _, s in ok]),
+            "cold": percentiles([s for kind, _, s in ok if kind == "cold"]),
+            "warm": percentiles([s for kind, _, s in ok if kind == "warm"]),
+        },
+        "server_metrics": server_metrics,
+    }
+
+
+def percentiles(seconds) -> dict:
+    if not seconds:
+        return {}
+    ms = np.array(seconds) * 1000
+    return {
+        "p50": float(np.percentile(ms, 50)),
+        "p95": float(np.percentile(ms, 95)),
+        "p99": float(np.percentile(ms, 99)),
+        "mean": float(ms.mean()),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return "unknown"
+
+
+def print_stage(stage: dict):
+    lat = stage["latency_ms"]["all"]
+    errors = ",".join(f"{code}:{n}" for code, n in stage["errors"].items()) or "-"
+    print(f"{stage['concurrency']:>5}{stage['requests']:>8}{stage['rps']:>8.2f}"
+          f"{lat.get('p50', 0):>9.0f}{lat.get('p95', 0):>9.0f}{lat.get('p99', 0):>9.0f}"
+          f"{stage['latency_ms']['cold'].get('p50', 0):>10.0f}{stage['latency_ms']['warm'].get('p50', 0):>10.0f}  {errors}")
+
+
+def print_comparison(report: dict, previous: dict):
+    print(f"\nvs {previous.get('commit', '?')}:")
+    before = {stage["concurrency"]: stage for stage in previous["stages"]}
+    for stage in report["stages"]:
+        old = before.get(stage["concurrency"])
+        if not old:
+            continue
+        p95, old_p95 = stage["latency_ms"]["all"].get("p95"), old["latency_ms"]["all"].get("p95")
+        line = f"  c={stage['concurrency']:<4} rps {old['rps']:.2f} -> {stage['rps']:.2f} ({(stage['rps'] / old['rps'] - 1) * 100:+.0f}%)" if old["rps"] else f"  c={stage['concurrency']:<4}"
+        if p95 and old_p95:
+            line += f"   p95 {old_p95:.0f} -> {p95:.0f} ms ({(p95 / old_p95 - 1) * 100:+.0f}%)"
+        print(line)
+
+
+async def drive(args, base: str, docs_url: str) -> dict:
+    import aiohttp
+
+    timeout = aiohttp.ClientTimeout(total=args.request_timeout)
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        await wait_ready(session, base)
+
+        # Warm documents are ingested once up front
+        warm_docs = [f"{docs_url}/policy.pdf?warm={i}" for i in range(args.warm_docs)]
+        for document in warm_docs:
+            status, seconds = await post_run(session, base, document, QUESTIONS[:1])
+            if status != 200:
+                raise RuntimeError(f"Warm-up request failed with HTTP {status}")
+            print(f"warmed {document} in {seconds:.2f}s")
+
+        print(f"\n{'conc':>5}{'reqs':>8}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'cold p50':>10}{'warm p50':>10}  errors")
+        stages = []
+        for concurrency in args.concurrency:
+            stage = await run_stage(session, base, docs_url, warm_docs, concurrency, args)
+            print_stage(stage)
+            stages.append(stage)
+    return stages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=100, help="requests per concurrency level")
+    parser.add_argument("--cold", type=float, default=0.2, help="share of requests on a never-seen document")
+    parser.add_argument("--warm-docs", type=int, default=3)
+    parser.add_argument("--questions", type=int, nargs=2, default=[5, 10], metavar=("MIN", "MAX"))
+    parser.add_argument("--pages", type=int, default=20, help="pages of the fixture PDF")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="mean mock LLM latency, seconds")
+    parser.add_argument("--llm-jitter", type=float, default=0.1)
+    parser.add_argument("--embedder", choices=["real", "fake"], default="real")
+    parser.add_argument("--qdrant-url", default=None, help="real Qdrant server instead of local mode")
+    parser.add_argument("--artifact-store", action="store_true", help="keep the artifact store enabled")
+    parser.add_argument("--request-timeout", type=float, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=None, help="report path (default loadtest-<commit>.json)")
+    parser.add_argument("--compare", default=None, help="earlier report to compare against")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        make_fixtures(workdir, args.pages)
+        docs_url = start_fixture_server(workdir)
+        port = free_port()
+        command = [
+            sys.executable, "-m", "benchmarks.loadtest", "--serve", "--port", str(port), "--workdir", workdir,
+            "--llm-latency", str(args.llm_latency), "--llm-jitter", str(args.llm_jitter), "--embedder", args.embedder,
+        ]
+        if args.qdrant_url:
+            command += ["--qdrant-url", args.qdrant_url]
+        if args.artifact_store:
+            command.append("--artifact-store")
+        app_process = subprocess.Popen(command)
+        try:
+            stages = asyncio.run(drive(args, f"http://127.0.0.1:{port}", docs_url))
+        finally:
+            app_process.terminate()
+            app_process.wait()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("serve", "port", "workdir", "out", "compare")},
+        "stages": stages,
+    }
+    out = args.out or f"loadtest-{report['commit']}.json"
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()